@@ -4,10 +4,12 @@ from .models import (
     CommentLikes,
     Comments,
     Followings,
+    ImageDerivative,
     Likes,
     Posts,
     Reports,
     Saved,
+    StoredBlob,
     Tags,
 )
 
@@ -21,3 +23,5 @@ admin.site.register(Posts)
 admin.site.register(Reports)
 admin.site.register(Tags)
 admin.site.register(Saved)
+admin.site.register(ImageDerivative)
+admin.site.register(StoredBlob)
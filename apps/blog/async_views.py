@@ -0,0 +1,231 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from config.db.replicas import replica_reads
+
+from .cache import aget_cached_post
+from .counters import record_post_view
+from .models import Comments, Followings, Likes, Posts, Saved
+from .pagination import CustomLimitOffsetPagination, get_feed_paginator
+from .renderers import dumps
+from .serializers import (
+    BlogSerializer,
+    CommentSerializer,
+    UserSerializer,
+    response_context,
+)
+from .views import annotate_comment_stats
+
+# Async counterparts of the hot read endpoints in views.py. They return the
+# same {"data", "message", "status"} envelope but run on Django's async ORM,
+# so under ASGI a request waiting on the database does not pin a worker thread
+
+
+def render(response):
+    return HttpResponse(
+        dumps(response),
+        status=response["status"],
+        content_type="application/json",
+    )
+
+
+async def get_user(request):
+    # Same JWT bearer auth as the DRF views, falling back to the session
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    if result is not None:
+        return result[0]
+    return await request.auser()
+
+
+async def serialize(serializer):
+    # Serializers may still touch the database (image srcsets), keep that in
+    # the sync thread
+    return await sync_to_async(lambda: serializer.data)()
+
+
+def forbidden():
+    return render(
+        {
+            "status": status.HTTP_403_FORBIDDEN,
+            "message": "You are not allowed to access this resource.",
+            "data": [],
+        }
+    )
+
+
+@replica_reads
+@require_GET
+async def getAllBlogs(request):
+    try:
+        request = Request(request)
+        posts = BlogSerializer.setup_eager_loading(Posts.objects.all(), request)
+
+        # Create an instance of the pagination class
+        paginator = get_feed_paginator(request)
+        # Paginate the queryset
+        paginated_posts = await paginator.apaginate_queryset(posts, request)
+
+        # Serialize the paginated queryset
+        data = await serialize(
+            BlogSerializer(
+                paginated_posts, many=True, context=response_context(request)
+            )
+        )
+
+        # Create the response with pagination data
+        paginated_data = paginator.get_paginated_data(data)
+        response = {
+            "data": paginated_data,
+            "message": "Successfully retrieved all blogs",
+            "status": status.HTTP_200_OK,
+        }
+    except NotFound as e:
+        # A malformed or tampered ?cursor=
+        response = {
+            "data": [],
+            "message": str(e.detail),
+            "status": status.HTTP_404_NOT_FOUND,
+        }
+    except Exception as e:
+        response = {
+            "data": [],
+            "message": f"An error occurred: {str(e)}",
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        }
+    return render(response)
+
+
+@replica_reads
+@require_GET
+async def getABlog(request, pk):
+    try:
+        user = await get_user(request)
+
+        async def exists(model):
+            if not user.is_authenticated:
+                return False
+            return await model.objects.filter(post_id=pk, author=user).aexists()
+
+        # The cached body and the per-user flags are independent lookups
+        (post_data, counters), liked, saved = await asyncio.gather(
+            aget_cached_post(pk), exists(Likes), exists(Saved)
+        )
+        await sync_to_async(record_post_view)(pk)
+        # The cached body is the full post; a sparse fieldset trims the copy
+        selected = BlogSerializer.selected_fields(request)
+        if selected is not None:
+            post_data = {k: v for k, v in post_data.items() if k in selected}
+        post_data["liked"] = liked
+        post_data["saved"] = saved
+        post_data["likesCount"] = counters["likes_count"]
+        post_data["commentCount"] = counters["top_level_comment_count"]
+        post_data["savedCount"] = counters["saved_count"]
+        post_data["viewsCount"] = counters["views_count"]
+        response = {
+            "data": post_data,
+            "message": "Successfully retrieved A blog post",
+            "status": status.HTTP_200_OK,
+        }
+    except Exception as e:
+        response = {
+            "data": None,
+            "message": f"An error occurred: {str(e)}",
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        }
+    return render(response)
+
+
+@replica_reads
+@require_GET
+async def getAllCommentsByPostId(request, pk):
+    try:
+        user = await get_user(request)
+        request = Request(request)
+        comments = annotate_comment_stats(
+            Comments.objects.filter(post=pk, parent=None), user, request
+        ).order_by("-created_at")
+
+        # Create an instance of the pagination class
+        paginator = CustomLimitOffsetPagination()
+        # Paginate the queryset
+        paginated_comments = await paginator.apaginate_queryset(comments, request)
+        if paginator.count == 0:
+            return render(
+                {
+                    "data": None,
+                    "message": "No comments found for this post.",
+                    "status": status.HTTP_404_NOT_FOUND,
+                }
+            )
+
+        # Serialize the paginated queryset
+        data = await serialize(
+            CommentSerializer(
+                paginated_comments, many=True, context=response_context(request)
+            )
+        )
+        for comment, instance in zip(data, paginated_comments):
+            comment["liked"] = instance.liked
+            comment["likesCount"] = instance.likesCount
+            comment["commentCount"] = instance.commentCount
+        # Create the response with pagination data
+        paginated_data = paginator.get_paginated_data(data)
+        response = {
+            "data": paginated_data,
+            "message": "Successfully retrieved the comments",
+            "status": status.HTTP_200_OK,
+        }
+    except Exception as e:
+        response = {
+            "data": None,
+            "message": f"An error occurred: {str(e)}",
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        }
+    return render(response)
+
+
+@replica_reads
+@require_GET
+async def getAUserProfile(request, username):
+    try:
+        viewer = await get_user(request)
+        if not viewer.is_authenticated:
+            return forbidden()
+        user = await UserSerializer.setup_eager_loading(
+            User.objects.all(), request
+        ).aget(username=username)
+        # The three counts do not depend on each other
+        followingCount, followerCount, postCount = await asyncio.gather(
+            Followings.objects.filter(follower=user).acount(),
+            Followings.objects.filter(following=user).acount(),
+            Posts.objects.filter(author=user).acount(),
+        )
+        user_data = dict(
+            await serialize(UserSerializer(user, context=response_context(request)))
+        )
+        user_data["followingCount"] = followingCount
+        user_data["followerCount"] = followerCount
+        user_data["postCount"] = postCount
+        response = {
+            "data": user_data,
+            "message": "Successfully retrieved A user profile",
+            "status": status.HTTP_200_OK,
+        }
+    except Exception as e:
+        response = {
+            "data": None,
+            "message": f"An error occurred: {str(e)}",
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        }
+    return render(response)
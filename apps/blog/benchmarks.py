@@ -0,0 +1,403 @@
+import gc
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from apps.users.models import profile
+
+from . import uploads
+from .content import derive_fields
+from .counters import rebuild_author_stats, rebuild_post_counters
+from .models import (
+    CommentLikes,
+    Comments,
+    Followings,
+    Likes,
+    Posts,
+    Saved,
+    Tags,
+)
+from .search import rebuild_search_index
+from .suggestions import rebuild_follow_suggestions
+from .timeline import rebuild_timelines
+
+# Per-endpoint request benchmarks: seed_benchmark_data builds a fixed dataset,
+# run_benchmarks calls every blog and user route through the test client and
+# find_regressions compares the numbers with the committed baseline
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+PASSWORD = "benchmark-password"
+METRICS = ("queries", "p50_ms", "p95_ms", "peak_kib")
+# Timing and allocation noise below these is never reported; query counts are
+# deterministic and must not grow at all
+NOISE_FLOORS = {"queries": 0, "p50_ms": 1.0, "p95_ms": 2.0, "peak_kib": 64}
+
+
+class Endpoint:
+    # One route to measure. path and data may be callables of the iteration
+    # number, evaluated outside the timed section, for routes that need fresh
+    # state on every call
+    def __init__(self, name, method, path, data=None, format="json", **extra):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.format = format
+        self.extra = extra
+
+    def prepare(self, iteration):
+        path = self.path(iteration) if callable(self.path) else self.path
+        data = self.data(iteration) if callable(self.data) else self.data
+        return path, data
+
+    def send(self, client, path, data):
+        if isinstance(data, bytes):
+            return client.generic(self.method, path, data, **self.extra)
+        if self.method == "GET":
+            return client.get(path, data, **self.extra)
+        return getattr(client, self.method.lower())(
+            path, data, format=self.format, **self.extra
+        )
+
+
+def block_content(n):
+    blocks = [
+        {"type": "heading", "content": [{"text": f"Benchmark post {n}"}]},
+        {"type": "paragraph", "content": [{"text": f"Notes on django, part {n}"}]},
+    ]
+    blocks += [
+        {
+            "type": "paragraph",
+            "content": [{"text": f"Paragraph {i} of post {n} about django. " * 8}],
+        }
+        for i in range(6)
+    ]
+    return json.dumps(blocks)
+
+
+def seed_benchmark_data(users=40, posts=240, comments=800):
+    # Deterministic: the same arguments always build the same rows, so query
+    # counts stay comparable with the baseline
+    password = make_password(PASSWORD)
+    # bench0 makes the requests; staff for the staff-only routes
+    people = User.objects.bulk_create(
+        User(
+            username=f"bench{n}",
+            email=f"bench{n}@example.com",
+            password=password,
+            is_staff=n == 0,
+        )
+        for n in range(users)
+    )
+    profile.objects.bulk_create(
+        profile(user=user, bio=f"Writer {n}") for n, user in enumerate(people)
+    )
+    tags = Tags.objects.bulk_create(
+        Tags(value=value, label=value.title())
+        for value in ("django", "python", "databases", "performance", "web")
+    )
+    entries = Posts.objects.bulk_create(
+        Posts(
+            title=f"Benchmark post {n}",
+            content=block_content(n),
+            # Earlier users write more, like real authors
+            author=people[n % (1 + n % users)],
+            **derive_fields(block_content(n)),
+        )
+        for n in range(posts)
+    )
+    Posts.tags.through.objects.bulk_create(
+        Posts.tags.through(posts_id=post.pk, tags_id=tags[n % len(tags)].pk)
+        for n, post in enumerate(entries)
+    )
+    threads = Comments.objects.bulk_create(
+        Comments(message=f"Comment {n}", author=people[n % users], post=entries[n % 20])
+        for n in range(comments)
+    )
+    Comments.objects.bulk_create(
+        Comments(
+            message=f"Reply {n}",
+            author=people[(n + 1) % users],
+            post=thread.post,
+            parent=thread,
+        )
+        for n, thread in enumerate(threads[: comments // 4])
+        for _ in range(2)
+    )
+    # Follower counts fall off with the author's position: a long tail
+    Followings.objects.bulk_create(
+        Followings(follower=follower, following=following)
+        for n, follower in enumerate(people)
+        for following in people[: 2 + n % 12]
+        if follower != following
+    )
+    Likes.objects.bulk_create(
+        Likes(author=user, post=post)
+        for n, user in enumerate(people)
+        for post in entries[n % 5 : 40 : 3]
+    )
+    Saved.objects.bulk_create(
+        Saved(author=user, post=post) for user in people for post in entries[:3]
+    )
+    CommentLikes.objects.bulk_create(
+        CommentLikes(author=user, comment=comment)
+        for n, user in enumerate(people)
+        for comment in threads[n % 3 : 60 : 4]
+    )
+    # bulk_create skips the signals that maintain the derived tables
+    rebuild_post_counters()
+    rebuild_author_stats()
+    rebuild_follow_suggestions()
+    rebuild_timelines()
+    rebuild_search_index()
+    return {
+        "user": people[0],
+        "author": people[1],
+        "post": entries[0],
+        "comment": threads[0],
+        "tag": tags[0],
+    }
+
+
+def benchmark_endpoints(fixtures):
+    user = fixtures["user"]
+    author = fixtures["author"]
+    post = fixtures["post"].pk
+    comment = fixtures["comment"].pk
+    part = b"x" * 4096
+
+    def upload_session(iteration, complete=False):
+        session = uploads.open_session(f"bench{iteration}.bin", len(part), user)
+        if complete:
+            uploads.write_part(session.pk, user, 0, BytesIO(part), len(part))
+        return session.pk
+
+    return [
+        Endpoint("feed", "GET", "/"),
+        Endpoint("tags", "GET", "/tags"),
+        Endpoint("timeline", "GET", "/timeline"),
+        Endpoint("search", "GET", "/search?q=django"),
+        Endpoint(
+            "create blog",
+            "POST",
+            "/create-blog",
+            lambda i: {"content": block_content(i), "tags": [fixtures["tag"].pk]},
+            format="multipart",
+        ),
+        Endpoint(
+            "file upload",
+            "POST",
+            "/media/upload",
+            lambda i: {"file": SimpleUploadedFile(f"bench{i}.txt", b"%d" % i)},
+            format="multipart",
+        ),
+        Endpoint(
+            "chunked upload start",
+            "POST",
+            "/media/upload/chunked",
+            {"filename": "bench.bin", "size": len(part)},
+        ),
+        Endpoint(
+            "chunked upload status",
+            "GET",
+            lambda i: f"/media/upload/{upload_session(i)}",
+        ),
+        Endpoint(
+            "chunked upload part",
+            "PUT",
+            lambda i: f"/media/upload/{upload_session(i)}?offset=0",
+            part,
+            content_type="application/octet-stream",
+        ),
+        Endpoint(
+            "chunked upload complete",
+            "POST",
+            lambda i: f"/media/upload/{upload_session(i, complete=True)}/complete",
+        ),
+        Endpoint("blog", "GET", f"/blog/{post}/"),
+        Endpoint("author blogs", "GET", f"/blogs/profile/{author.pk}/"),
+        Endpoint("profile", "GET", f"/profile/{author.username}/"),
+        Endpoint("suggestions", "GET", f"/profile/{user.pk}/suggestion"),
+        Endpoint("comments", "GET", f"/blog/{post}/comments"),
+        Endpoint("replies", "GET", f"/comment/{comment}/reply"),
+        Endpoint("like toggle", "GET", f"/blog/{post}/like"),
+        Endpoint("like", "PUT", f"/blog/{post}/like"),
+        Endpoint("unlike", "DELETE", f"/blog/{post}/like"),
+        Endpoint("save", "PUT", f"/blog/{post}/save"),
+        Endpoint("comment like", "PUT", f"/comment/{comment}/like"),
+        Endpoint(
+            "reactions sync",
+            "POST",
+            "/reactions/sync",
+            lambda i: {
+                "changes": [
+                    {"type": "like", "id": post, "state": i % 2 == 0},
+                    {"type": "save", "id": post, "state": i % 2 == 1},
+                    {"type": "comment_like", "id": comment, "state": True},
+                ]
+            },
+        ),
+        Endpoint(
+            "create comment",
+            "POST",
+            f"/blog/{post}/create-comment",
+            lambda i: {"message": f"Benchmark comment {i}"},
+        ),
+        Endpoint("popular authors", "GET", "/popular-authors"),
+        Endpoint("database stats", "GET", "/health/db"),
+        Endpoint("async feed", "GET", "/async/"),
+        Endpoint("async blog", "GET", f"/async/blog/{post}/"),
+        Endpoint("async comments", "GET", f"/async/blog/{post}/comments"),
+        Endpoint("async profile", "GET", f"/async/profile/{author.username}/"),
+        Endpoint("sign out", "GET", "/user/sign-out"),
+        Endpoint(
+            "sign in",
+            "POST",
+            "/user/sign-in",
+            {"username": user.username, "password": PASSWORD},
+        ),
+        Endpoint(
+            "sign up",
+            "POST",
+            "/user/sign-up",
+            lambda i: {
+                "username": f"bench-signup-{i}",
+                "email": f"signup{i}@example.com",
+                "password": PASSWORD,
+                "confirmPassword": PASSWORD,
+            },
+        ),
+        Endpoint("auth", "GET", "/user/auth"),
+        Endpoint(
+            "token",
+            "POST",
+            "/user/token",
+            {"username": user.username, "password": PASSWORD},
+        ),
+        Endpoint(
+            "token refresh",
+            "POST",
+            "/user/token/refresh",
+            # Refresh tokens are rotated and blacklisted after one use
+            lambda i: {"refresh": str(RefreshToken.for_user(user))},
+        ),
+    ]
+
+
+def measure_endpoint(client, endpoint, repeat):
+    # One warm-up call, `repeat` timed calls, then one call under tracemalloc
+    # for the peak allocation (tracing would distort the timings)
+    timings = []
+    queries = 0
+    for iteration in range(repeat + 2):
+        path, data = endpoint.prepare(iteration)
+        traced = iteration == repeat + 1
+        if traced:
+            gc.collect()
+            tracemalloc.start()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = endpoint.send(client, path, data)
+            elapsed = time.perf_counter() - started
+        if traced:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{endpoint.name}: {endpoint.method} {path} "
+                f"returned {response.status_code}: {response.content[:300]!r}"
+            )
+        if 0 < iteration <= repeat:
+            timings.append(elapsed * 1000)
+            queries = max(queries, len(context.captured_queries))
+    return {
+        "queries": queries,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def run_benchmarks(fixtures, repeat=20, only=None):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(fixtures['user'])}"
+    )
+    results = {}
+    for endpoint in benchmark_endpoints(fixtures):
+        if only and endpoint.name not in only:
+            continue
+        cache.clear()
+        results[endpoint.name] = measure_endpoint(client, endpoint, repeat)
+    return results
+
+
+@contextmanager
+def benchmark_environment():
+    # Uploads and media land in a throwaway directory; image derivatives are
+    # generated inline so no worker thread outlives a measurement
+    with tempfile.TemporaryDirectory() as root:
+        upload_dir = uploads.UPLOAD_TEMP_DIR
+        uploads.UPLOAD_TEMP_DIR = str(Path(root) / "chunks")
+        try:
+            with override_settings(MEDIA_ROOT=root, IMAGE_DERIVATIVES_SYNC=True):
+                yield
+        finally:
+            uploads.UPLOAD_TEMP_DIR = upload_dir
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as baseline:
+        return json.load(baseline)["endpoints"]
+
+
+def write_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as baseline:
+        json.dump({"endpoints": results}, baseline, indent=2, sort_keys=True)
+        baseline.write("\n")
+
+
+def find_regressions(results, baseline, tolerance, metrics=METRICS):
+    # A metric regresses when it exceeds the baseline by more than `tolerance`
+    # (a fraction) and by more than its noise floor
+    regressions = []
+    for name, measured in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            regressions.append(f"{name}: no baseline")
+            continue
+        for metric in metrics:
+            if metric == "queries":
+                limit = expected[metric]
+            else:
+                limit = max(
+                    expected[metric] * (1 + tolerance),
+                    expected[metric] + NOISE_FLOORS[metric],
+                )
+            if measured[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {measured[metric]} exceeds "
+                    f"{round(limit, 3)} (baseline {expected[metric]})"
+                )
+    return regressions
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Posts, StoredBlob, UploadedFile
+from .storage import blob_sha256, content_addressed_storage
+
+# (model, field) pairs stored through ContentAddressedStorage
+BLOB_FIELDS = ((UploadedFile, "file"), (Posts, "thumbnail"))
+
+
+def retain_blob(name, content=None):
+    sha256 = blob_sha256(name)
+    if sha256 is None:
+        return
+    with transaction.atomic():
+        # The row lock orders this against _delete_if_unused: the file is
+        # either still there and now referenced, or was removed and is saved
+        # again from content
+        blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+        if not content_addressed_storage.exists(name):
+            # Saving the field skipped the write because the blob existed;
+            # the last reference to it was released since
+            if content is None:
+                raise FileNotFoundError(f"Blob {name} was deleted before use")
+            content.seek(0)
+            content_addressed_storage.save(name, content)
+        if blob is None:
+            blob, created = StoredBlob.objects.get_or_create(
+                name=name,
+                defaults={
+                    "sha256": sha256,
+                    "size": content_addressed_storage.size(name),
+                    "ref_count": 1,
+                },
+            )
+            if created:
+                return
+        StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+
+
+def release_blob(name):
+    if blob_sha256(name) is None:
+        return
+    StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") - 1)
+    # The file goes once nothing points at it any more, after the commit so a
+    # rollback never leaves a row referencing a deleted blob
+    transaction.on_commit(lambda: _delete_if_unused(name))
+
+
+def _delete_if_unused(name):
+    with transaction.atomic():
+        blob = (
+            StoredBlob.objects.select_for_update()
+            .filter(name=name, ref_count__lte=0)
+            .first()
+        )
+        if blob is not None:
+            content_addressed_storage.delete(blob.name)
+            blob.delete()
+
+
+def rebuild_blob_refcounts():
+    counts = {}
+    for model, field in BLOB_FIELDS:
+        for name in model.objects.values_list(field, flat=True).iterator():
+            if blob_sha256(name):
+                counts[name] = counts.get(name, 0) + 1
+    # Blobs nobody references are left on disk for a storage-level sweep
+    StoredBlob.objects.all().delete()
+    StoredBlob.objects.bulk_create(
+        StoredBlob(
+            sha256=blob_sha256(name),
+            name=name,
+            size=content_addressed_storage.size(name),
+            ref_count=count,
+        )
+        for name, count in counts.items()
+        if content_addressed_storage.exists(name)
+    )
+    return len(counts)
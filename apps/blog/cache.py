@@ -0,0 +1,51 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Posts
+from .serializers import BlogSerializer
+
+POST_CACHE_TIMEOUT = getattr(settings, "BLOG_POST_CACHE_TIMEOUT", 300)
+
+# Columns read live on every request; they change far more often than the
+# post body, so they are overlaid on the cached data instead of stored in it
+POST_COUNTER_FIELDS = (
+    "likes_count",
+    "top_level_comment_count",
+    "saved_count",
+    "views_count",
+)
+
+
+def post_cache_key(pk, updated_at):
+    # Any save bumps updated_at, so an edited post never hits a stale entry
+    return f"blog:post:{pk}:{updated_at.timestamp()}"
+
+
+def get_cached_post(pk):
+    # Single-row lookup for the version and counters; raises Posts.DoesNotExist
+    row = Posts.objects.values("updated_at", *POST_COUNTER_FIELDS).get(pk=pk)
+    key = post_cache_key(pk, row["updated_at"])
+    post_data = cache.get(key)
+    if post_data is None:
+        post = BlogSerializer.setup_eager_loading(Posts.objects.all()).get(pk=pk)
+        post_data = dict(BlogSerializer(post).data)
+        cache.set(key, post_data, POST_CACHE_TIMEOUT)
+    return dict(post_data), row
+
+
+async def aget_cached_post(pk):
+    # Async counterpart of get_cached_post for the ASGI views
+    row = await Posts.objects.values("updated_at", *POST_COUNTER_FIELDS).aget(pk=pk)
+    key = post_cache_key(pk, row["updated_at"])
+    post_data = await cache.aget(key)
+    if post_data is None:
+        post = await BlogSerializer.setup_eager_loading(Posts.objects.all()).aget(pk=pk)
+        # Serializing looks up the thumbnail srcsets, a sync query
+        post_data = await sync_to_async(lambda: dict(BlogSerializer(post).data))()
+        await cache.aset(key, post_data, POST_CACHE_TIMEOUT)
+    return dict(post_data), row
+
+
+def invalidate_cached_post(pk, updated_at):
+    cache.delete(post_cache_key(pk, updated_at))
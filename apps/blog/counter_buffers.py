@@ -0,0 +1,118 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+# Write-behind buffering for the Posts counters. With BLOG_COUNTER_BUFFER set,
+# adjust_post_counter queues deltas here instead of updating the row, and
+# counters.flush_post_counters applies them in batches: "memory" aggregates
+# per process, "cache" shares one buffer between processes through the cache
+BACKEND = getattr(settings, "BLOG_COUNTER_BUFFER", "")
+FLUSH_INTERVAL = getattr(settings, "BLOG_COUNTER_FLUSH_INTERVAL", 5)
+CACHE_ALIAS = getattr(settings, "BLOG_COUNTER_BUFFER_CACHE", "default")
+
+
+class MemoryCounterBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(int)
+
+    def add(self, post_id, field, delta):
+        with self._lock:
+            self._deltas[(post_id, field)] += delta
+
+    def drain(self):
+        # {(post_id, field): delta} accumulated since the last drain
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        return dict(deltas)
+
+
+class CacheCounterBuffer:
+    # An append-only log: every delta takes the next number of an atomic
+    # sequence and is stored under it; drain reads the entries after the last
+    # flushed number
+    SEQUENCE = "blog:counters:seq"
+    CURSOR = "blog:counters:cursor"
+    STALLED = "blog:counters:stalled"
+    LOCK = "blog:counters:lock"
+    ENTRY = "blog:counters:entry:{}"
+    # Entries outlive any sane flush interval; expiry only reclaims the space
+    # of a buffer nobody flushes
+    TIMEOUT = 24 * 60 * 60
+    # A drain holding the lock longer than this is assumed to have died
+    LOCK_TIMEOUT = 60
+    # Numbers rescanned when the cursor has been evicted
+    RESCAN = 10000
+
+    def __init__(self, alias=CACHE_ALIAS):
+        self.cache = caches[alias]
+
+    def add(self, post_id, field, delta):
+        if self.cache.add(self.SEQUENCE, 0, None):
+            # A new (or evicted and restarted) sequence: numbering starts
+            # over, so must the cursor
+            self.cache.set(self.CURSOR, 0, None)
+        number = self.cache.incr(self.SEQUENCE)
+        self.cache.set(self.ENTRY.format(number), (post_id, field, delta), self.TIMEOUT)
+
+    def drain(self):
+        # Only one process drains at a time; the others find nothing to do
+        if not self.cache.add(self.LOCK, 1, self.LOCK_TIMEOUT):
+            return {}
+        try:
+            return self._drain()
+        finally:
+            self.cache.delete(self.LOCK)
+
+    def _drain(self):
+        cursor = self.cache.get(self.CURSOR)
+        last = self.cache.get(self.SEQUENCE, 0)
+        # The sequence and the cursor live in an evictable cache and can be
+        # lost independently. A sequence that restarted below the cursor is
+        # read from its start; a lost cursor rescans the last RESCAN numbers.
+        # Either way an entry missing from that range was consumed (or lost)
+        # before, not one still being written, so it is skipped
+        resync = cursor is None or cursor > last
+        if resync:
+            cursor = 0 if cursor is not None else max(0, last - self.RESCAN)
+        keys = [self.ENTRY.format(number) for number in range(cursor + 1, last + 1)]
+        entries = self.cache.get_many(keys)
+        deltas = defaultdict(int)
+        consumed = 0
+        for key in keys:
+            entry = entries.get(key)
+            if entry is None and not resync:
+                # A writer between incr and set; wait for it one flush, then
+                # give the entry up as lost (process died, evicted)
+                if self.cache.get(self.STALLED) != key:
+                    self.cache.set(self.STALLED, key, self.TIMEOUT)
+                    break
+            elif entry is not None:
+                post_id, field, delta = entry
+                deltas[(post_id, field)] += delta
+            consumed += 1
+        self.cache.set(self.CURSOR, cursor + consumed, None)
+        self.cache.delete_many(keys[:consumed])
+        return dict(deltas)
+
+
+BACKENDS = {
+    "memory": MemoryCounterBuffer,
+    "cache": CacheCounterBuffer,
+}
+
+_buffers = {}
+
+
+def get_counter_buffer():
+    # None when counters are written through
+    if not BACKEND:
+        return None
+    if BACKEND not in BACKENDS:
+        raise ImproperlyConfigured(f"Unknown BLOG_COUNTER_BUFFER {BACKEND!r}")
+    if BACKEND not in _buffers:
+        _buffers[BACKEND] = BACKENDS[BACKEND]()
+    return _buffers[BACKEND]
@@ -0,0 +1,197 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from itertools import islice
+
+from django.db import connections, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from config.db.replicas import PRIMARY
+
+from . import counter_buffers
+from .models import AuthorStats, Comments, Followings, Likes, Posts, Saved
+
+LIKES = "likes_count"
+TOP_LEVEL_COMMENTS = "top_level_comment_count"
+SAVED = "saved_count"
+VIEWS = "views_count"
+
+logger = logging.getLogger(__name__)
+
+
+def counter_value(field, delta):
+    if delta >= 0:
+        return F(field) + delta
+    # Never let a drifted counter underflow the unsigned column
+    return Greatest(F(field) + delta, 0)
+
+
+def adjust_post_counter(post_id, field, delta):
+    # Callers run this inside the same transaction as the row they created or
+    # deleted
+    buffer = counter_buffers.get_counter_buffer()
+    if buffer is not None:
+        # Write-behind: the row change is visible now, the count catches up
+        # on the next flush. Queued on commit so a rollback queues nothing
+        transaction.on_commit(lambda: buffer.add(post_id, field, delta))
+        start_counter_flusher()
+        return
+    # Apply the change as a single UPDATE so concurrent requests never lose
+    # an increment
+    Posts.objects.filter(pk=post_id).update(**{field: counter_value(field, delta)})
+
+
+def record_post_view(post_id):
+    # Views arrive on read paths, outside any transaction, and are buffered
+    # like the other counters when a buffer is configured. Otherwise the
+    # UPDATE names the primary itself: counting a view is not a write of the
+    # viewer's, so it must not pin them to the primary for their next reads
+    buffer = counter_buffers.get_counter_buffer()
+    if buffer is not None:
+        buffer.add(post_id, VIEWS, 1)
+        start_counter_flusher()
+        return
+    Posts.objects.using(PRIMARY).filter(pk=post_id).update(
+        **{VIEWS: counter_value(VIEWS, 1)}
+    )
+
+
+def apply_post_counter_deltas(deltas):
+    # {(post_id, field): delta} as one UPDATE per counter column; rows are
+    # listed in pk order so concurrent flushes lock them in the same order
+    by_field = defaultdict(dict)
+    for (post_id, field), delta in deltas.items():
+        if delta:
+            by_field[field][post_id] = delta
+    with transaction.atomic():
+        for field, changes in by_field.items():
+            change = Case(
+                *(
+                    When(pk=pk, then=Value(delta))
+                    for pk, delta in sorted(changes.items())
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            Posts.objects.filter(pk__in=changes).update(
+                **{field: Greatest(F(field) + change, 0)}
+            )
+    return sum(len(changes) for changes in by_field.values())
+
+
+def flush_post_counters():
+    # Apply everything buffered so far; returns the number of counters changed
+    buffer = counter_buffers.get_counter_buffer()
+    if buffer is None:
+        return 0
+    deltas = buffer.drain()
+    try:
+        return apply_post_counter_deltas(deltas)
+    except Exception:
+        # Put the batch back rather than lose it; the next flush retries
+        for (post_id, field), delta in deltas.items():
+            buffer.add(post_id, field, delta)
+        raise
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def start_counter_flusher():
+    # One daemon thread per process flushes every BLOG_COUNTER_FLUSH_INTERVAL
+    # seconds; 0 leaves flushing to the flush_post_counters command
+    global _flusher_pid
+    if not counter_buffers.FLUSH_INTERVAL or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        # The pid check restarts the thread in forked workers
+        _flusher_pid = os.getpid()
+        threading.Thread(
+            target=_flush_periodically, name="post-counter-flusher", daemon=True
+        ).start()
+        atexit.register(_flush_in_worker)
+
+
+def _flush_periodically():
+    stop = threading.Event()
+    while not stop.wait(counter_buffers.FLUSH_INTERVAL):
+        _flush_in_worker()
+
+
+def _flush_in_worker():
+    try:
+        flush_post_counters()
+    except Exception:
+        logger.exception("Flushing buffered post counters failed")
+    finally:
+        # The flusher thread owns its connections, close them between runs
+        connections.close_all()
+
+
+def adjust_author_follower_count(user_id, delta):
+    if delta > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+    AuthorStats.objects.filter(user_id=user_id).update(
+        follower_count=counter_value("follower_count", delta)
+    )
+
+
+def _count_subquery(model, **filters):
+    counts = (
+        model.objects.filter(post=OuterRef("pk"), **filters)
+        .order_by()
+        .values("post")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def rebuild_post_counters(queryset=None):
+    # Recompute every counter from the source tables in one UPDATE statement
+    # Apply pending buffered deltas first; the recount then overwrites them
+    # for the rebuilt posts instead of having them added on top later
+    flush_post_counters()
+    if queryset is None:
+        queryset = Posts.objects.all()
+    return queryset.update(
+        likes_count=_count_subquery(Likes),
+        top_level_comment_count=_count_subquery(Comments, parent=None),
+        saved_count=_count_subquery(Saved),
+    )
+
+
+def rebuild_author_stats(batch_size=1000):
+    # Replace the leaderboard with fresh counts streamed from Followings
+    counts = (
+        Followings.objects.order_by()
+        .values("following_id")
+        .annotate(total=Count("pk"))
+        .values_list("following_id", "total")
+        .iterator(chunk_size=batch_size)
+    )
+    rows = (
+        AuthorStats(user_id=user_id, follower_count=total) for user_id, total in counts
+    )
+    created = 0
+    with transaction.atomic():
+        AuthorStats.objects.all().delete()
+        while batch := list(islice(rows, batch_size)):
+            AuthorStats.objects.bulk_create(batch)
+            created += len(batch)
+    return created
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImageDerivative, Posts
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop). Cropped variants are filled to the exact box,
+# the others are scaled down to fit inside it and never upscaled
+VARIANTS = {
+    "card": (480, 270, True),
+    "hero": (1600, 900, False),
+    "avatar": (128, 128, True),
+}
+POST_THUMBNAIL_VARIANTS = ("card", "hero")
+PROFILE_IMAGE_VARIANTS = ("avatar",)
+# format: (Pillow format, extension, save options)
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2),
+            thread_name_prefix="image-derivatives",
+        )
+    return _executor
+
+
+def schedule_derivatives(source, variants):
+    # Queue the resize work once the upload is committed; IMAGE_DERIVATIVES_SYNC
+    # runs it inline instead (tests, management commands)
+    if not source:
+        return
+    if getattr(settings, "IMAGE_DERIVATIVES_SYNC", False):
+        transaction.on_commit(lambda: generate_derivatives(source, variants))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(_generate_in_worker, source, variants)
+        )
+
+
+def _generate_in_worker(source, variants):
+    try:
+        generate_derivatives(source, variants)
+    except Exception:
+        logger.exception("Generating derivatives for %s failed", source)
+    finally:
+        # Worker threads own their connections, close them between jobs
+        connections.close_all()
+
+
+def _render(image, variant, fmt):
+    width, height, crop = VARIANTS[variant]
+    if crop:
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((width, height), Image.LANCZOS)
+    pillow_format, _, options = FORMATS[fmt]
+    if pillow_format == "JPEG" and resized.mode != "RGB":
+        resized = resized.convert("RGB")
+    buffer = BytesIO()
+    resized.save(buffer, pillow_format, **options)
+    return resized.size, buffer.getvalue()
+
+
+def generate_derivatives(source, variants):
+    done = set(
+        ImageDerivative.objects.filter(source=source).values_list("variant", "format")
+    )
+    todo = [(v, f) for v in variants for f in FORMATS if (v, f) not in done]
+    if not todo:
+        return 0
+    try:
+        with default_storage.open(source, "rb") as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+    except (OSError, ValueError):
+        logger.warning("Cannot read image %s, skipping derivatives", source)
+        return 0
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    for variant, fmt in todo:
+        (width, height), payload = _render(image, variant, fmt)
+        extension = FORMATS[fmt][1]
+        name = default_storage.save(
+            f"derivatives/{variant}/{stem}-{digest}.{extension}", ContentFile(payload)
+        )
+        ImageDerivative.objects.get_or_create(
+            source=source,
+            variant=variant,
+            format=fmt,
+            defaults={"width": width, "height": height, "file": name},
+        )
+    # Retire cached post bodies that embed this thumbnail's srcset
+    Posts.objects.filter(thumbnail=source).update(updated_at=timezone.now())
+    return len(todo)
+
+
+def load_srcsets(sources):
+    # {source: {variant: {"width": w, "height": h, "webp": url, "jpeg": url}}}
+    srcsets = {source: {} for source in sources if source}
+    if not srcsets:
+        return srcsets
+    derivatives = ImageDerivative.objects.filter(source__in=srcsets).order_by()
+    for derivative in derivatives:
+        entry = srcsets[derivative.source].setdefault(
+            derivative.variant,
+            {"width": derivative.width, "height": derivative.height},
+        )
+        entry[derivative.format] = derivative.file.url
+    return srcsets
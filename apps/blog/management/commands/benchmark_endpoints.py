@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.blog import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, call every blog and user endpoint and "
+        "compare query counts, p50/p95 latency and peak allocation with the "
+        "committed baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed latency/memory growth over the baseline, as a fraction",
+        )
+        parser.add_argument("--baseline", default=str(benchmarks.BASELINE_PATH))
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Write the measured numbers as the new baseline",
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="Only benchmark the named endpoint (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        # Never seed the configured database: the test runner's database is
+        # created for the run and dropped afterwards
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with benchmarks.benchmark_environment():
+                fixtures = benchmarks.seed_benchmark_data()
+                results = benchmarks.run_benchmarks(
+                    fixtures, options["repeat"], options["endpoints"]
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{'endpoint':<24} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9}"
+        )
+        for name, measured in results.items():
+            self.stdout.write(
+                f"{name:<24} {measured['queries']:>7} {measured['p50_ms']:>9.2f} "
+                f"{measured['p95_ms']:>9.2f} {measured['peak_kib']:>9.1f}"
+            )
+
+        if options["update_baseline"]:
+            if options["endpoints"]:
+                baseline = benchmarks.load_baseline(options["baseline"])
+                results = {**baseline, **results}
+            benchmarks.write_baseline(results, options["baseline"])
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['baseline']}"))
+            return
+
+        regressions = benchmarks.find_regressions(
+            results, benchmarks.load_baseline(options["baseline"]), options["tolerance"]
+        )
+        if regressions:
+            raise CommandError("Regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions"))
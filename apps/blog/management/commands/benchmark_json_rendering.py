@@ -0,0 +1,87 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.blog.models import Posts
+from apps.blog.renderers import ORJSONParser, ORJSONRenderer
+from apps.blog.serializers import BlogSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time serializing and rendering one page of posts with DRF's stock "
+        "JSON renderer/parser against the orjson ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        serializer_class = BlogSerializer
+        posts = list(
+            serializer_class.setup_eager_loading(Posts.objects.all()).order_by(
+                "-created_at", "-id"
+            )[: options["posts"]]
+        )
+        if not posts:
+            raise CommandError("Seed some posts first")
+        repeat = options["repeat"]
+
+        def page():
+            return {
+                "data": {
+                    "next": None,
+                    "results": serializer_class(posts, many=True).data,
+                },
+                "message": "Successfully retrieved all blogs",
+                "status": 200,
+            }
+
+        # Serializer output is the same for both renderers, time it once
+        serialize_ms = self.time(page, repeat)
+        envelope = page()
+        stock = JSONRenderer().render(envelope)
+        fast = ORJSONRenderer().render(envelope)
+        if JSONParser().parse(self.stream(stock)) != ORJSONParser().parse(
+            self.stream(fast)
+        ):
+            raise CommandError("Renderers disagree on the page contents")
+
+        self.stdout.write(
+            f"{len(posts)} posts, {len(fast)} bytes, best of {repeat} runs (ms)\n"
+            f"{'step':<12} {'drf json':>10} {'orjson':>10} {'speedup':>8}\n"
+            f"{'serialize':<12} {serialize_ms:>10.3f}"
+        )
+        for step, stock_fn, fast_fn in (
+            (
+                "render",
+                lambda: JSONRenderer().render(envelope),
+                lambda: ORJSONRenderer().render(envelope),
+            ),
+            (
+                "parse",
+                lambda: JSONParser().parse(self.stream(stock)),
+                lambda: ORJSONParser().parse(self.stream(fast)),
+            ),
+        ):
+            stock_ms = self.time(stock_fn, repeat)
+            fast_ms = self.time(fast_fn, repeat)
+            self.stdout.write(
+                f"{step:<12} {stock_ms:>10.3f} {fast_ms:>10.3f} "
+                f"{stock_ms / fast_ms:>7.1f}x"
+            )
+
+    def time(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
+
+    def stream(self, payload):
+        return BytesIO(payload)
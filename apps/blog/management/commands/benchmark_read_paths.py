@@ -0,0 +1,95 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.blog.models import Posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare request throughput of the WSGI read endpoints with their "
+        "async ASGI counterparts, in-process against the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--username",
+            help="User to authenticate as (defaults to the first user)",
+        )
+
+    def handle(self, *args, **options):
+        # The test clients send requests as "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        users = User.objects.order_by("pk")
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        post = Posts.objects.order_by("-likes_count").first()
+        if user is None or post is None:
+            raise CommandError("Seed at least one user and one post first")
+
+        headers = {"authorization": f"Bearer {AccessToken.for_user(user)}"}
+        endpoints = [
+            ("feed", "/"),
+            ("blog", f"/blog/{post.pk}/"),
+            ("comments", f"/blog/{post.pk}/comments"),
+            ("profile", f"/profile/{user.username}/"),
+        ]
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        self.stdout.write(
+            f"{total} requests per endpoint, concurrency {concurrency}\n"
+            f"{'endpoint':<10} {'wsgi req/s':>12} {'asgi req/s':>12} {'ratio':>7}"
+        )
+        for name, path in endpoints:
+            wsgi = self.run_wsgi(path, headers, total, concurrency)
+            asgi = asyncio.run(
+                self.run_asgi(f"/async{path}", headers, total, concurrency)
+            )
+            self.stdout.write(
+                f"{name:<10} {wsgi:>12.1f} {asgi:>12.1f} {asgi / wsgi:>6.2f}x"
+            )
+
+    def run_wsgi(self, path, headers, total, concurrency):
+        def worker(count):
+            client = Client()
+            try:
+                for _ in range(count):
+                    self.expect_ok(client.get(path, headers=headers), path)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, self.split(total, concurrency)))
+        return total / (time.perf_counter() - started)
+
+    async def run_asgi(self, path, headers, total, concurrency):
+        async def worker(count):
+            client = AsyncClient()
+            for _ in range(count):
+                self.expect_ok(await client.get(path, headers=headers), path)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in self.split(total, concurrency)))
+        return total / (time.perf_counter() - started)
+
+    def expect_ok(self, response, path):
+        if response.status_code != 200:
+            raise CommandError(f"{path} returned {response.status_code}")
+
+    def split(self, total, parts):
+        return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
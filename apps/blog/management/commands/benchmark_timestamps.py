@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from dateutil import parser
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.blog.serializers import RelativeTimestampField
+
+
+def legacy_format_date_time(date_time_str):
+    # The formatter RelativeTimestampField replaced, kept as the baseline
+    ist = pytz.timezone("Asia/Kolkata")
+    date_time = parser.parse(date_time_str)
+    date_time_ist = date_time.astimezone(ist)
+    today_ist = datetime.now(ist).date()
+    if date_time_ist.date() == today_ist:
+        return date_time_ist.strftime("%I:%M %p")
+    else:
+        return date_time_ist.strftime("%B %d, %Y")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-comment cost of formatting created_at from the "
+        "serialized ISO string against RelativeTimestampField"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Half of the page from today, half older
+        values = [now - timedelta(minutes=17 * i) for i in range(options["comments"])]
+        iso_field = serializers.DateTimeField()
+
+        def legacy():
+            # What the views did: the ISO string from DRF, then re-parse it
+            for value in values:
+                legacy_format_date_time(iso_field.to_representation(value))
+
+        def field():
+            # One serializer (and so one context) per request
+            timestamp = RelativeTimestampField()
+            timestamp.bind("created_at", serializers.Serializer())
+            for value in values:
+                timestamp.to_representation(value)
+
+        legacy_us = self.time(legacy, options["repeat"]) / len(values)
+        field_us = self.time(field, options["repeat"]) / len(values)
+        self.stdout.write(
+            f"{len(values)} timestamps, best of {options['repeat']} runs\n"
+            f"legacy format_date_time  {legacy_us:8.2f} us/comment\n"
+            f"RelativeTimestampField   {field_us:8.2f} us/comment\n"
+            f"speedup                  {legacy_us / field_us:8.1f}x"
+        )
+
+    def time(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best * 1_000_000
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog import counter_buffers
+from apps.blog.counters import flush_post_counters
+
+
+class Command(BaseCommand):
+    help = "Apply the like/comment/saved counter deltas buffered by BLOG_COUNTER_BUFFER"
+
+    def handle(self, *args, **options):
+        if counter_buffers.get_counter_buffer() is None:
+            self.stdout.write(
+                "BLOG_COUNTER_BUFFER is not set, counters are written through"
+            )
+            return
+        updated = flush_post_counters()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {updated} counters"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.derivatives import (
+    POST_THUMBNAIL_VARIANTS,
+    PROFILE_IMAGE_VARIANTS,
+    generate_derivatives,
+)
+from apps.blog.models import Posts
+from apps.users.models import profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Render missing thumbnail derivatives for post thumbnails and profile "
+        "images uploaded before the pipeline existed"
+    )
+
+    def handle(self, *args, **options):
+        sources = [
+            (Posts.objects.exclude(thumbnail=""), "thumbnail", POST_THUMBNAIL_VARIANTS),
+            (profile.objects.exclude(image=""), "image", PROFILE_IMAGE_VARIANTS),
+        ]
+        total = 0
+        for queryset, field, variants in sources:
+            names = queryset.values_list(field, flat=True).distinct().order_by()
+            for name in names.iterator():
+                total += generate_derivatives(name, variants)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {total} derivatives"))
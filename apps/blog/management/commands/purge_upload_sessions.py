@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.uploads import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired chunked upload sessions and their partial files"
+
+    def handle(self, *args, **options):
+        total = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} upload sessions"))
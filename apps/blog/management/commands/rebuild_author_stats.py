@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.counters import rebuild_author_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AuthorStats follower-count leaderboard from Followings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows written per bulk insert",
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_author_stats(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {created} authors"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.blobs import rebuild_blob_refcounts
+
+
+class Command(BaseCommand):
+    help = "Recount references to content-addressed media blobs"
+
+    def handle(self, *args, **options):
+        total = rebuild_blob_refcounts()
+        self.stdout.write(self.style.SUCCESS(f"Counted {total} blobs"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.suggestions import rebuild_follow_suggestions
+
+
+class Command(BaseCommand):
+    help = "Rebuild the friend-of-friend FollowSuggestion table from Followings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows written per bulk insert",
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_follow_suggestions(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} follow suggestions"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.cache import invalidate_cached_post
+from apps.blog.content import derive_fields
+from apps.blog.models import Posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored excerpt, word count, reading time, first image "
+        "and HTML of every post, e.g. after the renderer changes"
+    )
+
+    def handle(self, *args, **options):
+        posts = Posts.objects.only("pk", "content", "updated_at").order_by("pk")
+        total = 0
+        for post in posts.iterator(chunk_size=500):
+            # update() skips the save signals; the body itself is unchanged
+            Posts.objects.filter(pk=post.pk).update(**derive_fields(post.content))
+            # updated_at stays put, so the cached body keyed on it goes instead
+            invalidate_cached_post(post.pk, post.updated_at)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} posts"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.counters import rebuild_post_counters
+from apps.blog.models import Posts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized like/comment/saved counters on Posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--post",
+            type=int,
+            action="append",
+            dest="post_ids",
+            help="Only rebuild the given post id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Posts.objects.all()
+        if options["post_ids"]:
+            queryset = queryset.filter(pk__in=options["post_ids"])
+        updated = rebuild_post_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} posts"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over Posts"
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} posts"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = "Rebuild the fan-out home timelines from Followings and Posts"
+
+    def handle(self, *args, **options):
+        total = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} timeline entries"))
@@ -0,0 +1,441 @@
+import json
+import time
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import cache
+from itertools import accumulate, islice
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.blog.content import derive_fields
+from apps.blog.models import Comments, Followings, Likes, Posts, Tags
+
+USERNAME_PREFIX = "seed-user-"
+TAG_PREFIX = "topic-"
+WORDS = (
+    "api async blog cache cursor data database deploy design django index "
+    "join latency memory model network orm page python query queue read "
+    "replica request response schema search server shard signal sql stream "
+    "table test thread timeline token traffic update user view write worker"
+).split()
+# Distinct post bodies; posts pick one each
+POST_BODIES = 4096
+# Commands that rebuild what the model signals would have maintained
+REBUILD_COMMANDS = (
+    "rebuild_post_counters",
+    "rebuild_author_stats",
+    "rebuild_follow_suggestions",
+    "rebuild_timelines",
+    "rebuild_search_index",
+)
+
+
+class PowerLaw:
+    # Picks 0..n-1 with weight 1 / (rank + 1) ** exponent. Ranks are a seeded
+    # shuffle, so popularity is not tied to insertion order
+    def __init__(self, n, exponent, rng):
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.weights = list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+    def pick(self, rng):
+        rank = bisect(self.weights, rng.random() * self.weights[-1])
+        return self.order[min(rank, len(self.order) - 1)]
+
+    def sample(self, rng, k, exclude=None):
+        # k distinct picks; rejection sampling while k is small next to n
+        if k > len(self.order) // 2:
+            candidates = [index for index in range(len(self.order)) if index != exclude]
+            return set(rng.sample(candidates, min(k, len(candidates))))
+        picked = set()
+        while len(picked) < k:
+            index = self.pick(rng)
+            if index != exclude:
+                picked.add(index)
+        return picked
+
+
+def heavy_tail(rng, mean, cap):
+    # Pareto-distributed count with the given mean: most rows get a few,
+    # a handful get very many
+    alpha = 1.5
+    return min(cap, int(mean * (alpha - 1) / alpha * rng.paretovariate(alpha)))
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    # bulk_create would stamp auto_now/auto_now_add fields with the current
+    # time; seeded rows carry their own history
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic dataset (users, tags, posts, comment "
+        "trees, likes, power-law followings) with batched bulk inserts. "
+        "Deterministic for a given --seed and resumable: rerunning continues "
+        "where an interrupted run stopped. About 10M rows: --users 100000 "
+        "--posts 1000000 --comments-per-post 3 --likes-per-post 4 "
+        "--follows-per-user 20"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--posts", type=int, default=100_000)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument(
+            "--comments-per-post",
+            type=float,
+            default=3,
+            help="Mean comments per post, replies included",
+        )
+        parser.add_argument("--likes-per-post", type=float, default=5)
+        parser.add_argument("--follows-per-user", type=float, default=20)
+        parser.add_argument("--days", type=int, default=365, help="History span")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--password",
+            default="seed-password",
+            help="Password of every generated user",
+        )
+        parser.add_argument(
+            "--skip-rebuild",
+            action="store_true",
+            help="Leave counters, timelines, suggestions and search stale",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seed = options["seed"]
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now().replace(microsecond=0)
+        self.tune_connection()
+
+        self.run_phase("users", self.seed_users)
+        self.run_phase("tags", self.seed_tags)
+        # Every later phase draws users by popularity and walks them by pk
+        self.user_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        self.popularity = PowerLaw(
+            len(self.user_ids), 1.1, Random(f"{self.seed}:popularity")
+        )
+        self.run_phase("posts", self.seed_posts)
+        self.run_phase("comments", self.seed_comments)
+        self.run_phase("likes", self.seed_likes)
+        self.run_phase("followings", self.seed_followings)
+
+        if not options["skip_rebuild"]:
+            # bulk_create skips the signals that keep these tables in sync
+            for command in REBUILD_COMMANDS:
+                call_command(command, stdout=self.stdout)
+
+    def tune_connection(self):
+        # Seeding is restartable, so durability of each commit does not matter.
+        # Left alone inside a transaction (tests), where SQLite refuses it
+        if connection.in_atomic_block:
+            return
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("PRAGMA synchronous = OFF")
+            elif connection.vendor == "postgresql":
+                cursor.execute("SET synchronous_commit = off")
+
+    def run_phase(self, name, seeder):
+        started = time.perf_counter()
+        created = seeder()
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{name:<12} {created:>10} rows {elapsed:>8.1f}s {rate:>10.0f}/s"
+        )
+
+    @contextmanager
+    def batch(self):
+        # One transaction per batch: an interrupted run leaves whole batches,
+        # which is what the resume logic of each phase relies on
+        with transaction.atomic():
+            yield
+        # With DEBUG on, the multi-megabyte INSERTs would pile up in the log
+        reset_queries()
+
+    def write(self, model, rows):
+        total = 0
+        while batch := list(islice(rows, self.batch_size)):
+            with self.batch():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        return total
+
+    def seed_users(self):
+        existing = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        password = make_password(self.options["password"])
+        start = self.now - timedelta(days=self.options["days"])
+
+        def rows():
+            for n in range(existing, self.options["users"]):
+                rng = Random(f"{self.seed}:user:{n}")
+                yield User(
+                    username=f"{USERNAME_PREFIX}{n}",
+                    email=f"{USERNAME_PREFIX}{n}@example.com",
+                    first_name=rng.choice(WORDS).title(),
+                    last_name=rng.choice(WORDS).title(),
+                    password=password,
+                    date_joined=start,
+                )
+
+        return self.write(User, rows())
+
+    def seed_tags(self):
+        tags = [
+            Tags(value=f"{TAG_PREFIX}{n}", label=f"Topic {n}")
+            for n in range(self.options["tags"])
+        ]
+        Tags.objects.bulk_create(tags, ignore_conflicts=True)
+        self.tag_ids = list(
+            Tags.objects.filter(value__startswith=TAG_PREFIX)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        return len(tags)
+
+    def seeded_posts(self):
+        return Posts.objects.filter(author__username__startswith=USERNAME_PREFIX)
+
+    def seed_posts(self):
+        existing = self.seeded_posts().count()
+        span = self.options["days"] * 86400
+        tag_popularity = PowerLaw(len(self.tag_ids), 1.0, Random(f"{self.seed}:tags"))
+        Tagging = Posts.tags.through
+        total = 0
+
+        def rows(first, last):
+            for n in range(first, last):
+                rng = Random(f"{self.seed}:post:{n}")
+                title, subtitle, content, derived = self.post_body(
+                    rng.randrange(POST_BODIES)
+                )
+                # Posts are written in time order, so pk order is time order
+                created_at = self.now - timedelta(
+                    seconds=span * (1 - n / max(1, self.options["posts"]))
+                )
+                yield Posts(
+                    title=title,
+                    subtitle=subtitle,
+                    author_id=self.user_ids[self.popularity.pick(rng)],
+                    content=content,
+                    created_at=created_at,
+                    updated_at=created_at,
+                    **derived,
+                ), [
+                    self.tag_ids[index]
+                    for index in tag_popularity.sample(
+                        rng, min(len(self.tag_ids), rng.randint(1, 3))
+                    )
+                ]
+
+        created_at = Posts._meta.get_field("created_at")
+        updated_at = Posts._meta.get_field("updated_at")
+        with explicit_timestamps(created_at, updated_at):
+            for first in range(existing, self.options["posts"], self.batch_size):
+                last = min(first + self.batch_size, self.options["posts"])
+                batch = list(rows(first, last))
+                with self.batch():
+                    posts = self.insert_returning_ids(
+                        Posts, [post for post, _ in batch]
+                    )
+                    Tagging.objects.bulk_create(
+                        Tagging(posts_id=post.pk, tags_id=tag_id)
+                        for post, (_, tag_ids) in zip(posts, batch)
+                        for tag_id in tag_ids
+                    )
+                total += len(batch)
+        return total
+
+    @cache
+    def post_body(self, index):
+        # Rendering the derived fields is the costliest part of a post, so
+        # bodies come from a fixed pool and are rendered once each
+        rng = Random(f"{self.seed}:body:{index}")
+        title = sentence(rng, 3, 8)
+        subtitle = sentence(rng, 6, 14)
+        blocks = [
+            {"type": "heading", "content": [{"text": title}]},
+            {"type": "paragraph", "content": [{"text": subtitle}]},
+        ]
+        blocks += [
+            {"type": "paragraph", "content": [{"text": sentence(rng, 20, 60)}]}
+            for _ in range(rng.randint(2, 6))
+        ]
+        content = json.dumps(blocks)
+        return title, subtitle, content, derive_fields(content)
+
+    def insert_returning_ids(self, model, objs):
+        # Comment replies and post tags need the new primary keys. Backends
+        # without INSERT ... RETURNING (MySQL) read them back: this command is
+        # the only writer, so the rows above the old maximum are the batch, in
+        # insertion order
+        last = model.objects.aggregate(last=Max("pk"))["last"] or 0
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if objs and objs[0].pk is None:
+            ids = (
+                model.objects.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            for obj, pk in zip(objs, ids):
+                obj.pk = pk
+        return objs
+
+    def post_batches(self, after):
+        # Seeded posts in pk order after the given pk, one batch at a time
+        last = after or 0
+        while True:
+            batch = list(
+                self.seeded_posts()
+                .filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", "created_at")[: self.batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            last = batch[-1][0]
+
+    def resume_after(self, queryset, field):
+        # Phases walk their parent rows in pk order and commit whole parents
+        # per batch, so the highest parent written is where a rerun continues
+        return queryset.aggregate(last=Max(field))["last"]
+
+    def seed_comments(self):
+        mean = self.options["comments_per_post"]
+        after = self.resume_after(
+            Comments.objects.filter(post__in=self.seeded_posts()), "post"
+        )
+        total = 0
+        created_at = Comments._meta.get_field("created_at")
+        updated_at = Comments._meta.get_field("updated_at")
+        with explicit_timestamps(created_at, updated_at):
+            for batch in self.post_batches(after):
+                top_level, replies = [], []
+                for post_id, posted_at in batch:
+                    rng = Random(f"{self.seed}:comments:{post_id}")
+                    count = heavy_tail(rng, mean, len(self.user_ids))
+                    # Roughly a third of a thread are replies, the deeper
+                    # ones answering earlier replies
+                    thread = []
+                    when = posted_at
+                    for n in range(count):
+                        when = min(
+                            self.now, when + timedelta(minutes=rng.randint(1, 600))
+                        )
+                        comment = self.comment(rng, post_id, when)
+                        if thread and n >= count - count // 3:
+                            replies.append((rng.choice(thread), comment))
+                        else:
+                            top_level.append(comment)
+                        thread.append(comment)
+                total += len(top_level) + len(replies)
+                with self.batch():
+                    self.insert_returning_ids(Comments, top_level)
+                    # Replies go in by depth: a parent always has its pk first
+                    while replies:
+                        ready = [pair for pair in replies if pair[0].pk is not None]
+                        for parent, reply in ready:
+                            reply.parent_id = parent.pk
+                        self.insert_returning_ids(
+                            Comments, [reply for _, reply in ready]
+                        )
+                        replies = [pair for pair in replies if pair[1].pk is None]
+        return total
+
+    def comment(self, rng, post_id, when):
+        return Comments(
+            message=sentence(rng, 3, 30)[:250],
+            author_id=self.user_ids[rng.randrange(len(self.user_ids))],
+            post_id=post_id,
+            created_at=when,
+            updated_at=when,
+        )
+
+    def seed_likes(self):
+        mean = self.options["likes_per_post"]
+        population = len(self.user_ids)
+
+        def rows(after):
+            for batch in self.post_batches(after):
+                for post_id, _ in batch:
+                    rng = Random(f"{self.seed}:likes:{post_id}")
+                    for index in rng.sample(
+                        range(population), heavy_tail(rng, mean, population)
+                    ):
+                        yield Likes(author_id=self.user_ids[index], post_id=post_id)
+
+        after = self.resume_after(
+            Likes.objects.filter(post__in=self.seeded_posts()), "post"
+        )
+        return self.write_grouped(Likes, rows(after), "post_id")
+
+    def seed_followings(self):
+        mean = self.options["follows_per_user"]
+        population = len(self.user_ids)
+        seeded = Followings.objects.filter(
+            follower__username__startswith=USERNAME_PREFIX
+        )
+        last = self.resume_after(seeded, "follower") or 0
+
+        def rows():
+            for index, follower_id in enumerate(self.user_ids):
+                if follower_id <= last:
+                    continue
+                rng = Random(f"{self.seed}:follows:{follower_id}")
+                # Out-degree is heavy tailed too; targets follow popularity
+                count = heavy_tail(rng, mean, population - 1)
+                for target in self.popularity.sample(rng, count, exclude=index):
+                    yield Followings(
+                        follower_id=follower_id, following_id=self.user_ids[target]
+                    )
+
+        return self.write_grouped(Followings, rows(), "follower_id")
+
+    def write_grouped(self, model, rows, key):
+        # Like write(), but a batch never splits the rows of one parent, so
+        # "highest parent written" is an exact resume point
+        total = 0
+        pending = []
+        for row in rows:
+            if len(pending) >= self.batch_size and getattr(pending[-1], key) != getattr(
+                row, key
+            ):
+                with self.batch():
+                    model.objects.bulk_create(pending, batch_size=self.batch_size)
+                total += len(pending)
+                pending = []
+            pending.append(row)
+        if pending:
+            with self.batch():
+                model.objects.bulk_create(pending, batch_size=self.batch_size)
+            total += len(pending)
+        return total
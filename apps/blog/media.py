@@ -0,0 +1,151 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import blob_sha256
+
+# Serves MEDIA_ROOT in place of django.conf.urls.static. With MEDIA_SENDFILE
+# set to "x-sendfile" (Apache, lighttpd) or "x-accel-redirect" (nginx) the
+# front server sends the bytes; otherwise FileResponse hands the open file to
+# the WSGI server's file_wrapper (sendfile) and Python never copies it
+
+SENDFILE = getattr(settings, "MEDIA_SENDFILE", "")
+ACCEL_REDIRECT_PREFIX = getattr(
+    settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/"
+)
+CACHE_MAX_AGE = getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile:
+    # Read-only view of [start, start + length) of an open file
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def media_etag(name, stat):
+    # Content-addressed names are the SHA-256 of the bytes, a strong ETag as
+    # is; anything else is versioned by its modification time and size
+    sha256 = blob_sha256(name)
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    # Single byte ranges only; returns (start, end) inclusive, None to send
+    # the whole file, or raises ValueError when it cannot be satisfied
+    match = RANGE_RE.match(header or "")
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+@require_safe
+def serveMedia(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    name = path.replace(os.sep, "/")
+    etag = media_etag(name, stat)
+    if blob_sha256(name):
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = f"public, max-age={CACHE_MAX_AGE}"
+
+    def finish(response):
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(stat.st_mtime)
+        response.headers["Cache-Control"] = cache_control
+        response.headers["Accept-Ranges"] = "bytes"
+        return response
+
+    # If-None-Match / If-Modified-Since and friends, answered without I/O
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if conditional is not None:
+        return finish(conditional)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    if SENDFILE:
+        # The front server reads the file and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if SENDFILE == "x-accel-redirect":
+            response.headers["X-Accel-Redirect"] = ACCEL_REDIRECT_PREFIX + name
+        else:
+            response.headers["X-Sendfile"] = full_path
+        return finish(response)
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers["Content-Range"] = f"bytes */{size}"
+            return finish(response)
+
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        if end == size - 1:
+            # Open-ended ranges keep the real file so sendfile still applies
+            file.seek(start)
+            response = FileResponse(file, content_type=content_type, status=206)
+        else:
+            response = FileResponse(
+                RangeFile(file, start, length), content_type=content_type, status=206
+            )
+        response.headers["Content-Length"] = str(length)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return finish(response)
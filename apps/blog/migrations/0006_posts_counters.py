@@ -0,0 +1,52 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Posts = apps.get_model('blog', 'Posts')
+
+    def count_of(model_name, **filters):
+        model = apps.get_model('blog', model_name)
+        counts = (
+            model.objects.filter(post=OuterRef('pk'), **filters)
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Posts.objects.update(
+        likes_count=count_of('Likes'),
+        top_level_comment_count=count_of('Comments', parent=None),
+        saved_count=count_of('Saved'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_alter_followings_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='posts',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='posts',
+            name='saved_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='posts',
+            name='top_level_comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
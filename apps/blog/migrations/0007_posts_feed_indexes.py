@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_posts_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_author_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model("blog", "AuthorStats")
+    Followings = apps.get_model("blog", "Followings")
+    counts = (
+        Followings.objects.order_by()
+        .values("following_id")
+        .annotate(total=Count("pk"))
+        .values_list("following_id", "total")
+    )
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(user_id=user_id, follower_count=total)
+            for user_id, total in counts
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("blog", "0007_posts_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="author_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("follower_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-follower_count", "user"],
+                        name="author_stats_leaderboard_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
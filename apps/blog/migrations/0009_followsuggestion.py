@@ -0,0 +1,86 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, F, OuterRef
+
+
+def backfill_follow_suggestions(apps, schema_editor):
+    Followings = apps.get_model("blog", "Followings")
+    FollowSuggestion = apps.get_model("blog", "FollowSuggestion")
+    scores = (
+        Followings.objects.order_by()
+        .annotate(user=F("follower__followers__follower"))
+        .filter(user__isnull=False)
+        .exclude(following_id=F("user"))
+        .exclude(
+            Exists(
+                Followings.objects.filter(
+                    follower_id=OuterRef("user"), following_id=OuterRef("following_id")
+                )
+            )
+        )
+        .values("user", "following_id")
+        .annotate(score=Count("pk"))
+        .values_list("user", "following_id", "score")
+    )
+    FollowSuggestion.objects.bulk_create(
+        (
+            FollowSuggestion(user_id=user_id, candidate_id=candidate_id, score=score)
+            for user_id, candidate_id, score in scores
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0008_authorstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.PositiveIntegerField(default=0)),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="suggested_to",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follow_suggestions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-score", "candidate"],
+                        name="follow_suggestion_rank_idx",
+                    )
+                ],
+                "unique_together": {("user", "candidate")},
+            },
+        ),
+        migrations.RunPython(backfill_follow_suggestions, migrations.RunPython.noop),
+    ]
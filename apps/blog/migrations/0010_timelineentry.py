@@ -0,0 +1,119 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:17
+
+from itertools import islice
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timelines(apps, schema_editor):
+    # Copy each pushed author's recent posts into their followers' timelines,
+    # as apps.blog.timeline.rebuild_timelines does, so existing users do not
+    # start from an empty timeline
+    AuthorStats = apps.get_model("blog", "AuthorStats")
+    Followings = apps.get_model("blog", "Followings")
+    Posts = apps.get_model("blog", "Posts")
+    TimelineEntry = apps.get_model("blog", "TimelineEntry")
+    db = schema_editor.connection.alias
+    threshold = getattr(settings, "TIMELINE_FANOUT_THRESHOLD", 5000)
+    backfill_size = getattr(settings, "TIMELINE_FOLLOW_BACKFILL_SIZE", 50)
+    batch_size = getattr(settings, "TIMELINE_FANOUT_BATCH_SIZE", 1000)
+
+    pull_authors = AuthorStats.objects.using(db).filter(follower_count__gte=threshold)
+    author_ids = list(
+        Followings.objects.using(db)
+        .exclude(following_id__in=pull_authors.values("user_id"))
+        .order_by()
+        .values_list("following_id", flat=True)
+        .distinct()
+    )
+    for author_id in author_ids:
+        recent = list(
+            Posts.objects.using(db)
+            .filter(author_id=author_id)
+            .order_by("-created_at", "-id")
+            .values_list("id", "created_at")[:backfill_size]
+        )
+        if not recent:
+            continue
+        follower_ids = (
+            Followings.objects.using(db)
+            .filter(following_id=author_id)
+            .values_list("follower_id", flat=True)
+        )
+        entries = (
+            TimelineEntry(
+                user_id=follower_id,
+                post_id=post_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for follower_id in follower_ids.iterator(chunk_size=batch_size)
+            for post_id, created_at in recent
+        )
+        while batch := list(islice(entries, batch_size)):
+            TimelineEntry.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0009_followsuggestion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="blog.posts",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at", "-post"],
+                        name="timeline_read_idx",
+                    ),
+                    models.Index(
+                        fields=["user", "author"], name="timeline_unfollow_idx"
+                    ),
+                ],
+                "unique_together": {("user", "post")},
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
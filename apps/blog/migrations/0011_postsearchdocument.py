@@ -0,0 +1,153 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:19
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of the text extraction in apps.blog.content and
+# apps.blog.search.document_text as of this migration
+
+
+def parse_blocks(content):
+    if isinstance(content, list):
+        return content
+    try:
+        blocks = json.loads(content)
+    except (TypeError, ValueError):
+        return []
+    return blocks if isinstance(blocks, list) else []
+
+
+def inline_text(inline):
+    if isinstance(inline, str):
+        return inline
+    if isinstance(inline, dict):
+        if inline.get("type") == "tableContent":
+            rows = inline.get("rows")
+            return " ".join(
+                inline_text(cell)
+                for row in (rows if isinstance(rows, list) else [])
+                if isinstance(row, dict) and isinstance(row.get("cells"), list)
+                for cell in row["cells"]
+            )
+        if "text" in inline:
+            text = inline.get("text")
+            return text if isinstance(text, str) else ""
+        return inline_text(inline.get("content", []))
+    if isinstance(inline, list):
+        return "".join(inline_text(item) for item in inline)
+    return ""
+
+
+def iter_blocks(blocks):
+    for block in blocks:
+        if not isinstance(block, dict):
+            continue
+        yield block
+        children = block.get("children")
+        yield from iter_blocks(children if isinstance(children, list) else [])
+
+
+def document_text(post):
+    parts = [post.title, post.subtitle or ""]
+    parts.extend(tag.label or tag.value for tag in post.tags.all())
+    texts = (
+        inline_text(block.get("content"))
+        for block in iter_blocks(parse_blocks(post.content))
+    )
+    parts.append("\n".join(text for text in texts if text))
+    return "\n".join(part for part in parts if part)
+
+
+def create_search_index(apps, schema_editor):
+    # SQLite gets an FTS5 table keyed by post id, Postgres a GIN tsvector index
+    # and MySQL a FULLTEXT index on the document body
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blog_posts_fts "
+            "USING fts5(body, tokenize='porter unicode61')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX blog_posts_search_idx ON blog_postsearchdocument "
+            "USING GIN (to_tsvector('english', body))"
+        )
+    elif vendor == "mysql":
+        schema_editor.execute(
+            "ALTER TABLE blog_postsearchdocument "
+            "ADD FULLTEXT INDEX blog_posts_search_idx (body)"
+        )
+
+
+def backfill_search_documents(apps, schema_editor):
+    # Index the posts that already exist; new and edited ones are indexed by
+    # the Posts signals
+    Posts = apps.get_model("blog", "Posts")
+    PostSearchDocument = apps.get_model("blog", "PostSearchDocument")
+    sqlite = schema_editor.connection.vendor == "sqlite"
+    posts = (
+        Posts.objects.using(schema_editor.connection.alias)
+        .prefetch_related("tags")
+        .order_by("pk")
+    )
+    documents = []
+    for post in posts.iterator(chunk_size=500):
+        documents.append(PostSearchDocument(post_id=post.pk, body=document_text(post)))
+        if len(documents) == 500:
+            save_documents(PostSearchDocument, documents, sqlite, schema_editor)
+            documents = []
+    save_documents(PostSearchDocument, documents, sqlite, schema_editor)
+
+
+def save_documents(PostSearchDocument, documents, sqlite, schema_editor):
+    PostSearchDocument.objects.using(schema_editor.connection.alias).bulk_create(
+        documents
+    )
+    if sqlite and documents:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO blog_posts_fts (rowid, body) VALUES (%s, %s)",
+                [(document.post_id, document.body) for document in documents],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS blog_posts_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS blog_posts_search_idx")
+    elif vendor == "mysql":
+        schema_editor.execute(
+            "ALTER TABLE blog_postsearchdocument DROP INDEX blog_posts_search_idx"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0010_timelineentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostSearchDocument",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="blog.posts",
+                    ),
+                ),
+                ("body", models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
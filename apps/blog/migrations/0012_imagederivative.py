@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0011_postsearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageDerivative",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(db_index=True, max_length=255)),
+                ("variant", models.CharField(max_length=20)),
+                ("format", models.CharField(max_length=10)),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("file", models.ImageField(max_length=255, upload_to="derivatives/")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "unique_together": {("source", "variant", "format")},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:30
+
+import apps.blog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0013_uploadsession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("size", models.BigIntegerField()),
+                ("ref_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="posts",
+            name="thumbnail",
+            field=models.ImageField(
+                blank=True,
+                max_length=255,
+                null=True,
+                storage=apps.blog.storage.ContentAddressedStorage(),
+                upload_to="uploads/%Y/%m/%d/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uploadedfile",
+            name="file",
+            field=models.FileField(
+                max_length=255,
+                storage=apps.blog.storage.ContentAddressedStorage(),
+                upload_to="uploads/%Y/%m/%d/",
+            ),
+        ),
+    ]
@@ -0,0 +1,281 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:34
+
+import json
+import math
+import re
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+from django.utils.html import escape
+
+# A frozen copy of apps.blog.content.derive_fields as of this migration, so
+# later changes to the live renderer do not change what it backfills
+
+
+def parse_blocks(content):
+    # Posts.content holds the editor's block JSON; tolerate legacy plain text
+    if isinstance(content, list):
+        return content
+    try:
+        blocks = json.loads(content)
+    except (TypeError, ValueError):
+        return []
+    return blocks if isinstance(blocks, list) else []
+
+
+# Valid JSON is not necessarily the editor's shape: nodes of the wrong type
+# read as empty rather than failing the save
+def as_dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def as_list(value):
+    return value if isinstance(value, list) else []
+
+
+def inline_text(inline):
+    # Inline content is a list of text/link nodes; links nest their own content
+    if isinstance(inline, str):
+        return inline
+    if isinstance(inline, dict):
+        if inline.get("type") == "tableContent":
+            return " ".join(
+                inline_text(cell)
+                for row in as_list(inline.get("rows"))
+                for cell in as_list(as_dict(row).get("cells"))
+            )
+        if "text" in inline:
+            text = inline.get("text")
+            return text if isinstance(text, str) else ""
+        return inline_text(inline.get("content", []))
+    if isinstance(inline, list):
+        return "".join(inline_text(item) for item in inline)
+    return ""
+
+
+def iter_blocks(blocks):
+    for block in blocks:
+        if not isinstance(block, dict):
+            continue
+        yield block
+        yield from iter_blocks(as_list(block.get("children")))
+
+
+# Write-time derived fields (see derive_fields). Reading time assumes an
+# average adult silent reading speed
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+# Length of the Posts.first_image column
+FIRST_IMAGE_MAX_LENGTH = 500
+WORD_RE = re.compile(r"\w+")
+SAFE_URL_SCHEMES = ("", "http", "https", "mailto")
+
+STYLE_TAGS = (
+    ("code", "code"),
+    ("strike", "s"),
+    ("underline", "u"),
+    ("italic", "em"),
+    ("bold", "strong"),
+)
+LIST_TAGS = {"bulletListItem": "ul", "numberedListItem": "ol", "checkListItem": "ul"}
+
+
+def safe_url(url):
+    # Only web, mail and relative links survive; no javascript:/data: URLs,
+    # and nothing a browser could read differently from urlsplit
+    if not isinstance(url, str) or not url or re.search(r"[\x00-\x20\\]", url):
+        return None
+    if urlsplit(url).scheme.lower() not in SAFE_URL_SCHEMES:
+        return None
+    return url
+
+
+def inline_html(inline):
+    # Everything is built from the JSON and escaped; the editor's HTML is
+    # never trusted, so the output is safe to insert as-is
+    if isinstance(inline, str):
+        return escape(inline)
+    if isinstance(inline, list):
+        return "".join(inline_html(item) for item in inline)
+    if not isinstance(inline, dict):
+        return ""
+    if inline.get("type") == "link":
+        inner = inline_html(inline.get("content", []))
+        href = safe_url(inline.get("href"))
+        if href is None:
+            return inner
+        return f'<a href="{escape(href)}" rel="nofollow noopener">{inner}</a>'
+    if "text" in inline:
+        text = inline.get("text")
+        text = escape(text if isinstance(text, str) else "")
+        styles = as_dict(inline.get("styles"))
+        for style, tag in STYLE_TAGS:
+            if styles.get(style):
+                text = f"<{tag}>{text}</{tag}>"
+        return text
+    return inline_html(inline.get("content", []))
+
+
+def table_html(content):
+    rows = []
+    for row in as_list(content.get("rows")):
+        cells = "".join(
+            f"<td>{inline_html(cell)}</td>"
+            for cell in as_list(as_dict(row).get("cells"))
+        )
+        rows.append(f"<tr>{cells}</tr>")
+    return f"<table><tbody>{''.join(rows)}</tbody></table>"
+
+
+def block_type(block):
+    kind = block.get("type")
+    return kind if isinstance(kind, str) else None
+
+
+def block_html(block):
+    kind = block_type(block)
+    props = as_dict(block.get("props"))
+    content = block.get("content")
+    children = blocks_html(as_list(block.get("children")))
+    if kind == "heading":
+        level = props.get("level") if props.get("level") in (1, 2, 3) else 1
+        html = f"<h{level}>{inline_html(content)}</h{level}>"
+    elif kind in LIST_TAGS:
+        checkbox = ""
+        if kind == "checkListItem":
+            checked = " checked" if props.get("checked") else ""
+            checkbox = f'<input type="checkbox" disabled{checked}> '
+        # Nested items stay inside their parent item
+        return f"<li>{checkbox}{inline_html(content)}{children}</li>"
+    elif kind == "image":
+        src = safe_url(props.get("url"))
+        if src is None:
+            return children
+        caption = props.get("caption") or ""
+        figcaption = f"<figcaption>{escape(caption)}</figcaption>" if caption else ""
+        html = (
+            f'<figure><img src="{escape(src)}" alt="{escape(caption)}" '
+            f'loading="lazy">{figcaption}</figure>'
+        )
+    elif kind in ("video", "audio", "file"):
+        href = safe_url(props.get("url"))
+        if href is None:
+            return children
+        label = escape(props.get("name") or props.get("caption") or href)
+        html = f'<p><a href="{escape(href)}" rel="nofollow noopener">{label}</a></p>'
+    elif kind == "codeBlock":
+        language = re.sub(r"[^\w+-]", "", str(props.get("language") or ""))
+        css = f' class="language-{language}"' if language else ""
+        html = f"<pre><code{css}>{escape(inline_text(content))}</code></pre>"
+    elif kind == "table" and isinstance(content, dict):
+        html = table_html(content)
+    elif kind == "quote":
+        html = f"<blockquote>{inline_html(content)}</blockquote>"
+    else:
+        html = f"<p>{inline_html(content)}</p>"
+    return html + children
+
+
+def blocks_html(blocks):
+    # Consecutive list items of one kind share a <ul>/<ol>
+    parts = []
+    open_list = None
+    for block in blocks:
+        if not isinstance(block, dict):
+            continue
+        list_tag = LIST_TAGS.get(block_type(block))
+        if list_tag != open_list:
+            if open_list:
+                parts.append(f"</{open_list}>")
+            if list_tag:
+                parts.append(f"<{list_tag}>")
+            open_list = list_tag
+        parts.append(block_html(block))
+    if open_list:
+        parts.append(f"</{open_list}>")
+    return "".join(parts)
+
+
+def first_image_url(blocks):
+    # URLs too long for the column (e.g. presigned links) are skipped rather
+    # than truncated into broken ones
+    for block in iter_blocks(blocks):
+        if block.get("type") == "image":
+            url = safe_url(as_dict(block.get("props")).get("url"))
+            if url and len(url) <= FIRST_IMAGE_MAX_LENGTH:
+                return url
+    return ""
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(" ", 1)[0] or text[:length]
+    return cut.rstrip(",.;:!?-") + "…"
+
+
+def derive_fields(content):
+    # Computed once on save so readers never re-parse the block JSON: the
+    # excerpt skips headings (the title and section names), counts cover all
+    blocks = parse_blocks(content)
+    texts = []
+    body = []
+    for block in iter_blocks(blocks):
+        text = inline_text(block.get("content"))
+        if not text:
+            continue
+        texts.append(text)
+        if block.get("type") != "heading":
+            body.append(text)
+    word_count = len(WORD_RE.findall(" ".join(texts)))
+    return {
+        "excerpt": make_excerpt(" ".join(body)),
+        "word_count": word_count,
+        "reading_time": math.ceil(word_count / WORDS_PER_MINUTE),
+        "first_image": first_image_url(blocks),
+        "content_html": blocks_html(blocks),
+    }
+
+
+def backfill_derived_content(apps, schema_editor):
+    Posts = apps.get_model("blog", "Posts")
+    posts = Posts.objects.only("pk", "content").order_by("pk")
+    for post in posts.iterator(chunk_size=500):
+        Posts.objects.filter(pk=post.pk).update(**derive_fields(post.content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0014_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="posts",
+            name="content_html",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="posts",
+            name="excerpt",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="posts",
+            name="first_image",
+            field=models.CharField(blank=True, default="", max_length=500),
+        ),
+        migrations.AddField(
+            model_name="posts",
+            name="reading_time",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="posts",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_derived_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_comment_likes(apps, schema_editor):
+    # The toggle view could insert the same like twice under concurrency; keep
+    # the oldest row of each pair before the constraint goes on
+    CommentLikes = apps.get_model("blog", "CommentLikes")
+    duplicates = (
+        CommentLikes.objects.values("comment", "author")
+        .annotate(keep=Min("id"), rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        CommentLikes.objects.filter(
+            comment=row["comment"], author=row["author"]
+        ).exclude(id=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0015_posts_derived_content"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_comment_likes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="commentlikes",
+            unique_together={("comment", "author")},
+        ),
+    ]
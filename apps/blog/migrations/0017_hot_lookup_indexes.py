@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0016_commentlikes_unique_together"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comments",
+            index=models.Index(
+                fields=["post", "parent", "-created_at"], name="comments_thread_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comments",
+            index=models.Index(
+                fields=["parent", "-created_at"], name="comments_replies_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="followings",
+            index=models.Index(
+                fields=["following", "follower"], name="followings_followers_idx"
+            ),
+        ),
+    ]
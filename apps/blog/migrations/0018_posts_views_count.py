@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0017_hot_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="posts",
+            name="views_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
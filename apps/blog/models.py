@@ -1,6 +1,11 @@
+import uuid
+
 from django.contrib.auth.models import User
 from django.db import models
 
+from .content import FIRST_IMAGE_MAX_LENGTH, derive_fields
+from .storage import content_addressed_storage
+
 
 class Tags(models.Model):
     value = models.CharField(max_length=250)
@@ -11,23 +16,126 @@ class Tags(models.Model):
 
 
 class UploadedFile(models.Model):
-    file = models.FileField(upload_to="uploads/%Y/%m/%d/")
+    file = models.FileField(
+        upload_to="uploads/%Y/%m/%d/",
+        storage=content_addressed_storage,
+        max_length=255,
+    )
+    # Set for content-addressed uploads; identical uploads share one row
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
+class StoredBlob(models.Model):
+    # One stored file in ContentAddressedStorage and how many rows (uploads,
+    # post thumbnails) point at it; the file is deleted when that reaches 0
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class UploadSession(models.Model):
+    # An in-progress chunked upload (apps.blog.uploads); the bytes received so
+    # far live in a temporary file until the session is completed
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # Held by the request copying a part in at received (uploads.write_part)
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class ImageDerivative(models.Model):
+    # A resized copy of an uploaded image (Posts.thumbnail, profile.image),
+    # keyed by the storage name of the original. Written by apps.blog.derivatives
+    source = models.CharField(max_length=255, db_index=True)
+    variant = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.ImageField(upload_to="derivatives/", max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("source", "variant", "format")
+
+    def __str__(self):
+        return f"{self.variant} {self.format} of {self.source}"
+
+
 class Posts(models.Model):
     title = models.CharField(max_length=250)
     subtitle = models.CharField(max_length=250, null=True, blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     content = models.TextField()
+    # Derived from content on every save (apps.blog.content.derive_fields)
+    excerpt = models.TextField(blank=True, default="")
+    word_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0)
+    first_image = models.CharField(
+        max_length=FIRST_IMAGE_MAX_LENGTH, blank=True, default=""
+    )
+    content_html = models.TextField(blank=True, default="")
     tags = models.ManyToManyField(Tags, related_name="posts")
-    thumbnail = models.ImageField(upload_to="uploads/%Y/%m/%d/", null=True, blank=True)
+    thumbnail = models.ImageField(
+        upload_to="uploads/%Y/%m/%d/",
+        storage=content_addressed_storage,
+        max_length=255,
+        null=True,
+        blank=True,
+    )
+    # Denormalized counters, kept in sync by apps.blog.counters and
+    # rebuildable with the rebuild_post_counters management command
+    likes_count = models.PositiveIntegerField(default=0)
+    top_level_comment_count = models.PositiveIntegerField(default=0)
+    saved_count = models.PositiveIntegerField(default=0)
+    # Detail views; nothing to recount them from, so not rebuildable
+    views_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination for the global and per-author feeds
+            models.Index(fields=["-created_at", "-id"], name="posts_feed_idx"),
+            models.Index(
+                fields=["author", "-created_at", "-id"], name="posts_author_feed_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Excerpt, counts and rendered HTML are stored so no reader re-parses
+        # the block JSON; refreshed whenever content may be written
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            derived = derive_fields(self.content)
+            for field, value in derived.items():
+                setattr(self, field, value)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+
+class PostSearchDocument(models.Model):
+    # Plain text of a post (title, subtitle, tag labels and editor content)
+    # behind the full-text index; maintained by apps.blog.search
+    post = models.OneToOneField(
+        Posts, on_delete=models.CASCADE, primary_key=True, related_name="search"
+    )
+    body = models.TextField()
+
+    def __str__(self):
+        return f"Search document for {self.post}"
+
 
 class Likes(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="likes")
@@ -62,11 +170,88 @@ class Followings(models.Model):
     class Meta:
         # Add a unique constraint on follower and following fields
         unique_together = ("follower", "following")
+        indexes = [
+            # Follower counts and fan-out read an author's followers from the
+            # index alone
+            models.Index(
+                fields=["following", "follower"], name="followings_followers_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.follower} followed {self.following}"
 
 
+class AuthorStats(models.Model):
+    # Materialized follower counts for the popular-authors leaderboard, kept in
+    # sync from Followings signals and rebuildable with rebuild_author_stats
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="author_stats"
+    )
+    follower_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-follower_count", "user"], name="author_stats_leaderboard_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} has {self.follower_count} followers"
+
+
+class FollowSuggestion(models.Model):
+    # Friend-of-friend suggestions: score is how many of the people `user`
+    # follows already follow `candidate`. Maintained from Followings signals
+    # and rebuildable with rebuild_follow_suggestions
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="follow_suggestions"
+    )
+    candidate = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggested_to"
+    )
+    score = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "candidate")
+        indexes = [
+            models.Index(
+                fields=["user", "-score", "candidate"],
+                name="follow_suggestion_rank_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate} suggested to {self.user}"
+
+
+class TimelineEntry(models.Model):
+    # Fan-out-on-write home timeline row: `post` by `author` pushed to `user`,
+    # a follower of `author`. created_at mirrors the post so reads are a
+    # range scan over (user, -created_at, -post)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(
+        Posts, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-post"], name="timeline_read_idx"
+            ),
+            models.Index(fields=["user", "author"], name="timeline_unfollow_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in {self.user}'s timeline"
+
+
 class Comments(models.Model):
     message = models.CharField(max_length=250)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
@@ -77,6 +262,16 @@ class Comments(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Newest-first pages of a post's top-level comments and of a
+            # comment's replies
+            models.Index(
+                fields=["post", "parent", "-created_at"], name="comments_thread_idx"
+            ),
+            models.Index(fields=["parent", "-created_at"], name="comments_replies_idx"),
+        ]
+
     def __str__(self):
         return self.message
 
@@ -89,6 +284,11 @@ class CommentLikes(models.Model):
         Comments, on_delete=models.CASCADE, related_name="comment_likes"
     )
 
+    class Meta:
+        # Comment first: per-comment like counts and the viewer's liked flag
+        # both filter on it
+        unique_together = ("comment", "author")
+
     def __str__(self):
         return f"{self.author} likes {self.comment}"
 
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .search import search_posts
+from .timeline import read_timeline
+
+
+class CustomLimitOffsetPagination(LimitOffsetPagination):
+    default_limit = 10
+    max_limit = 100
+
+    def get_paginated_data(self, data):
+        # The page body without wrapping it in a Response of its own; views
+        # put it straight into their envelope
+        return {
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Async ORM counterpart of paginate_queryset for the ASGI views
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [row async for row in queryset[self.offset : self.offset + self.limit]]
+
+
+# Newest-first keyset pagination over (created_at, id). Each page is a range
+# read starting right after the last row of the previous page, so deep pages
+# cost the same as the first one and no COUNT(*) is ever issued.
+class KeysetPagination(BasePagination):
+    default_limit = 10
+    max_limit = 100
+    limit_query_param = "limit"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in page])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+
+        queryset = queryset.order_by("-created_at", "-id")
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        # Fetch one extra row to know whether a next page exists
+        return queryset[: self.limit + 1]
+
+    def paginate_timeline(self, user, request):
+        # Same cursor contract, but rows come from the merged home timeline
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request)
+        return self.set_page(read_timeline(user, self.limit + 1, position, request))
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.limit
+        self.page = results[: self.limit]
+        return self.page
+
+    def get_paginated_data(self, data):
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_position(self, row):
+        return [row.created_at.isoformat(), row.pk]
+
+    def parse_position(self, position):
+        created_at, pk = position
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(created_at)
+        return created_at, int(pk)
+
+    def encode_cursor(self, position):
+        payload = json.dumps(position, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded.encode("ascii"))
+            return self.parse_position(json.loads(payload))
+        except (TypeError, ValueError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+# Relevance-ranked keyset pagination for search results, ordered by
+# (score, id) descending
+class SearchPagination(KeysetPagination):
+    def paginate_search(self, query, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request)
+        return self.set_page(search_posts(query, self.limit + 1, position, request))
+
+    def get_position(self, row):
+        return [row.search_score, row.pk]
+
+    def parse_position(self, position):
+        score, pk = position
+        return float(score), int(pk)
+
+
+def get_feed_paginator(request):
+    # Older clients keep limit/offset paging by sending ?pagination=offset
+    # (or an explicit offset); everyone else gets keyset pagination
+    if (
+        request.query_params.get("pagination") == "offset"
+        or "offset" in request.query_params
+    ):
+        return CustomLimitOffsetPagination()
+    return KeysetPagination()
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+
+from .counters import LIKES, SAVED, adjust_post_counter
+from .models import CommentLikes, Comments, Likes, Posts, Saved
+
+REACTION_BATCH_LIMIT = getattr(settings, "BLOG_REACTION_BATCH_LIMIT", 100)
+
+# Per-user reactions the like/save endpoints manage:
+# kind -> (model, target field, target model, post counter or None)
+REACTIONS = {
+    "like": (Likes, "post", Posts, LIKES),
+    "save": (Saved, "post", Posts, SAVED),
+    "comment_like": (CommentLikes, "comment", Comments, None),
+}
+
+
+def insert_reaction_sql(connection, model, field, target_model):
+    # INSERT ... SELECT from the target row: one statement that inserts nothing
+    # when the target is gone and skips rows the unique constraint already has
+    qn = connection.ops.quote_name
+    author = model._meta.get_field("author").column
+    target = model._meta.get_field(field).column
+    pk = qn(target_model._meta.pk.column)
+    return (
+        f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+        f"{qn(model._meta.db_table)} ({qn(author)}, {qn(target)}) "
+        f"SELECT %s, {pk} FROM {qn(target_model._meta.db_table)} WHERE {pk} = %s "
+        f"{connection.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None)}"
+    )
+
+
+def set_reaction(kind, user, target_id):
+    # Idempotent: True when a row was inserted, False when it already existed.
+    # Raises DoesNotExist for a missing target
+    model, field, target_model, counter = REACTIONS[kind]
+    using = router.db_for_write(model)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                insert_reaction_sql(connection, model, field, target_model),
+                [user.pk, target_id],
+            )
+            created = cursor.rowcount > 0
+        if created:
+            if counter:
+                adjust_post_counter(target_id, counter, 1)
+        elif not target_model.objects.using(using).filter(pk=target_id).exists():
+            # Only the no-op path pays for telling "already set" from "missing"
+            raise target_model.DoesNotExist
+    return created
+
+
+def unset_reaction(kind, user, target_id):
+    # Idempotent: True when a row was deleted. Reaction rows have no
+    # dependents or signals, so this is a single DELETE
+    model, field, target_model, counter = REACTIONS[kind]
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        deleted, _ = (
+            model.objects.using(using)
+            .filter(author=user, **{f"{field}_id": target_id})
+            .delete()
+        )
+        if deleted:
+            if counter:
+                adjust_post_counter(target_id, counter, -deleted)
+        elif not target_model.objects.using(using).filter(pk=target_id).exists():
+            raise target_model.DoesNotExist
+    return bool(deleted)
+
+
+def toggle_reaction(kind, user, target_id):
+    # Flips the reaction and returns the new state
+    with transaction.atomic(using=router.db_for_write(REACTIONS[kind][0])):
+        if unset_reaction(kind, user, target_id):
+            return False
+        set_reaction(kind, user, target_id)
+    return True
+
+
+def apply_reactions(user, changes):
+    # Bulk sync: each change is {"type", "id", "state"}; applied in order in
+    # one transaction. Invalid or missing targets are reported per item
+    # instead of failing the batch
+    results = []
+    with transaction.atomic(using=router.db_for_write(Posts)):
+        for change in changes:
+            if not isinstance(change, dict):
+                results.append({"error": "Invalid change"})
+                continue
+            kind = change.get("type")
+            target_id = change.get("id")
+            state = change.get("state")
+            result = {"type": kind, "id": target_id, "state": state}
+            if (
+                kind not in REACTIONS
+                or not isinstance(target_id, int)
+                or isinstance(target_id, bool)
+                or not isinstance(state, bool)
+            ):
+                result["error"] = "Invalid change"
+            else:
+                action = set_reaction if state else unset_reaction
+                try:
+                    result["changed"] = action(kind, user, target_id)
+                except ObjectDoesNotExist:
+                    result["error"] = "Not found"
+            results.append(result)
+    return results
@@ -0,0 +1,42 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson-backed replacements for DRF's JSONRenderer/JSONParser, the project
+# defaults (REST_FRAMEWORK in settings). orjson serializes dicts, lists, str,
+# numbers, datetimes and UUIDs natively in C; anything else (Decimal, lazy
+# translation strings, querysets...) goes through DRF's own encoder
+
+_drf_encoder = JSONEncoder()
+
+
+def encode_default(value):
+    return _drf_encoder.default(value)
+
+
+def dumps(data):
+    return orjson.dumps(data, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read() if stream is not None else b"")
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
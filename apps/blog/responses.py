@@ -0,0 +1,8 @@
+from rest_framework import status as http_status
+from rest_framework.response import Response
+
+
+def envelope(data, message, status=http_status.HTTP_200_OK):
+    # The {"data", "message", "status"} shape every endpoint answers with.
+    # data is passed through as-is: serializer output is never copied
+    return Response({"data": data, "message": message, "status": status}, status=status)
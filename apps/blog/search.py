@@ -0,0 +1,126 @@
+import re
+
+from django.db import connection
+
+from .content import blocks_to_text
+from .models import Posts, PostSearchDocument
+from .serializers import BlogSerializer
+
+# SQLite keeps its FTS5 index in a separate virtual table whose rowid is the
+# post id; Postgres and MySQL index PostSearchDocument.body directly
+SQLITE_FTS_TABLE = "blog_posts_fts"
+DOCUMENT_TABLE = PostSearchDocument._meta.db_table
+
+
+def document_text(post):
+    parts = [post.title, post.subtitle or ""]
+    parts.extend(tag.label or tag.value for tag in post.tags.all())
+    parts.append(blocks_to_text(post.content))
+    return "\n".join(part for part in parts if part)
+
+
+def index_post(post):
+    body = document_text(post)
+    PostSearchDocument.objects.update_or_create(post=post, defaults={"body": body})
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s", [post.pk]
+            )
+            cursor.execute(
+                f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, body) VALUES (%s, %s)",
+                [post.pk, body],
+            )
+
+
+def unindex_post(post_id):
+    # PostSearchDocument rows go away with the post through the cascade
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s", [post_id]
+            )
+
+
+def rebuild_search_index():
+    PostSearchDocument.objects.all().delete()
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE}")
+    posts = Posts.objects.prefetch_related("tags").order_by("pk")
+    total = 0
+    for post in posts.iterator(chunk_size=500):
+        index_post(post)
+        total += 1
+    return total
+
+
+def _fts5_query(query):
+    # Quote every term so user input is never parsed as FTS5 syntax
+    terms = re.findall(r"\w+", query)
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _matches_sql(query):
+    # Returns (sql, params) selecting (post_id, score) for matching posts,
+    # higher score meaning more relevant
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        return (
+            f"SELECT rowid AS post_id, -bm25({SQLITE_FTS_TABLE}) AS score "
+            f"FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s",
+            [_fts5_query(query)],
+        )
+    if vendor == "postgresql":
+        return (
+            "SELECT post_id, ts_rank(to_tsvector('english', body), "
+            "plainto_tsquery('english', %s)) AS score "
+            f"FROM {DOCUMENT_TABLE} "
+            "WHERE to_tsvector('english', body) @@ plainto_tsquery('english', %s)",
+            [query, query],
+        )
+    if vendor == "mysql":
+        return (
+            "SELECT post_id, MATCH (body) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+            f"AS score FROM {DOCUMENT_TABLE} "
+            "WHERE MATCH (body) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+            [query, query],
+        )
+    return _like_matches_sql(query)
+
+
+def _like_matches_sql(query):
+    # No full-text support: unranked substring scan. %, _ and \ in the query
+    # match themselves rather than acting as wildcards
+    return (
+        f"SELECT post_id, 0.0 AS score FROM {DOCUMENT_TABLE} "
+        "WHERE body LIKE %s ESCAPE '\\'",
+        ["%" + connection.ops.prep_for_like_query(query) + "%"],
+    )
+
+
+def search_posts(query, limit, position=None, request=None):
+    if connection.vendor == "sqlite" and not _fts5_query(query):
+        return []
+    matches, params = _matches_sql(query)
+    sql = f"SELECT post_id, score FROM ({matches}) matches"
+    if position is not None:
+        score, pk = position
+        sql += " WHERE score < %s OR (score = %s AND post_id < %s)"
+        params += [score, score, pk]
+    sql += " ORDER BY score DESC, post_id DESC LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        scores = dict(cursor.fetchall())
+
+    posts = BlogSerializer.setup_eager_loading(
+        Posts.objects.filter(pk__in=scores), request
+    )
+    results = []
+    for post in posts:
+        post.search_score = scores[post.pk]
+        results.append(post)
+    results.sort(key=lambda post: (post.search_score, post.pk), reverse=True)
+    return results
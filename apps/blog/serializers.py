@@ -1,22 +1,204 @@
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 
 from apps.users.models import profile
 
-from .models import Comments, Posts, Tags, UploadedFile
+from .derivatives import load_srcsets
+from .models import Comments, Posts, Tags, UploadedFile, UploadSession
+from .timestamps import ViewerClock, viewer_zone
+
+
+def query_params(request):
+    # DRF requests and the plain HttpRequests of the async views
+    params = getattr(request, "query_params", None)
+    return params if params is not None else request.GET
+
+
+def requested_fields(request, available):
+    return select_fields(query_params(request), available)
+
+
+def select_fields(params, available):
+    # ?fields=a,b keeps only those fields, ?exclude=c,d drops them; unknown
+    # names are ignored. None when the request asks for no projection
+    fields = params.get("fields")
+    exclude = params.get("exclude")
+    if not fields and not exclude:
+        return None
+    selected = set(available)
+    if fields:
+        selected &= {name.strip() for name in fields.split(",")}
+    if exclude:
+        selected -= {name.strip() for name in exclude.split(",")}
+    return selected
+
+
+def response_context(request):
+    # What response serializers need from the request: the sparse fieldset
+    # and the viewer's timezone. The request itself is left out on purpose,
+    # with it DRF would render file and image URLs absolute, unlike the
+    # cached post detail
+    return {
+        "query_params": query_params(request),
+        "viewer_clock": ViewerClock(viewer_zone(request)),
+    }
+
+
+class EagerLoadingMixin:
+    # Relations the nested serializers walk; views pass their querysets through
+    # setup_eager_loading so rendering a page never issues per-row queries
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    # Columns every projection keeps because the caller reads them (cursors)
+    required_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets apply to the top-level serializer of a response;
+        # nested serializers are built without the request
+        params = self.context.get("query_params")
+        selected = select_fields(params, self.Meta.fields) if params else None
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        if request is None:
+            return None
+        return requested_fields(request, cls.Meta.fields)
+
+    @classmethod
+    def field_sources(cls, names):
+        # First attribute each field reads, e.g. thumbnail_srcset -> thumbnail
+        declared = cls._declared_fields
+        return {
+            (getattr(declared.get(name), "source", None) or name).split(".")[0]
+            for name in names
+        }
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None, through=None):
+        # through names the relation the serialized objects are reached by
+        # when the queryset is over another model, e.g. the candidate of each
+        # FollowSuggestion row
+        model = queryset.model
+        if through is not None:
+            model = model._meta.get_field(through).related_model
+
+        def path(name):
+            return f"{through}__{name}" if through else name
+
+        selected = cls.selected_fields(request)
+        if selected is None:
+            select_related = cls.select_related_fields
+            prefetch_related = cls.prefetch_related_fields
+        else:
+            # Only the columns behind the requested fields are read: .only()
+            # for ?fields=, .defer() of everything else for ?exclude=
+            sources = cls.field_sources(selected)
+            opts = model._meta
+            columns = {field.name for field in opts.concrete_fields}
+            needed = (sources | set(cls.required_fields) | {opts.pk.name}) & columns
+            if query_params(request).get("fields"):
+                queryset = queryset.only(*map(path, needed))
+            else:
+                queryset = queryset.defer(*map(path, columns - needed))
+            select_related = [
+                name
+                for name in cls.select_related_fields
+                if name.split("__")[0] in sources
+            ]
+            prefetch_related = [
+                name
+                for name in cls.prefetch_related_fields
+                if name.split("__")[0] in sources
+            ]
+        if through is not None:
+            select_related = [through, *map(path, select_related)]
+            prefetch_related = list(map(path, prefetch_related))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class SrcsetField(serializers.Field):
+    # Map of resized variant URLs for an image field; lists preload every map
+    # in one query through SrcsetListSerializer, single objects look theirs up
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return {}
+        srcsets = self.context.get("srcsets")
+        if srcsets is None or value.name not in srcsets:
+            return load_srcsets([value.name])[value.name]
+        return srcsets[value.name]
+
+
+class RelativeTimestampField(serializers.Field):
+    # "03:04 PM" for today in the viewer's timezone, "March 04, 2024" before;
+    # formatted straight from the model datetime
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return ViewerClock.for_context(self.context).format(value)
+
+
+class SrcsetListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, "all") else data)
+        # Skip images of fields a sparse fieldset dropped; their columns may
+        # not even be loaded
+        rendered = {field.source.split(".")[0] for field in self.child.fields.values()}
+        paths = [
+            path
+            for path in getattr(self.child, "srcset_sources", ())
+            if path.split(".")[0] in rendered
+        ]
+        sources = set()
+        for item in items:
+            for path in paths:
+                sources.add(self.resolve_source(item, path))
+        # The context dict is shared with every nested serializer
+        srcsets = self.context.setdefault("srcsets", {})
+        srcsets.update(load_srcsets(sources - srcsets.keys()))
+        return super().to_representation(items)
+
+    @staticmethod
+    def resolve_source(item, path):
+        try:
+            for attribute in path.split("."):
+                item = getattr(item, attribute)
+        except ObjectDoesNotExist:
+            return None
+        return item.name if item else None
 
 
 class ProfileSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField(source="image")
+
     class Meta:
         model = profile
-        fields = ["image", "bio"]
+        fields = ["image", "image_srcset", "bio"]
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)  # Nested serializer for profile
+    select_related_fields = ("profile",)
+    srcset_sources = ("profile.image",)
 
     class Meta:
         model = User
+        list_serializer_class = SrcsetListSerializer
         fields = ["id", "username", "first_name", "last_name", "email", "profile"]
 
 
@@ -28,18 +210,31 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 # Serializer for the Posts model
-class BlogSerializer(serializers.ModelSerializer):
+class BlogSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)  # Nested serializer for author
     tags = TagSerializer(many=True, read_only=True)  # Nested serializer for tags
+    thumbnail_srcset = SrcsetField(source="thumbnail")
+    select_related_fields = ("author__profile",)
+    prefetch_related_fields = ("tags",)
+    # Keyset pagination and the timeline merge order by it
+    required_fields = ("created_at",)
+    srcset_sources = ("thumbnail", "author.profile.image")
 
     class Meta:
         model = Posts
+        list_serializer_class = SrcsetListSerializer
         fields = [
             "id",
             "title",
             "subtitle",
             "content",
+            "content_html",
+            "excerpt",
+            "word_count",
+            "reading_time",
+            "first_image",
             "thumbnail",
+            "thumbnail_srcset",
             "created_at",
             "updated_at",
             "author",  # Include nested author
@@ -51,13 +246,30 @@ class BlogCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Posts
         fields = "__all__"
+        # Computed from content in Posts.save
+        read_only_fields = [
+            "excerpt",
+            "word_count",
+            "reading_time",
+            "first_image",
+            "content_html",
+            # Maintained from Likes, Saved and Comments (apps.blog.counters)
+            "likes_count",
+            "top_level_comment_count",
+            "saved_count",
+            "views_count",
+        ]
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)  # Nested serializer for author
+    created_at = RelativeTimestampField()
+    select_related_fields = ("author__profile",)
+    srcset_sources = ("author.profile.image",)
 
     class Meta:
         model = Comments
+        list_serializer_class = SrcsetListSerializer
         fields = [
             "id",
             "message",
@@ -86,3 +298,10 @@ class UploadedFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UploadedFile
         fields = "__all__"
+        read_only_fields = ["sha256"]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "filename", "size", "received", "expires_at"]
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.users.models import profile
+
+from .blobs import release_blob, retain_blob
+from .cache import invalidate_cached_post
+from .counters import adjust_author_follower_count
+from .derivatives import (
+    POST_THUMBNAIL_VARIANTS,
+    PROFILE_IMAGE_VARIANTS,
+    schedule_derivatives,
+)
+from .models import Followings, Posts, UploadedFile
+from .search import index_post, unindex_post
+from .suggestions import follow_added, follow_removed
+from .timeline import (
+    backfill_followed_author,
+    drop_unfollowed_author,
+    fan_out_post,
+    resume_fan_out,
+)
+
+
+@receiver(pre_save, sender=Posts)
+def drop_cached_post_on_save(sender, instance, **kwargs):
+    instance._previous_thumbnail = None
+    instance._thumbnail_content = unsaved_content(instance.thumbnail)
+    if instance.pk is None:
+        return
+    previous = (
+        Posts.objects.filter(pk=instance.pk)
+        .values_list("updated_at", "thumbnail")
+        .first()
+    )
+    if previous is not None:
+        invalidate_cached_post(instance.pk, previous[0])
+        # Kept for publish_saved_post to move the blob reference
+        instance._previous_thumbnail = previous[1]
+
+
+@receiver(post_save, sender=Posts)
+def publish_saved_post(sender, instance, created, **kwargs):
+    index_post(instance)
+    if created:
+        # Push to follower timelines once the post is committed
+        transaction.on_commit(lambda: fan_out_post(instance))
+    if image_saved(instance, "thumbnail", kwargs.get("update_fields")):
+        schedule_derivatives(instance.thumbnail.name, POST_THUMBNAIL_VARIANTS)
+    previous = getattr(instance, "_previous_thumbnail", None)
+    if (instance.thumbnail.name or None) != (previous or None):
+        retain_blob(instance.thumbnail.name, instance._thumbnail_content)
+        release_blob(previous)
+
+
+def unsaved_content(fieldfile):
+    # The upload a save is about to store, kept so retain_blob can write it
+    # again if the blob it landed on is deleted before the save commits
+    if not fieldfile or fieldfile._committed:
+        return None
+    return fieldfile.file
+
+
+def image_saved(instance, field, update_fields):
+    # Derivative generation skips variants that already exist, so any save
+    # that may have written the image is enough to queue it
+    if update_fields is not None and field not in update_fields:
+        return False
+    return bool(getattr(instance, field))
+
+
+@receiver(post_delete, sender=Posts)
+def retire_deleted_post(sender, instance, **kwargs):
+    invalidate_cached_post(instance.pk, instance.updated_at)
+    unindex_post(instance.pk)
+    release_blob(instance.thumbnail.name)
+
+
+@receiver(m2m_changed, sender=Posts.tags.through)
+def refresh_post_on_tag_change(sender, instance, action, pk_set, **kwargs):
+    # Tag edits do not touch updated_at, so bump it to retire the cached body,
+    # and reindex since tag labels are searchable
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Posts):
+        post_ids = [instance.pk]
+    else:
+        # Reverse side, tag.posts.add(...): pk_set holds post ids (None on clear)
+        post_ids = pk_set
+    if post_ids is None:
+        post_ids = []
+    for pk, updated_at in Posts.objects.filter(pk__in=post_ids).values_list(
+        "pk", "updated_at"
+    ):
+        invalidate_cached_post(pk, updated_at)
+    Posts.objects.filter(pk__in=post_ids).update(updated_at=timezone.now())
+    for post in Posts.objects.filter(pk__in=post_ids).prefetch_related("tags"):
+        index_post(post)
+
+
+@receiver(pre_save, sender=UploadedFile)
+def keep_uploaded_content(sender, instance, **kwargs):
+    instance._file_content = unsaved_content(instance.file)
+
+
+@receiver(post_save, sender=UploadedFile)
+def retain_uploaded_file(sender, instance, created, **kwargs):
+    if created:
+        retain_blob(instance.file.name, instance._file_content)
+
+
+@receiver(post_delete, sender=UploadedFile)
+def release_uploaded_file(sender, instance, **kwargs):
+    release_blob(instance.file.name)
+
+
+@receiver(post_save, sender=Followings)
+def track_new_follow(sender, instance, created, **kwargs):
+    if created:
+        adjust_author_follower_count(instance.following_id, 1)
+        follow_added(instance.follower_id, instance.following_id)
+        backfill_followed_author(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Followings)
+def track_removed_follow(sender, instance, **kwargs):
+    adjust_author_follower_count(instance.following_id, -1)
+    follow_removed(instance.follower_id, instance.following_id)
+    drop_unfollowed_author(instance.follower_id, instance.following_id)
+    resume_fan_out(instance.following_id)
+
+
+@receiver(post_save, sender=profile)
+def resize_profile_image(sender, instance, **kwargs):
+    if image_saved(instance, "image", kwargs.get("update_fields")):
+        schedule_derivatives(instance.image.name, PROFILE_IMAGE_VARIANTS)
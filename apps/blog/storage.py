@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Uploads are stored once per distinct content: the storage name is derived
+# from the SHA-256 of the bytes, so re-uploading a file lands on the blob that
+# is already there. StoredBlob rows (apps.blog.blobs) count the references
+
+BLOB_PREFIX = "cas/"
+
+
+class BlobExists(Exception):
+    pass
+
+
+def hash_file(content):
+    # Hashes an upload once and remembers the digest on the file object so
+    # the storage does not read it again
+    sha256 = getattr(content, "sha256", None)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        sha256 = content.sha256 = digest.hexdigest()
+    return sha256
+
+
+def blob_name(sha256, extension=""):
+    extension = extension.lower()[:10]
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def blob_sha256(name):
+    # The digest a blob name was derived from, None for legacy upload paths
+    if not name or not name.startswith(BLOB_PREFIX):
+        return None
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Blob names are final; if one exists it already holds these bytes
+        if blob_sha256(name) and self.exists(name):
+            raise BlobExists(name)
+        return name
+
+    def _save(self, name, content):
+        name = blob_name(hash_file(content), os.path.splitext(name)[1])
+        if self.exists(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except BlobExists:
+            # Lost a race with a concurrent upload of the same content
+            return name
+
+
+content_addressed_storage = ContentAddressedStorage()
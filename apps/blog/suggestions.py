@@ -0,0 +1,112 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+
+from .counters import counter_value
+from .models import Followings, FollowSuggestion
+
+
+def _bump_scores(pairs, delta):
+    # pairs: list of (user_id, candidate_id) whose score changes by delta
+    if not pairs:
+        return
+    if delta > 0:
+        FollowSuggestion.objects.bulk_create(
+            [FollowSuggestion(user_id=u, candidate_id=c) for u, c in pairs],
+            ignore_conflicts=True,
+        )
+    by_user = {}
+    for user_id, candidate_id in pairs:
+        by_user.setdefault(user_id, []).append(candidate_id)
+    for user_id, candidate_ids in by_user.items():
+        FollowSuggestion.objects.filter(
+            user_id=user_id, candidate_id__in=candidate_ids
+        ).update(score=counter_value("score", delta))
+    if delta < 0:
+        for user_id, candidate_ids in by_user.items():
+            FollowSuggestion.objects.filter(
+                user_id=user_id, candidate_id__in=candidate_ids, score=0
+            ).delete()
+
+
+def _affected_pairs(follower_id, following_id):
+    # A new or removed edge follower -> following changes two sets of scores:
+    # follower's score for everyone `following` follows, and the score for
+    # `following` of everyone who follows `follower`
+    followed_by_follower = Followings.objects.filter(follower_id=follower_id).values(
+        "following_id"
+    )
+    candidates = (
+        Followings.objects.filter(follower_id=following_id)
+        .exclude(following_id=follower_id)
+        .exclude(following_id__in=followed_by_follower)
+        .values_list("following_id", flat=True)
+    )
+    pairs = [(follower_id, candidate_id) for candidate_id in candidates]
+
+    already_following = Followings.objects.filter(following_id=following_id).values(
+        "follower_id"
+    )
+    users = (
+        Followings.objects.filter(following_id=follower_id)
+        .exclude(follower_id=following_id)
+        .exclude(follower_id__in=already_following)
+        .values_list("follower_id", flat=True)
+    )
+    pairs.extend((user_id, following_id) for user_id in users)
+    return pairs
+
+
+def follow_added(follower_id, following_id):
+    # Called after the Followings row exists
+    FollowSuggestion.objects.filter(
+        user_id=follower_id, candidate_id=following_id
+    ).delete()
+    _bump_scores(_affected_pairs(follower_id, following_id), 1)
+
+
+def follow_removed(follower_id, following_id):
+    # Called after the Followings row is gone
+    _bump_scores(_affected_pairs(follower_id, following_id), -1)
+    # The removed author may be a friend-of-friend suggestion again
+    score = Followings.objects.filter(
+        follower__followers__follower_id=follower_id, following_id=following_id
+    ).count()
+    if score and follower_id != following_id:
+        FollowSuggestion.objects.update_or_create(
+            user_id=follower_id, candidate_id=following_id, defaults={"score": score}
+        )
+
+
+def rebuild_follow_suggestions(batch_size=1000):
+    # Each (first hop, second hop) path user -> middle -> candidate adds one
+    # to the (user, candidate) score; already-followed candidates are skipped
+    scores = (
+        Followings.objects.order_by()
+        .annotate(user=F("follower__followers__follower"))
+        .filter(user__isnull=False)
+        .exclude(following_id=F("user"))
+        .exclude(
+            Exists(
+                Followings.objects.filter(
+                    follower_id=OuterRef("user"), following_id=OuterRef("following_id")
+                )
+            )
+        )
+        .values("user", "following_id")
+        .annotate(score=Count("pk"))
+        .values_list("user", "following_id", "score")
+        .iterator(chunk_size=batch_size)
+    )
+    rows = (
+        FollowSuggestion(user_id=user_id, candidate_id=candidate_id, score=score)
+        for user_id, candidate_id, score in scores
+    )
+    created = 0
+    with transaction.atomic():
+        FollowSuggestion.objects.all().delete()
+        while batch := list(islice(rows, batch_size)):
+            FollowSuggestion.objects.bulk_create(batch)
+            created += len(batch)
+    return created
@@ -1,3 +1,1931 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from random import Random
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import (
+    DatabaseError,
+    OperationalError,
+    connection,
+    connections,
+    router,
+    transaction,
+)
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient,
+    Client,
+    RequestFactory,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.users import urls as user_urls
+from apps.users.models import profile
+from config.db import pool as db_pool
+from config.db import replicas
+
+from . import (
+    benchmarks,
+    blobs,
+    content,
+    counter_buffers,
+    media,
+    search,
+    timeline,
+    uploads,
+)
+from . import urls as blog_urls
+from .counters import LIKES, adjust_post_counter, flush_post_counters
+from .models import (
+    AuthorStats,
+    CommentLikes,
+    Comments,
+    Followings,
+    FollowSuggestion,
+    ImageDerivative,
+    Likes,
+    Posts,
+    Saved,
+    StoredBlob,
+    Tags,
+    TimelineEntry,
+    UploadedFile,
+    UploadSession,
+)
+from .renderers import ORJSONParser, ORJSONRenderer
+from .responses import envelope
+from .serializers import BlogSerializer
+from .storage import content_addressed_storage
+from .timestamps import ViewerClock
+from .views import annotate_comment_stats
+
+
+class CommentListingQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("viewer", password="secret")
+        cls.author = User.objects.create_user("author", password="secret")
+        profile.objects.create(user=cls.author, bio="writer")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+        cls.parent = Comments.objects.create(
+            message="parent", author=cls.author, post=cls.post
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def add_comments(self, count, parent=None):
+        for index in range(count):
+            comment = Comments.objects.create(
+                message=f"comment {index}",
+                author=self.author,
+                post=self.post,
+                parent=parent,
+            )
+            CommentLikes.objects.create(author=self.viewer, comment=comment)
+            CommentLikes.objects.create(author=self.author, comment=comment)
+            Comments.objects.create(
+                message="reply", author=self.author, post=self.post, parent=comment
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data["data"]["results"]
+
+    def test_comment_listing_query_count_is_constant(self):
+        url = f"/blog/{self.post.pk}/comments?limit=50"
+        self.add_comments(2)
+        small, _ = self.count_queries(url)
+        self.add_comments(10)
+        large, results = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(results), 13)
+        first = results[0]
+        self.assertTrue(first["liked"])
+        self.assertEqual(first["likesCount"], 2)
+        self.assertEqual(first["commentCount"], 1)
+        self.assertEqual(first["author"]["profile"]["bio"], "writer")
+
+    def test_reply_listing_query_count_is_constant(self):
+        url = f"/comment/{self.parent.pk}/reply?limit=50"
+        self.add_comments(2, parent=self.parent)
+        small, _ = self.count_queries(url)
+        self.add_comments(10, parent=self.parent)
+        large, results = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(reply["liked"] for reply in results))
+        self.assertTrue(all(reply["likesCount"] == 2 for reply in results))
+
+
+class BlogListingQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="secret")
+        profile.objects.create(user=cls.author, bio="writer")
+        cls.tag = Tags.objects.create(value="django", label="Django")
+
+    def add_posts(self, count):
+        for index in range(count):
+            post = Posts.objects.create(
+                title=f"Post {index}", content="[]", author=self.author
+            )
+            post.tags.add(self.tag)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_feed_query_count_is_constant(self):
+        self.add_posts(2)
+        small = self.count_queries("/?limit=50")
+        self.add_posts(10)
+        self.assertEqual(small, self.count_queries("/?limit=50"))
+
+    def test_author_feed_query_count_is_constant(self):
+        url = f"/blogs/profile/{self.author.pk}/?limit=50"
+        self.add_posts(2)
+        small = self.count_queries(url)
+        self.add_posts(10)
+        self.assertEqual(small, self.count_queries(url))
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="secret")
+        cls.posts = [
+            Posts.objects.create(title=f"Post {index}", content="[]", author=cls.author)
+            for index in range(7)
+        ]
+        # Ties on created_at are broken by id
+        tied = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        Posts.objects.filter(pk__in=[post.pk for post in cls.posts[2:6]]).update(
+            created_at=tied
+        )
+        Posts.objects.filter(pk=cls.posts[6].pk).update(
+            created_at=tied - timedelta(days=1)
+        )
+
+    def test_cursor_walks_every_post_once_in_order(self):
+        expected = list(
+            Posts.objects.order_by("-created_at", "-id").values_list("pk", flat=True)
+        )
+        client = APIClient()
+        seen = []
+        url = "/?limit=3"
+        while url:
+            data = client.get(url).json()["data"]
+            self.assertNotIn("count", data)
+            self.assertLessEqual(len(data["results"]), 3)
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, expected)
+
+    def test_offset_pagination_is_kept_on_request(self):
+        data = APIClient().get("/?pagination=offset&limit=3").json()["data"]
+        self.assertEqual(data["count"], 7)
+        self.assertIn("offset=3", data["next"])
+        self.assertIn("previous", data)
+
+    def test_invalid_cursor_is_rejected(self):
+        for url in ("/?cursor=garbage!!", "/async/?cursor=bm90LWpzb24="):
+            response = APIClient().get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()["message"], "Invalid cursor")
+
+
+class BlogDetailCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="secret")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_post(self):
+        response = self.client.get(f"/blog/{self.post.pk}/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]
+
+    def test_body_is_served_from_cache(self):
+        self.get_post()
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_post()
+        # Version/counter row, the liked and saved checks and the view count
+        self.assertEqual(len(context.captured_queries), 4)
+        self.assertEqual(data["title"], "Post")
+
+    def test_counters_and_flags_are_live(self):
+        self.get_post()
+        self.client.get(f"/blog/{self.post.pk}/like")
+        data = self.get_post()
+        self.assertTrue(data["liked"])
+        self.assertEqual(data["likesCount"], 1)
+
+    def test_views_are_counted(self):
+        for expected in (0, 1, 2):
+            self.assertEqual(self.get_post()["viewsCount"], expected)
+        # Write-behind like the other counters when a buffer is configured
+        for name, value in (("BACKEND", "memory"), ("FLUSH_INTERVAL", 0)):
+            self.addCleanup(
+                setattr, counter_buffers, name, getattr(counter_buffers, name)
+            )
+            setattr(counter_buffers, name, value)
+        counter_buffers.get_counter_buffer().drain()
+        self.get_post()
+        self.assertEqual(self.get_post()["viewsCount"], 3)
+        flush_post_counters()
+        self.assertEqual(self.get_post()["viewsCount"], 5)
+
+    def test_save_and_tag_changes_refresh_body(self):
+        self.get_post()
+        self.post.title = "Edited"
+        self.post.save()
+        self.assertEqual(self.get_post()["title"], "Edited")
+
+        self.post.tags.add(Tags.objects.create(value="django", label="Django"))
+        self.assertEqual(self.get_post()["tags"][0]["label"], "Django")
+
+
+class PopularAuthorsTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(f"user{index}", password="secret")
+            for index in range(4)
+        ]
+
+    def follow(self, follower, following):
+        return Followings.objects.create(follower=follower, following=following)
+
+    def test_leaderboard_tracks_follows(self):
+        first, second, third, fourth = self.users
+        self.follow(first, third)
+        self.follow(second, third)
+        self.follow(fourth, third)
+        self.follow(first, second)
+        self.follow(third, second).delete()
+
+        response = APIClient().get("/popular-authors")
+        results = response.data["data"]["results"]
+        self.assertEqual([user["id"] for user in results], [third.pk, second.pk])
+        self.assertEqual(AuthorStats.objects.get(user=third).follower_count, 3)
+
+    def test_rebuild_matches_incremental_counts(self):
+        first, second, third, _ = self.users
+        self.follow(first, second)
+        self.follow(third, second)
+        AuthorStats.objects.update(follower_count=0)
+
+        call_command("rebuild_author_stats", stdout=StringIO())
+
+        self.assertEqual(AuthorStats.objects.get(user=second).follower_count, 2)
+
+
+class FollowSuggestionTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(f"user{index}", password="secret")
+            for index in range(6)
+        ]
+
+    def snapshot(self):
+        return set(
+            FollowSuggestion.objects.values_list("user_id", "candidate_id", "score")
+        )
+
+    def expected(self):
+        follows = set(Followings.objects.values_list("follower_id", "following_id"))
+        scores = {}
+        for user, middle in follows:
+            for other, candidate in follows:
+                if other != middle or candidate == user:
+                    continue
+                if (user, candidate) in follows:
+                    continue
+                scores[(user, candidate)] = scores.get((user, candidate), 0) + 1
+        return {(user, candidate, score) for (user, candidate), score in scores.items()}
+
+    def test_incremental_updates_match_full_rebuild(self):
+        random = Random(7)
+        pairs = [(a, b) for a in self.users for b in self.users if a != b]
+        for _ in range(60):
+            follower, following = random.choice(pairs)
+            existing = Followings.objects.filter(
+                follower=follower, following=following
+            ).first()
+            if existing:
+                existing.delete()
+            else:
+                Followings.objects.create(follower=follower, following=following)
+            self.assertEqual(self.snapshot(), self.expected())
+
+        incremental = self.snapshot()
+        call_command("rebuild_follow_suggestions", stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_endpoint_orders_by_score(self):
+        me, friend, other, popular, niche, _ = self.users
+        for middle in (friend, other):
+            Followings.objects.create(follower=me, following=middle)
+            Followings.objects.create(follower=middle, following=popular)
+        Followings.objects.create(follower=friend, following=niche)
+
+        response = APIClient().get(f"/profile/{me.pk}/suggestion")
+        results = response.data["data"]["results"]
+        self.assertEqual([user["id"] for user in results], [popular.pk, niche.pk])
+
+
+class HomeTimelineTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user("reader", password="secret")
+        self.friend = User.objects.create_user("friend", password="secret")
+        self.celebrity = User.objects.create_user("celebrity", password="secret")
+        self.stranger = User.objects.create_user("stranger", password="secret")
+        Followings.objects.create(follower=self.reader, following=self.friend)
+        Followings.objects.create(follower=self.reader, following=self.celebrity)
+        # Push the celebrity over the fan-out threshold
+        AuthorStats.objects.filter(user=self.celebrity).update(
+            follower_count=timeline.FANOUT_THRESHOLD
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Posts.objects.create(title=title, content="[]", author=author)
+
+    def read_all(self, limit):
+        url, ids = f"/timeline?limit={limit}", []
+        while url:
+            data = self.client.get(url).data["data"]
+            ids += [post["id"] for post in data["results"]]
+            url = data["next"]
+        return ids
+
+    def test_merges_pushed_and_pulled_posts(self):
+        posts = []
+        for index in range(5):
+            posts.append(self.publish(self.friend, f"friend {index}"))
+            posts.append(self.publish(self.celebrity, f"celebrity {index}"))
+            self.publish(self.stranger, f"stranger {index}")
+
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual(self.read_all(limit=3), expected)
+
+    def test_follow_and_unfollow_update_timeline(self):
+        post = self.publish(self.stranger, "before follow")
+        Followings.objects.create(follower=self.reader, following=self.stranger)
+        self.assertEqual(self.read_all(limit=10), [post.pk])
+
+        Followings.objects.get(follower=self.reader, following=self.stranger).delete()
+        self.assertEqual(self.read_all(limit=10), [])
+
+    def test_pulled_posts_stay_when_the_author_drops_below_the_threshold(self):
+        fan = User.objects.create_user("fan")
+        Followings.objects.create(follower=fan, following=self.celebrity)
+        AuthorStats.objects.filter(user=self.celebrity).update(
+            follower_count=timeline.FANOUT_THRESHOLD
+        )
+        pulled = self.publish(self.celebrity, "while popular")
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        self.assertEqual(self.read_all(limit=10), [pulled.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Followings.objects.get(follower=fan, following=self.celebrity).delete()
+        self.assertEqual(self.read_all(limit=10), [pulled.pk])
+        pushed = self.publish(self.celebrity, "after")
+        self.assertEqual(self.read_all(limit=10), [pushed.pk, pulled.pk])
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list("user_id", flat=True)),
+            {self.reader.pk},
+        )
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="secret")
+
+    def publish(self, title, text, tags=()):
+        content = json.dumps(
+            [
+                {"type": "heading", "content": [{"type": "text", "text": title}]},
+                {"type": "paragraph", "content": [{"type": "text", "text": text}]},
+            ]
+        )
+        post = Posts.objects.create(title=title, content=content, author=self.author)
+        for label in tags:
+            post.tags.add(Tags.objects.create(value=label.lower(), label=label))
+        return post
+
+    def search(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]
+
+    def test_matches_title_content_and_tags(self):
+        by_title = self.publish("Caching strategies", "Notes on memory")
+        by_content = self.publish("Weekend notes", "We tried caching at the edge")
+        by_tag = self.publish("Release log", "Nothing new", tags=["Caching"])
+        self.publish("Unrelated", "Gardening tips")
+
+        ids = {post["id"] for post in self.search("/search?q=caching")["results"]}
+        self.assertEqual(ids, {by_title.pk, by_content.pk, by_tag.pk})
+
+    def test_index_follows_updates(self):
+        post = self.publish("Draft", "placeholder")
+        post.title = "Published kubernetes guide"
+        post.save()
+
+        self.assertEqual(
+            self.search("/search?q=placeholder")["results"][0]["id"], post.pk
+        )
+        self.assertEqual(len(self.search("/search?q=kubernetes")["results"]), 1)
+        post.delete()
+        self.assertEqual(self.search("/search?q=kubernetes")["results"], [])
+
+    def test_keyset_pages_cover_all_results(self):
+        expected = {
+            self.publish(f"Python {index}", "python tips").pk for index in range(7)
+        }
+        url, seen = "/search?q=python&limit=3", []
+        while url:
+            data = self.search(url)
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), expected)
+
+    def test_substring_fallback_escapes_wildcards(self):
+        # The LIKE scan used where the database has no full-text index
+        full = self.publish("Coverage", "We reached 100% coverage")
+        self.publish("Coverage", "We reached 1000 coverage")
+        snake = self.publish("Naming", r"Use snake_case or a\b paths")
+        self.publish("Naming", "Use snakeXcase or ab paths")
+
+        def matches(query):
+            sql, params = search._like_matches_sql(query)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return {post_id for post_id, _ in cursor.fetchall()}
+
+        self.assertEqual(matches("100%"), {full.pk})
+        self.assertEqual(matches("snake_case"), {snake.pk})
+        self.assertEqual(matches("a\\b"), {snake.pk})
+
+
+class AsyncReadEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="secret")
+        profile.objects.create(user=cls.author, bio="writer")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+        Comments.objects.create(message="hello", author=cls.author, post=cls.post)
+        Likes.objects.create(author=cls.author, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        token = AccessToken.for_user(self.author)
+        self.headers = {"authorization": f"Bearer {token}"}
+
+    async def test_async_endpoints_match_sync_responses(self):
+        sync_client = Client()
+        async_client = AsyncClient()
+        for path in (
+            "/",
+            f"/blog/{self.post.pk}/",
+            f"/blog/{self.post.pk}/comments",
+            "/profile/author/",
+            "/?fields=id,title",
+            f"/blog/{self.post.pk}/comments?exclude=author",
+            "/profile/author/?exclude=email,profile",
+            "/?exclude=content,content_html",
+            f"/blog/{self.post.pk}/?fields=title",
+            f"/blog/{self.post.pk}/?exclude=content,content_html,author",
+        ):
+            expected = await sync_to_async(sync_client.get)(path, headers=self.headers)
+            response = await async_client.get(f"/async{path}", headers=self.headers)
+            self.assertEqual(response.status_code, 200, path)
+            expected, response = expected.json(), response.json()
+            # Both count the view
+            if "viewsCount" in expected["data"]:
+                self.assertEqual(
+                    response["data"].pop("viewsCount"),
+                    expected["data"].pop("viewsCount") + 1,
+                )
+            self.assertEqual(response, expected, path)
+
+    async def test_profile_requires_authentication(self):
+        response = await AsyncClient().get("/async/profile/author/")
+        self.assertEqual(response.json()["status"], 403)
+
+
+def png_upload(name, size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, IMAGE_DERIVATIVES_SYNC=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create_user("author", password="secret")
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.objects.create(
+                user=self.author, bio="writer", image=png_upload("me.png")
+            )
+
+    def add_post(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Posts.objects.create(
+                title=title,
+                content="[]",
+                author=self.author,
+                thumbnail=png_upload(f"{title}.png"),
+            )
+
+    def test_uploads_get_resized_variants(self):
+        self.add_post("cover")
+        self.assertEqual(ImageDerivative.objects.count(), 6)
+        post = APIClient().get("/").json()["data"]["results"][0]
+        card = post["thumbnail_srcset"]["card"]
+        self.assertEqual((card["width"], card["height"]), (480, 270))
+        self.assertTrue(card["webp"].endswith(".webp"))
+        self.assertTrue(card["jpeg"].endswith(".jpg"))
+        hero = post["thumbnail_srcset"]["hero"]
+        self.assertEqual((hero["width"], hero["height"]), (1200, 800))
+        avatar = post["author"]["profile"]["image_srcset"]["avatar"]
+        self.assertEqual((avatar["width"], avatar["height"]), (128, 128))
+
+    def test_feed_loads_srcsets_in_one_query(self):
+        self.add_post("first")
+        with CaptureQueriesContext(connection) as small:
+            APIClient().get("/?limit=50")
+        for index in range(5):
+            self.add_post(f"post-{index}")
+        with CaptureQueriesContext(connection) as large:
+            APIClient().get("/?limit=50")
+        self.assertEqual(len(small), len(large))
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        parts = tempfile.TemporaryDirectory()
+        self.addCleanup(parts.cleanup)
+        self.addCleanup(setattr, uploads, "UPLOAD_TEMP_DIR", uploads.UPLOAD_TEMP_DIR)
+        uploads.UPLOAD_TEMP_DIR = parts.name
+
+        self.owner = User.objects.create_user("owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def put_part(self, url, offset, payload, **headers):
+        return self.client.put(
+            f"{url}?offset={offset}",
+            payload,
+            content_type="application/octet-stream",
+            headers=headers,
+        )
+
+    def test_parts_resume_and_assemble(self):
+        payload = bytes(range(256)) * 1000
+        first, second = payload[:100000], payload[100000:]
+        response = self.client.post(
+            "/media/upload/chunked",
+            {"filename": "notes.bin", "size": len(payload)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        url = f"/media/upload/{response.json()['data']['id']}"
+
+        self.assertEqual(self.put_part(url, 0, first).status_code, 200)
+        # Replaying a part or skipping ahead reports the offset to resume from
+        conflict = self.put_part(url, 0, first)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()["data"]["received"], len(first))
+        corrupt = self.put_part(url, len(first), second, **{"X-Part-SHA256": "0" * 64})
+        self.assertEqual(corrupt.status_code, 400)
+        self.assertEqual(self.client.get(url).json()["data"]["received"], len(first))
+        # Completing early is refused
+        self.assertEqual(self.client.post(f"{url}/complete").status_code, 409)
+
+        part = self.put_part(
+            url,
+            len(first),
+            second,
+            **{"X-Part-SHA256": hashlib.sha256(second).hexdigest()},
+        )
+        self.assertEqual(part.status_code, 200)
+        sha256 = hashlib.sha256(payload).hexdigest()
+        done = self.client.post(f"{url}/complete", {"sha256": sha256}, format="json")
+        self.assertEqual(done.status_code, 201)
+        self.assertEqual(done.json()["data"]["sha256"], sha256)
+
+        uploaded = UploadedFile.objects.get()
+        with uploaded.file.open("rb") as stored:
+            self.assertEqual(stored.read(), payload)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(uploads.UPLOAD_TEMP_DIR), [])
+
+    def test_malformed_sizes_offsets_and_oversized_parts_are_rejected(self):
+        self.addCleanup(
+            setattr, uploads, "UPLOAD_CHUNK_SIZE", uploads.UPLOAD_CHUNK_SIZE
+        )
+        uploads.UPLOAD_CHUNK_SIZE = 4
+        response = self.client.post(
+            "/media/upload/chunked", {"filename": "a.txt", "size": "ten"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/media/upload/chunked", {"filename": "a.txt", "size": 10}, format="json"
+        )
+        url = f"/media/upload/{response.json()['data']['id']}"
+
+        self.assertEqual(self.put_part(url, "abc", b"abcd").status_code, 400)
+        self.assertEqual(self.put_part(url, -1, b"abcd").status_code, 400)
+        self.assertEqual(self.put_part(url, 0, b"abcde").status_code, 400)
+        self.assertEqual(self.client.get(url).json()["data"]["received"], 0)
+        self.assertEqual(self.put_part(url, 0, b"abcd").status_code, 200)
+        # Only the assembled file is left behind, no staging files
+        self.assertEqual(len(os.listdir(uploads.UPLOAD_TEMP_DIR)), 1)
+
+    def test_parts_claim_their_offset_while_copied_in(self):
+        response = self.client.post(
+            "/media/upload/chunked", {"filename": "a.txt", "size": 8}, format="json"
+        )
+        session_id = response.json()["data"]["id"]
+        url = f"/media/upload/{session_id}"
+        # Another request is copying a part in at offset 0
+        UploadSession.objects.filter(pk=session_id).update(
+            claim=uuid.uuid4(), claimed_at=datetime.now(dt_timezone.utc)
+        )
+        self.assertEqual(self.put_part(url, 0, b"abcd").status_code, 409)
+        # Its claim lapses if it never confirms
+        UploadSession.objects.filter(pk=session_id).update(
+            claimed_at=datetime.now(dt_timezone.utc) - uploads.UPLOAD_CLAIM_TIMEOUT
+        )
+        self.assertEqual(self.put_part(url, 0, b"abcd").status_code, 200)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual((session.received, session.claim), (4, None))
+
+        # A copy that fails releases the claim without advancing
+        os.rename(uploads.temp_path(session), f"{uploads.temp_path(session)}.moved")
+        self.assertEqual(self.put_part(url, 4, b"efgh").status_code, 500)
+        session.refresh_from_db()
+        self.assertEqual((session.received, session.claim), (4, None))
+        os.rename(f"{uploads.temp_path(session)}.moved", uploads.temp_path(session))
+        self.assertEqual(self.put_part(url, 4, b"efgh").status_code, 200)
+        with open(uploads.temp_path(session), "rb") as assembled:
+            self.assertEqual(assembled.read(), b"abcdefgh")
+
+    def test_sessions_belong_to_their_owner(self):
+        response = self.client.post(
+            "/media/upload/chunked", {"filename": "a.txt", "size": 3}, format="json"
+        )
+        url = f"/media/upload/{response.json()['data']['id']}"
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("other"))
+        self.assertEqual(other.get(url).status_code, 403)
+        self.assertEqual(other.delete(url).status_code, 403)
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, IMAGE_DERIVATIVES_SYNC=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create_user("author", password="secret")
+        self.client = APIClient()
+
+    def upload(self, name):
+        return self.client.post(
+            "/media/upload", {"file": png_upload(name)}, format="multipart"
+        )
+
+    def test_identical_uploads_share_one_record_and_file(self):
+        first = self.upload("banner.png")
+        self.assertEqual(first.status_code, 201)
+        again = self.upload("banner-copy.png")
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["id"], first.json()["id"])
+        self.assertEqual(UploadedFile.objects.count(), 1)
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(UploadedFile.objects.get().file.name, blob.name)
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        self.upload("banner.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Posts.objects.create(
+                title="Post",
+                content="[]",
+                author=self.author,
+                thumbnail=png_upload("thumb.png"),
+            )
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(post.thumbnail.name, blob.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertTrue(post.thumbnail.storage.exists(blob.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            UploadedFile.objects.get().delete()
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(post.thumbnail.storage.exists(blob.name))
+
+        self.upload("banner.png")
+        call_command("rebuild_blob_refcounts", stdout=StringIO())
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_blob_deleted_before_its_reference_is_saved_again(self):
+        # Another transaction released the blob's last reference between this
+        # upload landing on the existing file and its reference being counted
+        name = content_addressed_storage.save("banner.png", png_upload("banner.png"))
+        content_addressed_storage.delete(name)
+        with self.assertRaises(FileNotFoundError):
+            blobs.retain_blob(name)
+        self.assertFalse(StoredBlob.objects.exists())
+
+        blobs.retain_blob(name, png_upload("banner.png"))
+        self.assertTrue(content_addressed_storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(MEDIA_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.payload = bytes(range(256)) * 4
+        name = content_addressed_storage.save(
+            "banner.bin", SimpleUploadedFile("banner.bin", self.payload)
+        )
+        self.url = f"/media/{name}"
+        os.makedirs(os.path.join(root.name, "legacy"))
+        with open(os.path.join(root.name, "legacy", "note.txt"), "wb") as note:
+            note.write(b"hello")
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_and_conditional_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.payload)
+        sha256 = hashlib.sha256(self.payload).hexdigest()
+        self.assertEqual(response.headers["ETag"], f'"{sha256}"')
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+
+        cached = self.client.get(self.url, headers={"If-None-Match": f'"{sha256}"'})
+        self.assertEqual(cached.status_code, 304)
+        legacy = self.client.get("/media/legacy/note.txt")
+        self.assertEqual(self.body(legacy), b"hello")
+        self.assertNotIn("immutable", legacy.headers["Cache-Control"])
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 404)
+
+    def test_byte_ranges(self):
+        for header, start, end in (
+            ("bytes=10-19", 10, 19),
+            ("bytes=1000-", 1000, 1023),
+            ("bytes=-24", 1000, 1023),
+        ):
+            response = self.client.get(self.url, headers={"Range": header})
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(self.body(response), self.payload[start : end + 1])
+            self.assertEqual(
+                response.headers["Content-Range"], f"bytes {start}-{end}/1024"
+            )
+            self.assertEqual(response.headers["Content-Length"], str(end - start + 1))
+
+        unsatisfiable = self.client.get(self.url, headers={"Range": "bytes=2000-"})
+        self.assertEqual(unsatisfiable.status_code, 416)
+        stale = self.client.get(
+            self.url, headers={"Range": "bytes=0-9", "If-Range": '"other"'}
+        )
+        self.assertEqual(stale.status_code, 200)
+
+    def test_sendfile_handoff(self):
+        self.addCleanup(setattr, media, "SENDFILE", media.SENDFILE)
+        media.SENDFILE = "x-accel-redirect"
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.headers["X-Accel-Redirect"],
+            "/protected-media/" + self.url.removeprefix("/media/"),
+        )
+        self.assertEqual(response.content, b"")
+
+
+class DerivedContentTests(TestCase):
+    blocks = [
+        {"type": "heading", "props": {"level": 1}, "content": [{"text": "Title"}]},
+        {
+            "type": "paragraph",
+            "content": [
+                {"type": "text", "text": "Hello <b>", "styles": {"bold": True}},
+                {
+                    "type": "link",
+                    "href": "javascript:alert(1)",
+                    "content": [{"type": "text", "text": " world", "styles": {}}],
+                },
+            ],
+        },
+        {"type": "bulletListItem", "content": [{"text": "one"}]},
+        {"type": "bulletListItem", "content": [{"text": "two"}]},
+        {
+            "type": "image",
+            "props": {"url": "https://cdn.example.com/a.png", "caption": '"cap"'},
+        },
+        {"type": "image", "props": {"url": "data:text/html,x"}},
+    ]
+
+    def test_derive_fields(self):
+        derived = content.derive_fields(json.dumps(self.blocks))
+        self.assertEqual(derived["excerpt"], "Hello <b> world one two")
+        self.assertEqual(derived["word_count"], 6)
+        self.assertEqual(derived["reading_time"], 1)
+        self.assertEqual(derived["first_image"], "https://cdn.example.com/a.png")
+        html = derived["content_html"]
+        self.assertIn("<h1>Title</h1>", html)
+        self.assertIn("<p><strong>Hello &lt;b&gt;</strong> world</p>", html)
+        self.assertIn("<ul><li>one</li><li>two</li></ul>", html)
+        self.assertIn('alt="&quot;cap&quot;"', html)
+        self.assertNotIn("javascript", html)
+        self.assertNotIn("data:", html)
+
+        long_text = [{"type": "paragraph", "content": [{"text": "word " * 500}]}]
+        derived = content.derive_fields(json.dumps(long_text))
+        self.assertEqual(derived["reading_time"], 3)
+        self.assertLessEqual(len(derived["excerpt"]), content.EXCERPT_LENGTH + 1)
+        self.assertTrue(derived["excerpt"].endswith("…"))
+
+    def test_wrong_shaped_content_is_skipped(self):
+        # Valid JSON, but not the editor's shape
+        blocks = [
+            {"type": "paragraph", "content": [{"text": "kept", "styles": []}]},
+            {"type": "heading", "props": "x", "content": [{"text": 5}, "tail"]},
+            {"type": "image", "props": ["url"], "children": "nope"},
+            {"type": "table", "content": {"rows": ["row", {"cells": "x"}]}},
+            {
+                "type": "table",
+                "content": {"type": "tableContent", "rows": [{"cells": [["c"]]}]},
+            },
+            {"type": ["bulletListItem"], "children": 7, "content": "loose"},
+            {"type": "paragraph", "content": {"type": "tableContent", "rows": 3}},
+            "not a block",
+        ]
+        derived = content.derive_fields(json.dumps(blocks))
+        self.assertEqual(derived["first_image"], "")
+        self.assertIn("<p>kept</p>", derived["content_html"])
+        self.assertIn("<h1>tail</h1>", derived["content_html"])
+        self.assertIn("<td>c</td>", derived["content_html"])
+        self.assertEqual(derived["word_count"], 4)
+
+        author = User.objects.create_user("author", password="secret")
+        client = APIClient()
+        client.force_authenticate(author)
+        blocks.insert(0, {"type": "heading", "content": [{"text": "Title"}]})
+        response = client.post(
+            "/create-blog",
+            {
+                "content": json.dumps(blocks),
+                "tags": [Tags.objects.create(value="x", label="X").pk],
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.json())
+
+    def test_first_image_skips_urls_longer_than_the_column(self):
+        presigned = "https://bucket.s3.amazonaws.com/a.png?X-Amz-Signature=" + "f" * 600
+        blocks = [
+            {"type": "image", "props": {"url": presigned}},
+            {"type": "image", "props": {"url": "https://cdn.example.com/b.png"}},
+        ]
+        derived = content.derive_fields(json.dumps(blocks))
+        self.assertEqual(derived["first_image"], "https://cdn.example.com/b.png")
+        derived = content.derive_fields(json.dumps(blocks[:1]))
+        self.assertEqual(derived["first_image"], "")
+        # The image itself is still rendered
+        self.assertIn("X-Amz-Signature", derived["content_html"])
+        author = User.objects.create_user("presigner")
+        post = Posts.objects.create(
+            title="Post", content=json.dumps(blocks[:1]), author=author
+        )
+        self.assertEqual(post.first_image, "")
+
+    def test_rebuild_post_content_refreshes_cached_posts(self):
+        author = User.objects.create_user("rebuilder")
+        post = Posts.objects.create(
+            title="Post", content=json.dumps(self.blocks), author=author
+        )
+        client = APIClient()
+        self.assertNotIn(
+            "<em>", client.get(f"/blog/{post.pk}/").json()["data"]["content_html"]
+        )
+        # A renderer change: the stored HTML is stale until the rebuild
+        Posts.objects.filter(pk=post.pk).update(content_html="<em>stale</em>")
+        cache.clear()
+        self.assertIn(
+            "<em>", client.get(f"/blog/{post.pk}/").json()["data"]["content_html"]
+        )
+        call_command("rebuild_post_content", stdout=StringIO())
+        html = client.get(f"/blog/{post.pk}/").json()["data"]["content_html"]
+        self.assertNotIn("<em>", html)
+        self.assertIn("<h1>Title</h1>", html)
+
+    def test_write_path_stores_fields_and_listings_can_skip_bodies(self):
+        author = User.objects.create_user("author", password="secret")
+        client = APIClient()
+        client.force_authenticate(author)
+        tag = Tags.objects.create(value="django", label="Django")
+        response = client.post(
+            "/create-blog", {"content": json.dumps(self.blocks), "tags": [tag.pk]}
+        )
+        self.assertEqual(response.status_code, 201, response.json())
+        post = Posts.objects.get()
+        self.assertEqual((post.title, post.word_count), ("Title", 6))
+
+        post.content = json.dumps(self.blocks[:1])
+        post.save(update_fields=["content"])
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 1)
+
+        # Listings keep the full post; clients opt out of the bodies
+        feed = client.get("/").json()["data"]["results"][0]
+        self.assertEqual(feed["content_html"], "<h1>Title</h1>")
+        self.assertEqual(feed["word_count"], 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/?exclude=content,content_html")
+        feed = response.json()["data"]["results"][0]
+        self.assertNotIn("content", feed)
+        self.assertIn("excerpt", feed)
+        self.assertNotIn('"content_html"', " ".join(q["sql"] for q in queries))
+        detail = client.get(f"/blog/{post.pk}/").json()["data"]
+        self.assertEqual(detail["content_html"], "<h1>Title</h1>")
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", email="a@example.com")
+        profile.objects.create(user=cls.author, bio="writer")
+        tag = Tags.objects.create(value="django", label="Django")
+        for index in range(3):
+            post = Posts.objects.create(
+                title=f"Post {index}", content="[]", author=cls.author
+            )
+            post.tags.add(tag)
+        Comments.objects.create(message="hello", author=cls.author, post=post)
+        cls.post = post
+
+    def get(self, url):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = " ".join(query["sql"] for query in context.captured_queries)
+        return response.json()["data"], sql, len(context.captured_queries)
+
+    def test_fields_limit_output_and_columns(self):
+        data, sql, count = self.get("/?fields=id,title")
+        self.assertEqual([set(post) for post in data["results"]], [{"id", "title"}] * 3)
+        self.assertNotIn('"subtitle"', sql)
+        self.assertNotIn("auth_user", sql)
+        self.assertNotIn("blog_tags", sql)
+        self.assertNotIn("blog_imagederivative", sql)
+        _, _, full_count = self.get("/")
+        self.assertLess(count, full_count)
+
+        # Keyset cursors still work without created_at in the output
+        data, sql, _ = self.get("/?fields=title&limit=2")
+        self.assertIsNotNone(data["next"])
+        self.assertIn('"blog_posts"."created_at"', sql)
+
+    def test_exclude_and_other_serializers(self):
+        data, sql, _ = self.get("/?exclude=author,tags,excerpt")
+        post = data["results"][0]
+        self.assertNotIn("author", post)
+        self.assertIn("title", post)
+        self.assertNotIn("auth_user", sql)
+        self.assertNotIn('"excerpt"', sql)
+
+        data, _, _ = self.get(f"/blog/{self.post.pk}/comments?fields=message")
+        self.assertEqual(data["results"][0]["message"], "hello")
+        self.assertNotIn("author", data["results"][0])
+
+        data, sql, _ = self.get("/profile/author/?exclude=email,profile")
+        self.assertNotIn("email", data)
+        self.assertEqual(data["username"], "author")
+        self.assertNotIn('"email"', sql)
+
+        data, _, _ = self.get(f"/blog/{self.post.pk}/?fields=title")
+        self.assertEqual(data["title"], "Post 2")
+        self.assertNotIn("content", data)
+
+    def test_user_lists_over_other_models(self):
+        reader = User.objects.create_user("reader")
+        AuthorStats.objects.create(user=self.author, follower_count=1)
+        FollowSuggestion.objects.create(user=reader, candidate=self.author, score=1)
+        for url in ("/popular-authors", f"/profile/{reader.pk}/suggestion"):
+            data, sql, _ = self.get(url)
+            self.assertEqual(data["results"][0]["profile"]["bio"], "writer")
+            self.assertIn("users_profile", sql)
+
+            data, sql, _ = self.get(f"{url}?fields=username")
+            self.assertEqual(data["results"], [{"username": "author"}])
+            self.assertNotIn("users_profile", sql)
+            self.assertNotIn('"email"', sql)
+
+    def test_lists_and_detail_render_the_same_media_urls(self):
+        Posts.objects.filter(pk=self.post.pk).update(thumbnail="uploads/cover.png")
+        profile.objects.filter(user=self.author).update(image="uploads/face.png")
+        cache.clear()
+        detail, _, _ = self.get(f"/blog/{self.post.pk}/")
+        feed, _, _ = self.get("/?fields=id,thumbnail,author")
+        listed = next(post for post in feed["results"] if post["id"] == self.post.pk)
+        self.assertEqual(listed["thumbnail"], detail["thumbnail"])
+        self.assertTrue(detail["thumbnail"].startswith("/"), detail["thumbnail"])
+        self.assertEqual(
+            listed["author"]["profile"]["image"], detail["author"]["profile"]["image"]
+        )
+        user, _, _ = self.get("/profile/author/")
+        self.assertEqual(user["profile"]["image"], detail["author"]["profile"]["image"])
+
+
+class ORJSONTests(TestCase):
+    def test_renders_what_the_drf_encoder_did(self):
+        when = datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+        token = uuid.UUID("12345678-1234-5678-1234-567812345678")
+        body = ORJSONRenderer().render(
+            {
+                "price": Decimal("1.50"),
+                "label": gettext_lazy("Successfully retrieved all blogs"),
+                "id": token,
+                "at": when,
+                "by_id": {1: "one"},
+            }
+        )
+        self.assertEqual(
+            json.loads(body),
+            {
+                "price": 1.5,
+                "label": "Successfully retrieved all blogs",
+                "id": str(token),
+                "at": "2024-01-02T03:04:05+00:00",
+                "by_id": {"1": "one"},
+            },
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_envelope_is_rendered(self):
+        response = envelope({"ok": True}, "Done", 201)
+        response.accepted_renderer = ORJSONRenderer()
+        response.accepted_media_type = "application/json"
+        response.renderer_context = {}
+        self.assertEqual(
+            json.loads(response.render().content),
+            {"data": {"ok": True}, "message": "Done", "status": 201},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_malformed_json_is_a_400(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"username": '))
+        self.assertEqual(ORJSONParser().parse(BytesIO(b'{"a": [1]}')), {"a": [1]})
+        response = APIClient().post(
+            "/user/sign-in", b'{"username": ', content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+
+class RelativeTimestampTests(TestCase):
+    def test_formats_in_the_viewers_timezone(self):
+        now = datetime(2024, 3, 4, 20, 30, tzinfo=dt_timezone.utc)
+        clock = ViewerClock(ZoneInfo("Asia/Kolkata"), now=now)
+        # 02:00 on March 5th in Kolkata: today for the viewer, not in UTC
+        self.assertEqual(clock.format(now), "02:00 AM")
+        self.assertEqual(clock.format(now - timedelta(hours=3)), "March 04, 2024")
+        clock = ViewerClock(ZoneInfo("America/New_York"), now=now)
+        self.assertEqual(clock.format(now - timedelta(hours=3)), "12:30 PM")
+
+    def test_comment_listing_uses_header_or_query_param(self):
+        author = User.objects.create_user("author")
+        post = Posts.objects.create(title="Post", content="[]", author=author)
+        comment = Comments.objects.create(message="hi", author=author, post=post)
+        Comments.objects.filter(pk=comment.pk).update(
+            created_at=datetime(2020, 1, 1, 23, 0, tzinfo=dt_timezone.utc)
+        )
+        url = f"/blog/{post.pk}/comments"
+
+        def created_at(*args, **kwargs):
+            response = self.client.get(*args, **kwargs)
+            return response.json()["data"]["results"][0]["created_at"]
+
+        self.assertEqual(created_at(url), "January 02, 2020")
+        self.assertEqual(created_at(f"{url}?tz=UTC"), "January 01, 2020")
+        self.assertEqual(
+            created_at(url, headers={"X-Timezone": "America/New_York"}),
+            "January 01, 2020",
+        )
+        self.assertEqual(created_at(f"{url}?tz=Not/AZone"), "January 02, 2020")
+
+
+class PostCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.reader = User.objects.create_user("reader")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def counters(self):
+        return Posts.objects.values(
+            "likes_count", "saved_count", "top_level_comment_count"
+        ).get(pk=self.post.pk)
+
+    def assertChanges(self, request, field, delta):
+        before = self.counters()
+        self.assertLess(request().status_code, 300)
+        after = self.counters()
+        self.assertEqual(after[field] - before[field], delta)
+        # No other counter moves
+        self.assertEqual(
+            {key: value for key, value in after.items() if key != field},
+            {key: value for key, value in before.items() if key != field},
+        )
+
+    def test_likes_and_saves_move_their_counter_by_one(self):
+        for name, field in (("like", "likes_count"), ("save", "saved_count")):
+            with self.subTest(name=name):
+                url = f"/blog/{self.post.pk}/{name}"
+                # GET toggles; PUT and DELETE set the state
+                self.assertChanges(lambda: self.client.get(url), field, 1)
+                self.assertChanges(lambda: self.client.get(url), field, -1)
+                self.assertChanges(lambda: self.client.put(url), field, 1)
+                self.assertChanges(lambda: self.client.put(url), field, 0)
+                self.assertChanges(lambda: self.client.delete(url), field, -1)
+
+    def test_only_top_level_comments_are_counted(self):
+        url = f"/blog/{self.post.pk}/create-comment"
+        self.assertChanges(
+            lambda: self.client.post(url, {"message": "First"}, format="json"),
+            "top_level_comment_count",
+            1,
+        )
+        parent = Comments.objects.get()
+        self.assertChanges(
+            lambda: self.client.post(
+                url, {"message": "Reply", "parent": parent.pk}, format="json"
+            ),
+            "top_level_comment_count",
+            0,
+        )
+
+    def test_counters_cannot_be_set_by_clients(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        tag = Tags.objects.create(value="django", label="Django")
+        heading = {"type": "heading", "content": [{"type": "text", "text": "Hi"}]}
+        response = client.post(
+            "/create-blog",
+            {
+                "content": json.dumps([heading]),
+                "tags": [tag.pk],
+                "likes_count": 100000,
+                "top_level_comment_count": 5,
+                "saved_count": 7,
+                "views_count": 9,
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.json())
+        data = response.json()["data"]
+        self.assertEqual([data[field] for field in self.counters()], [0, 0, 0])
+        self.assertEqual(
+            Posts.objects.values(*self.counters()).get(pk=data["id"]),
+            {"likes_count": 0, "saved_count": 0, "top_level_comment_count": 0},
+        )
+        self.assertEqual(data["views_count"], 0)
+
+    def test_rebuild_post_counters_fixes_drift(self):
+        Likes.objects.create(author=self.reader, post=self.post)
+        Saved.objects.create(author=self.reader, post=self.post)
+        parent = Comments.objects.create(
+            message="a", author=self.reader, post=self.post
+        )
+        Comments.objects.create(
+            message="b", author=self.author, post=self.post, parent=parent
+        )
+        Posts.objects.filter(pk=self.post.pk).update(
+            likes_count=5, saved_count=0, top_level_comment_count=9
+        )
+        call_command("rebuild_post_counters", stdout=StringIO())
+        self.assertEqual(
+            self.counters(),
+            {"likes_count": 1, "saved_count": 1, "top_level_comment_count": 1},
+        )
+
+
+class ReactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+        cls.comment = Comments.objects.create(
+            message="hi", author=cls.author, post=cls.post
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def counters(self):
+        return Posts.objects.values("likes_count", "saved_count").get(pk=self.post.pk)
+
+    def test_put_and_delete_are_idempotent(self):
+        url = f"/blog/{self.post.pk}/like"
+        for changed in (True, False):
+            response = self.client.put(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["data"], {"liked": True, "changed": changed})
+        self.assertEqual(self.counters()["likes_count"], 1)
+
+        for changed in (True, False):
+            response = self.client.delete(url)
+            self.assertEqual(
+                response.data["data"], {"liked": False, "changed": changed}
+            )
+        self.assertEqual(self.counters()["likes_count"], 0)
+        self.assertFalse(Likes.objects.exists())
+
+    def test_put_is_a_single_write_statement(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.put(f"/blog/{self.post.pk}/save")
+        writes = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        # The reaction row and the counter bump
+        self.assertEqual(len(writes), 2)
+        # INSERT OR IGNORE on SQLite, ON CONFLICT DO NOTHING on PostgreSQL
+        self.assertRegex(writes[0], "IGNORE|ON CONFLICT DO NOTHING")
+        self.assertEqual(self.counters()["saved_count"], 1)
+
+    def test_missing_target_is_404(self):
+        self.assertEqual(self.client.put("/blog/999/like").status_code, 404)
+        self.assertEqual(self.client.delete("/comment/999/like").status_code, 404)
+
+    def test_get_still_toggles(self):
+        url = f"/comment/{self.comment.pk}/like"
+        self.assertTrue(self.client.get(url).data["data"]["liked"])
+        self.assertFalse(self.client.get(url).data["data"]["liked"])
+        self.assertFalse(CommentLikes.objects.exists())
+
+    def test_sync_applies_batch(self):
+        response = self.client.post(
+            "/reactions/sync",
+            {
+                "changes": [
+                    {"type": "like", "id": self.post.pk, "state": True},
+                    {"type": "save", "id": self.post.pk, "state": True},
+                    {"type": "comment_like", "id": self.comment.pk, "state": True},
+                    {"type": "like", "id": self.post.pk, "state": True},
+                    {"type": "save", "id": self.post.pk, "state": False},
+                    {"type": "like", "id": 999, "state": True},
+                    {"type": "follow", "id": 1, "state": True},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.data["data"]
+        self.assertEqual(
+            [result.get("changed") for result in results],
+            [True, True, True, False, True, None, None],
+        )
+        self.assertEqual(results[5]["error"], "Not found")
+        self.assertEqual(results[6]["error"], "Invalid change")
+        self.assertEqual(self.counters(), {"likes_count": 1, "saved_count": 0})
+        self.assertTrue(CommentLikes.objects.filter(comment=self.comment).exists())
+
+    def test_sync_rejects_oversized_batch(self):
+        changes = [{"type": "like", "id": self.post.pk, "state": True}] * 101
+        response = self.client.post(
+            "/reactions/sync", {"changes": changes}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CounterBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.author)
+
+    def use_buffer(self, backend):
+        for name, value in (("BACKEND", backend), ("FLUSH_INTERVAL", 0)):
+            self.addCleanup(
+                setattr, counter_buffers, name, getattr(counter_buffers, name)
+            )
+            setattr(counter_buffers, name, value)
+        cache.clear()
+        counter_buffers.get_counter_buffer().drain()
+
+    def like(self, user, method="put"):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(f"/blog/{self.post.pk}/like")
+        self.assertEqual(response.status_code, 200)
+
+    def likes_count(self):
+        return Posts.objects.values_list("likes_count", flat=True).get(pk=self.post.pk)
+
+    def test_likes_are_counted_on_flush(self):
+        for backend in ("memory", "cache"):
+            with self.subTest(backend=backend):
+                self.use_buffer(backend)
+                Likes.objects.all().delete()
+                Posts.objects.filter(pk=self.post.pk).update(likes_count=0)
+                users = [User.objects.create_user(f"{backend}{n}") for n in range(3)]
+                for user in users:
+                    self.like(user)
+                self.like(users[0], "delete")
+                # The likes themselves are recorded immediately
+                self.assertEqual(Likes.objects.count(), 2)
+                self.assertEqual(self.likes_count(), 0)
+
+                with CaptureQueriesContext(connection) as context:
+                    self.assertEqual(flush_post_counters(), 1)
+                updates = [
+                    query
+                    for query in context.captured_queries
+                    if query["sql"].startswith("UPDATE")
+                ]
+                self.assertEqual(len(updates), 1)
+                self.assertEqual(self.likes_count(), 2)
+                self.assertEqual(flush_post_counters(), 0)
+
+    def test_cache_buffer_skips_a_lost_entry_after_one_flush(self):
+        self.use_buffer("cache")
+        buffer = counter_buffers.get_counter_buffer()
+        buffer.add(self.post.pk, "likes_count", 1)
+        # A writer that took a sequence number and never stored its entry
+        cache.incr(buffer.SEQUENCE)
+        buffer.add(self.post.pk, "likes_count", 1)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 1})
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 1})
+        self.assertEqual(buffer.drain(), {})
+
+    def test_cache_buffer_survives_evicted_sequence_or_cursor(self):
+        self.use_buffer("cache")
+        buffer = counter_buffers.get_counter_buffer()
+        for _ in range(5):
+            buffer.add(self.post.pk, "likes_count", 1)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 5})
+
+        # The sequence is evicted and restarts at 1, below the cursor
+        cache.delete(buffer.SEQUENCE)
+        buffer.add(self.post.pk, "likes_count", 1)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 1})
+        # Same, with a drain writing the old cursor back after the restart
+        cache.delete(buffer.SEQUENCE)
+        buffer.add(self.post.pk, "likes_count", 2)
+        cache.set(buffer.CURSOR, 5, None)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 2})
+        buffer.add(self.post.pk, "likes_count", 3)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 3})
+
+        # The cursor is evicted: pending entries are still found, and the
+        # consumed ones before them are not waited on
+        buffer.add(self.post.pk, "likes_count", 4)
+        cache.delete(buffer.CURSOR)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 4})
+        buffer.add(self.post.pk, "likes_count", 1)
+        self.assertEqual(buffer.drain(), {(self.post.pk, "likes_count"): 1})
+
+    def test_rollback_queues_nothing(self):
+        self.use_buffer("memory")
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    adjust_post_counter(self.post.pk, LIKES, 1)
+                    raise DatabaseError
+        self.assertEqual(counter_buffers.get_counter_buffer().drain(), {})
+
+
+def plan_problems(queryset):
+    # Full table scans and sorts without an index in the plan of queryset, in
+    # the EXPLAIN dialect of the test database
+    if connection.vendor == "mysql":
+        problems = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get("access_type") == "ALL":
+                    problems.append(f"full scan of {node.get('table_name')}")
+                if node.get("using_filesort"):
+                    problems.append("filesort")
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(queryset.explain(format="json")))
+        return problems
+    if connection.vendor == "postgresql":
+        # Tiny test tables make a sequential scan the cheapest plan; take it
+        # off the table so the planner shows which index it would use
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        return [
+            line.strip()
+            for line in plan.splitlines()
+            if re.search(r"Seq Scan|(^|->)\s*(Incremental )?Sort\b", line.strip())
+        ]
+    return [
+        line
+        for line in queryset.explain().splitlines()
+        if re.search(r"\bSCAN \S+( AS \S+)?$|USE TEMP B-TREE", line)
+    ]
+
+
+class QueryPlanTests(TestCase):
+    # Every hot view query must be answered from an index, in index order
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(username=f"user{n}", password="!") for n in range(30)
+        )
+        cls.user, cls.author = users[0], users[1]
+        posts = Posts.objects.bulk_create(
+            Posts(title=f"Post {n}", content="[]", author=users[n % len(users)])
+            for n in range(300)
+        )
+        cls.post = posts[0]
+        comments = Comments.objects.bulk_create(
+            Comments(message="hi", author=users[n % 7], post=posts[n % 50])
+            for n in range(500)
+        )
+        cls.comment = comments[0]
+        Comments.objects.bulk_create(
+            Comments(
+                message="reply", author=users[n % 5], post=posts[0], parent=comments[0]
+            )
+            for n in range(50)
+        )
+        Followings.objects.bulk_create(
+            Followings(follower=follower, following=following)
+            for follower in users
+            for following in users[:10]
+            if follower != following
+        )
+        Likes.objects.bulk_create(
+            Likes(author=user, post=post) for user in users for post in posts[:20]
+        )
+        CommentLikes.objects.bulk_create(
+            CommentLikes(author=user, comment=comment)
+            for user in users[:10]
+            for comment in comments[:50]
+        )
+        AuthorStats.objects.bulk_create(
+            AuthorStats(user=user, follower_count=n) for n, user in enumerate(users)
+        )
+
+    def hot_queries(self):
+        feed = BlogSerializer.setup_eager_loading(Posts.objects.all())
+        comments = annotate_comment_stats(
+            Comments.objects.filter(post=self.post.pk, parent=None), self.user
+        )
+        replies = annotate_comment_stats(
+            Comments.objects.filter(parent=self.comment.pk), self.user
+        )
+        return {
+            "feed": feed.order_by("-created_at", "-id")[:20],
+            "author feed": feed.filter(author=self.author).order_by(
+                "-created_at", "-id"
+            )[:20],
+            "comments": comments.order_by("-created_at")[:10],
+            "replies": replies.order_by("-created_at")[:10],
+            "liked": Likes.objects.filter(post=self.post, author=self.user),
+            "saved": Saved.objects.filter(post=self.post, author=self.user),
+            "follower count": Followings.objects.filter(following=self.author),
+            "following count": Followings.objects.filter(follower=self.author),
+            "fan-out": Followings.objects.filter(following=self.author).values_list(
+                "follower_id", flat=True
+            ),
+            "timeline": TimelineEntry.objects.filter(user=self.user).order_by(
+                "-created_at", "-post"
+            )[:20],
+            "suggestions": FollowSuggestion.objects.filter(user=self.user).order_by(
+                "-score", "candidate"
+            )[:10],
+            "popular authors": AuthorStats.objects.order_by("-follower_count", "user")[
+                :10
+            ],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(plan_problems(queryset), [])
+
+    def test_unindexed_query_is_reported(self):
+        # Guards the checker itself: no index covers message
+        self.assertNotEqual(
+            plan_problems(Comments.objects.filter(message="hi").order_by("message")),
+            [],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class EndpointBenchmarkTests(TestCase):
+    # Query counts are deterministic, so the committed baseline is enforced
+    # exactly; latency and memory are checked by the benchmark_endpoints command
+    def test_every_route_is_benchmarked(self):
+        routes = {str(pattern.pattern) for pattern in blog_urls.urlpatterns}
+        routes |= {f"user/{pattern.pattern}" for pattern in user_urls.urlpatterns}
+        with benchmarks.benchmark_environment():
+            fixtures = benchmarks.seed_benchmark_data(users=10, posts=30, comments=60)
+            covered = {
+                resolve(urlsplit(endpoint.prepare(0)[0]).path).route
+                for endpoint in benchmarks.benchmark_endpoints(fixtures)
+            }
+        self.assertEqual(routes - covered, set())
+
+    def test_query_counts_match_baseline(self):
+        with benchmarks.benchmark_environment():
+            fixtures = benchmarks.seed_benchmark_data()
+            results = benchmarks.run_benchmarks(fixtures, repeat=2)
+        baseline = benchmarks.load_baseline()
+        self.assertEqual(set(results), set(baseline))
+        self.assertEqual(
+            benchmarks.find_regressions(results, baseline, 0, metrics=["queries"]), []
+        )
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class SeedCommandTests(TestCase):
+    def seed(self):
+        call_command(
+            "seed_blogsphere",
+            users=40,
+            posts=120,
+            tags=8,
+            batch_size=25,
+            stdout=StringIO(),
+        )
+
+    def snapshot(self):
+        return {
+            "posts": list(Posts.objects.values_list("title", "author__username")),
+            "comments": Comments.objects.filter(parent__isnull=False).count(),
+            "likes": sorted(
+                Likes.objects.values_list("author__username", "post__title")
+            ),
+            "followings": sorted(
+                Followings.objects.values_list(
+                    "follower__username", "following__username"
+                )
+            ),
+        }
+
+    def test_seeds_related_rows_and_rebuilds_derived_tables(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Posts.objects.count(), 120)
+        self.assertTrue(Comments.objects.filter(parent__isnull=False).exists())
+        self.assertEqual(
+            sum(Posts.objects.values_list("likes_count", flat=True)),
+            Likes.objects.count(),
+        )
+        self.assertTrue(AuthorStats.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        # Follower counts are heavy tailed
+        top = AuthorStats.objects.order_by("-follower_count")
+        self.assertGreater(top[0].follower_count, 4 * top[20].follower_count)
+
+    def test_rerun_resumes_and_is_deterministic(self):
+        self.seed()
+        expected = self.snapshot()
+        # An interrupted run: the last followers and posts never got written
+        Followings.objects.filter(
+            follower__in=User.objects.order_by("-pk")[:10]
+        ).delete()
+        Likes.objects.filter(post__in=Posts.objects.order_by("-pk")[:30]).delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), expected)
+
+
+class PooledSQLiteWrapper(db_pool.PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    def make_pool(self, **options):
+        opened = []
+
+        def connect():
+            opened.append(FakeConnection())
+            return opened[-1]
+
+        return (
+            db_pool.ConnectionPool(connect, error=OperationalError, **options),
+            opened,
+        )
+
+    def make_wrapper(self, alias, **pool):
+        name = os.path.join(tempfile.mkdtemp(), "pool.sqlite3")
+        settings_dict = {
+            **connection.settings_dict,
+            "NAME": name,
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"pool": pool},
+        }
+        self.addCleanup(lambda: db_pool._pools.pop(alias).close())
+        return lambda: PooledSQLiteWrapper(settings_dict, alias)
+
+    def test_closed_connections_are_reused(self):
+        wrapper = self.make_wrapper("pooled-reuse", max_size=2)
+        first = wrapper()
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TABLE pooled (id integer)")
+        raw = first.connection
+        first.close()
+        # Another thread's wrapper borrows the same connection
+        second = wrapper()
+        with second.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pooled")
+        self.assertIs(second.connection, raw)
+        second.close()
+        stats = db_pool.pool_stats()["pooled-reuse"]
+        self.assertEqual(stats["connections_num"], 1)
+        self.assertEqual(stats["requests_num"], 2)
+        self.assertEqual(stats["pool_available"], 1)
+
+    def test_connection_closed_in_transaction_is_discarded(self):
+        wrapper = self.make_wrapper("pooled-transaction")
+        first = wrapper()
+        first.set_autocommit(False)
+        first.close()
+        stats = db_pool.pool_stats()["pooled-transaction"]
+        self.assertEqual(stats["pool_size"], 0)
+        self.assertEqual(stats["connections_discarded"], 1)
+
+    def test_exhausted_pool_waits_then_times_out(self):
+        pool, opened = self.make_pool(max_size=1, timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(OperationalError):
+            pool.getconn()
+        # A connection returned while waiting goes to the waiter
+        pool.timeout = 5
+        threading.Timer(0.05, pool.putconn, [conn]).start()
+        self.assertIs(pool.getconn(), conn)
+        stats = pool.stats()
+        self.assertEqual(stats["requests_timeouts"], 1)
+        self.assertEqual(stats["requests_queued"], 2)
+        self.assertEqual(stats["connections_num"], 1)
+
+    def test_failed_health_check_opens_a_new_connection(self):
+        pool, opened = self.make_pool(check=lambda conn: 1 / 0)
+        pool.putconn(pool.getconn())
+        conn = pool.getconn()
+        self.assertIs(conn, opened[1])
+        self.assertTrue(opened[0].closed)
+        self.assertEqual(pool.stats()["connections_lost"], 1)
+
+    def test_old_and_idle_connections_are_recycled(self):
+        pool, opened = self.make_pool(max_lifetime=0)
+        pool.putconn(pool.getconn())
+        self.assertTrue(opened[0].closed)
+        pool.max_lifetime, pool.max_idle = 3600, 0
+        pool.putconn(pool.getconn())
+        self.assertIsNot(pool.getconn(), opened[1])
+        self.assertEqual(pool.stats()["connections_recycled"], 2)
+
+    def test_stats_endpoint_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("reader"))
+        self.assertEqual(client.get("/health/db").status_code, 403)
+        client.force_authenticate(User.objects.create_user("ops", is_staff=True))
+        response = client.get("/health/db")
+        self.assertEqual(response.status_code, 200)
+        default = response.json()["data"][0]
+        self.assertEqual(default["alias"], "default")
+        self.assertIn("conn_max_age", default)
+
+
+@override_settings(DB_REPLICAS=["replica-test"])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user("writer")
+        cls.reader = User.objects.create_user("reader")
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user=None, view=None):
+        # Where a read made by view (a marked read-only view by default) would
+        # go, served through the routing middleware
+        headers = {}
+        if user is not None:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(user)}"
+        routed = []
+
+        @replicas.replica_reads
+        def read_only(request):
+            routed.append(router.db_for_read(Posts))
+            return HttpResponse()
+
+        middleware = replicas.ReplicaRoutingMiddleware(view or read_only)
+        middleware(RequestFactory().get("/", **headers))
+        return routed
+
+    def test_only_marked_views_read_from_a_replica(self):
+        def unmarked(request):
+            return HttpResponse(router.db_for_read(Posts))
+
+        self.assertEqual(self.request(self.reader), ["replica-test"])
+        self.assertEqual(self.request(), ["replica-test"])
+        response = replicas.ReplicaRoutingMiddleware(unmarked)(
+            RequestFactory().get("/")
+        )
+        self.assertEqual(response.content, b"default")
+        # Outside a request, e.g. management commands
+        self.assertEqual(router.db_for_read(Posts), "default")
+
+    def test_writes_go_to_the_primary_and_pin_the_writer(self):
+        @replicas.replica_reads
+        def write_then_read(request):
+            routed.append(router.db_for_write(Posts))
+            routed.append(router.db_for_read(Posts))
+            return HttpResponse()
+
+        routed = []
+        self.request(self.writer, view=write_then_read)
+        self.assertEqual(routed, ["default", "default"])
+        self.assertEqual(self.request(self.writer), ["default"])
+        self.assertEqual(self.request(self.reader), ["replica-test"])
+        # The window is over
+        cache.delete(replicas.PIN_KEY.format(self.writer.pk))
+        self.assertEqual(self.request(self.writer), ["replica-test"])
+
+    def test_anonymous_writes_pin_nobody(self):
+        def write(request):
+            router.db_for_write(Posts)
+            return HttpResponse()
+
+        self.request(view=write)
+        self.assertEqual(self.request(), ["replica-test"])
+
+
+@override_settings(DB_REPLICAS=["replica-test"])
+class ReplicaDatabaseTests(TestCase):
+    # A second SQLite database standing in for a replica that never catches
+    # up. Added after TestCase set up, so it is not rolled back between tests;
+    # nothing writes to it but setUpClass
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings["replica-test"] = {
+            **connection.settings_dict,
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3"),
+            "OPTIONS": {},
+        }
+        call_command("migrate", database="replica-test", verbosity=0)
+        # Replicated before the comments the tests write
+        for model in (User, Posts):
+            model.objects.using("replica-test").bulk_create(model.objects.all())
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica-test"].close()
+        del connections["replica-test"]
+        del connections.settings["replica-test"]
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user("writer")
+        cls.reader = User.objects.create_user("reader")
+        cls.post = Posts.objects.create(title="Post", content="[]", author=cls.writer)
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_writer_reads_their_own_writes(self):
+        writer = self.client_for(self.writer)
+        response = writer.post(
+            f"/blog/{self.post.pk}/create-comment", {"message": "First"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Comments.objects.using("replica-test").count(), 0)
+
+        comments = writer.get(f"/blog/{self.post.pk}/comments")
+        self.assertEqual(comments.status_code, 200)
+        # The replica has not seen the comment yet
+        stale = self.client_for(self.reader).get(f"/blog/{self.post.pk}/comments")
+        self.assertEqual(stale.status_code, 404)
+        # Once the window is over the writer reads the replica too
+        cache.clear()
+        self.assertEqual(writer.get(f"/blog/{self.post.pk}/comments").status_code, 404)
+
+    def test_counting_a_view_does_not_pin_the_viewer(self):
+        response = self.client_for(self.reader).get(f"/blog/{self.post.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(replicas.is_pinned(self.reader.pk))
+        self.assertEqual(
+            Posts.objects.values_list("views_count", flat=True).get(pk=self.post.pk),
+            1,
+        )
+
+    async def test_async_views_read_the_replica(self):
+        client = AsyncClient()
+        headers = {"authorization": f"Bearer {AccessToken.for_user(self.reader)}"}
+        path = f"/async/blog/{self.post.pk}/comments"
+        await Comments.objects.acreate(
+            message="Fresh", author=self.writer, post=self.post
+        )
+        response = await client.get(path, headers=headers)
+        self.assertEqual(response.json()["status"], 404)
+        await sync_to_async(replicas.pin_to_primary)(self.reader.pk)
+        response = await client.get(path, headers=headers)
+        self.assertEqual(response.json()["status"], 200)
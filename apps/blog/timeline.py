@@ -0,0 +1,151 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AuthorStats, Followings, Posts, TimelineEntry
+from .serializers import BlogSerializer
+
+# Authors with at least this many followers are not fanned out on write;
+# their posts are pulled into followers' timelines at read time instead
+FANOUT_THRESHOLD = getattr(settings, "TIMELINE_FANOUT_THRESHOLD", 5000)
+FANOUT_BATCH_SIZE = getattr(settings, "TIMELINE_FANOUT_BATCH_SIZE", 1000)
+# Recent posts copied into a timeline when the user follows a new author
+FOLLOW_BACKFILL_SIZE = getattr(settings, "TIMELINE_FOLLOW_BACKFILL_SIZE", 50)
+
+
+def is_pull_author(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id, follower_count__gte=FANOUT_THRESHOLD
+    ).exists()
+
+
+def fan_out_post(post):
+    if is_pull_author(post.author_id):
+        return
+    follower_ids = (
+        Followings.objects.filter(following_id=post.author_id)
+        .values_list("follower_id", flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    entries = (
+        TimelineEntry(
+            user_id=follower_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            created_at=post.created_at,
+        )
+        for follower_id in follower_ids
+    )
+    while batch := list(islice(entries, FANOUT_BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def recent_posts(author_id):
+    # (id, created_at) of the posts copied in when a timeline starts
+    # receiving an author's posts
+    recent = Posts.objects.filter(author_id=author_id).order_by("-created_at", "-id")
+    return list(recent.values_list("id", "created_at")[:FOLLOW_BACKFILL_SIZE])
+
+
+def backfill_followed_author(user_id, author_id):
+    if is_pull_author(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for post_id, created_at in recent_posts(author_id)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def resume_fan_out(author_id):
+    # An author who drops back under the threshold is pushed again from their
+    # next post on, and their followers stop pulling them. The posts they
+    # published meanwhile were never pushed, so copy the recent ones into
+    # every follower's timeline once the unfollow is committed
+    crossed = AuthorStats.objects.filter(
+        user_id=author_id, follower_count=FANOUT_THRESHOLD - 1
+    ).exists()
+    if crossed:
+        transaction.on_commit(lambda: backfill_author_followers(author_id))
+
+
+def backfill_author_followers(author_id):
+    recent = recent_posts(author_id)
+    if not recent:
+        return
+    follower_ids = (
+        Followings.objects.filter(following_id=author_id)
+        .values_list("follower_id", flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    entries = (
+        TimelineEntry(
+            user_id=follower_id,
+            post_id=post_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for follower_id in follower_ids
+        for post_id, created_at in recent
+    )
+    while batch := list(islice(entries, FANOUT_BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def drop_unfollowed_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _before(position, created_at_field, id_field):
+    created_at, pk = position
+    return Q(**{f"{created_at_field}__lt": created_at}) | Q(
+        **{created_at_field: created_at, f"{id_field}__lt": pk}
+    )
+
+
+def read_timeline(user, limit, position=None, request=None):
+    # Merge the pushed rows with posts pulled from followed high-follower
+    # authors; both sides are bounded newest-first range reads of `limit` rows
+    pushed = TimelineEntry.objects.filter(user=user).order_by("-created_at", "-post")
+    pulled = Posts.objects.filter(
+        author__in=Followings.objects.filter(
+            follower=user,
+            following__author_stats__follower_count__gte=FANOUT_THRESHOLD,
+        ).values("following_id")
+    ).order_by("-created_at", "-id")
+    if position is not None:
+        pushed = pushed.filter(_before(position, "created_at", "post"))
+        pulled = pulled.filter(_before(position, "created_at", "id"))
+
+    keys = {
+        (created_at, post_id)
+        for created_at, post_id in pushed.values_list("created_at", "post_id")[:limit]
+    }
+    keys.update(pulled.values_list("created_at", "id")[:limit])
+    post_ids = [post_id for _, post_id in sorted(keys, reverse=True)[:limit]]
+
+    posts = BlogSerializer.setup_eager_loading(
+        Posts.objects.filter(pk__in=post_ids), request
+    )
+    return sorted(posts, key=lambda post: (post.created_at, post.pk), reverse=True)
+
+
+def rebuild_timelines():
+    # Repopulate every timeline from Followings, e.g. after bulk imports that
+    # bypass the signals
+    TimelineEntry.objects.all().delete()
+    edges = Followings.objects.values_list("follower_id", "following_id").iterator(
+        chunk_size=FANOUT_BATCH_SIZE
+    )
+    for follower_id, following_id in edges:
+        backfill_followed_author(follower_id, following_id)
+    return TimelineEntry.objects.count()
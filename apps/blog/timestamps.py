@@ -0,0 +1,64 @@
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.utils import timezone
+
+# Viewer-relative timestamps: a time of day for anything from the viewer's
+# today, a date otherwise. The viewer's timezone comes from the X-Timezone
+# header or ?tz= (IANA names), falling back to BLOG_DEFAULT_TIMEZONE
+
+DEFAULT_TIMEZONE = getattr(settings, "BLOG_DEFAULT_TIMEZONE", "Asia/Kolkata")
+TIMEZONE_HEADER = "X-Timezone"
+TIMEZONE_QUERY_PARAM = "tz"
+TIME_FORMAT = "%I:%M %p"
+DATE_FORMAT = "%B %d, %Y"
+
+
+@lru_cache(maxsize=64)
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def viewer_zone(request):
+    names = []
+    if request is not None:
+        names.append(request.headers.get(TIMEZONE_HEADER))
+        params = getattr(request, "query_params", None) or request.GET
+        names.append(params.get(TIMEZONE_QUERY_PARAM))
+    for name in names:
+        zone = get_zone(name) if name else None
+        if zone is not None:
+            return zone
+    return get_zone(DEFAULT_TIMEZONE)
+
+
+class ViewerClock:
+    # Built once per request: the zone and the bounds of the viewer's today,
+    # so each timestamp costs one comparison and one strftime
+    def __init__(self, zone, now=None):
+        self.zone = zone
+        today = (now or timezone.now()).astimezone(zone).date()
+        self.today_start = datetime.combine(today, time(), tzinfo=zone)
+        self.today_end = datetime.combine(
+            today + timedelta(days=1), time(), tzinfo=zone
+        )
+
+    @classmethod
+    def for_context(cls, context):
+        clock = context.get("viewer_clock")
+        if clock is None:
+            clock = context["viewer_clock"] = cls(viewer_zone(context.get("request")))
+        return clock
+
+    def format(self, value):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        local = value.astimezone(self.zone)
+        if self.today_start <= value < self.today_end:
+            return local.strftime(TIME_FORMAT)
+        return local.strftime(DATE_FORMAT)
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UploadedFile, UploadSession
+from .storage import hash_file
+
+# Chunked, resumable uploads: a client opens an UploadSession, sends the file
+# as consecutive parts at explicit byte offsets, and completes it once every
+# byte has arrived. Parts are streamed to a temporary file, never held in
+# memory, and each one is hashed as it is written
+
+UPLOAD_TEMP_DIR = getattr(settings, "CHUNKED_UPLOAD_TEMP_DIR", "/tmp/blogsphere")
+UPLOAD_MAX_SIZE = getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 1024**3)
+UPLOAD_CHUNK_SIZE = getattr(settings, "CHUNKED_UPLOAD_CHUNK_SIZE", 5 * 1024**2)
+UPLOAD_EXPIRY = timedelta(hours=getattr(settings, "CHUNKED_UPLOAD_EXPIRY_HOURS", 24))
+UPLOAD_CLAIM_TIMEOUT = timedelta(
+    seconds=getattr(settings, "CHUNKED_UPLOAD_CLAIM_SECONDS", 60)
+)
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status, session=None):
+        super().__init__(message)
+        self.status = status
+        self.session = session
+
+
+def temp_path(session):
+    return os.path.join(UPLOAD_TEMP_DIR, f"{session.pk}.part")
+
+
+def open_session(filename, size, owner=None):
+    if size < 0 or size > UPLOAD_MAX_SIZE:
+        raise UploadError(f"Upload size must be between 0 and {UPLOAD_MAX_SIZE}", 400)
+    session = UploadSession.objects.create(
+        owner=owner,
+        filename=os.path.basename(filename)[:255] or "upload",
+        size=size,
+        expires_at=timezone.now() + UPLOAD_EXPIRY,
+    )
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    open(temp_path(session), "wb").close()
+    return session
+
+
+def get_session(pk, owner, lock=True):
+    sessions = UploadSession.objects.filter(pk=pk, expires_at__gt=timezone.now())
+    if lock:
+        sessions = sessions.select_for_update()
+    session = sessions.first()
+    if session is None:
+        raise UploadError("Upload not found or expired", 404)
+    if session.owner_id is not None and session.owner_id != owner.pk:
+        raise UploadError("You are not allowed to access this resource.", 403)
+    return session
+
+
+def parse_count(value, name):
+    # Sizes, offsets and lengths sent by the client
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        count = -1
+    if count < 0:
+        raise UploadError(f"{name} must be a non-negative integer", 400)
+    return count
+
+
+def write_part(pk, owner, offset, stream, length, checksum=None):
+    # Parts are appended in order: a part at any offset other than the bytes
+    # already received is rejected with the current offset so the client can
+    # resume from there. The part is read off the socket into its own staging
+    # file first, however slow the client is, and only then moved into place
+    if length is None or length > UPLOAD_CHUNK_SIZE:
+        raise UploadError(
+            f"Part length is missing or over {UPLOAD_CHUNK_SIZE} bytes", 400
+        )
+    session = get_session(pk, owner, lock=False)
+    if offset != session.received:
+        raise UploadError("Part does not start at the current offset", 409, session)
+    if length > session.size - session.received:
+        raise UploadError("Part runs past the end of the file", 400, session)
+
+    staging = f"{temp_path(session)}.{uuid4().hex}"
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(staging, "wb") as part:
+            while written < length:
+                chunk = stream.read(min(READ_SIZE, length - written))
+                if not chunk:
+                    break
+                part.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+        if written != length or (checksum and checksum != digest.hexdigest()):
+            raise UploadError(
+                "Part is incomplete or its checksum differs", 400, session
+            )
+
+        # Claim the bytes past the offset, copy the part in with no lock or
+        # transaction held, then confirm. A claim left by a writer that died
+        # mid-copy lapses after UPLOAD_CLAIM_TIMEOUT
+        claim = uuid4()
+        now = timezone.now()
+        claimed = UploadSession.objects.filter(
+            Q(claim__isnull=True) | Q(claimed_at__lte=now - UPLOAD_CLAIM_TIMEOUT),
+            pk=session.pk,
+            received=offset,
+            expires_at__gt=now,
+        ).update(claim=claim, claimed_at=now)
+        if not claimed:
+            session = get_session(pk, owner, lock=False)
+            raise UploadError("Part does not start at the current offset", 409, session)
+        try:
+            # Anything past the offset (a part whose connection dropped
+            # mid-way) is truncated before appending
+            with open(staging, "rb") as part, open(
+                temp_path(session), "r+b"
+            ) as assembled:
+                assembled.seek(offset)
+                assembled.truncate()
+                shutil.copyfileobj(part, assembled, READ_SIZE)
+        except BaseException:
+            UploadSession.objects.filter(pk=session.pk, claim=claim).update(
+                claim=None, claimed_at=None
+            )
+            raise
+        # Fails only if the claim lapsed and another writer took the offset
+        confirmed = UploadSession.objects.filter(pk=session.pk, claim=claim).update(
+            received=offset + written, claim=None, claimed_at=None
+        )
+        if not confirmed:
+            session = get_session(pk, owner, lock=False)
+            raise UploadError("Part does not start at the current offset", 409, session)
+    finally:
+        os.remove(staging)
+
+    session.received = offset + written
+    return session, digest.hexdigest()
+
+
+def complete_upload(pk, owner, checksum=None):
+    # Hashing and storing the assembled file happen before the transaction,
+    # which then only records it. Storage is content-addressed, so saving
+    # bytes that are already stored writes nothing
+    session = get_session(pk, owner, lock=False)
+    if session.received != session.size:
+        raise UploadError("Upload is missing parts", 409, session)
+    with open(temp_path(session), "rb") as assembled:
+        content = File(assembled, session.filename)
+        sha256 = hash_file(content)
+        if checksum and checksum != sha256:
+            raise UploadError("File checksum differs", 400, session)
+        uploaded = UploadedFile(sha256=sha256)
+        uploaded.file.save(session.filename, content, save=False)
+
+    with transaction.atomic():
+        # Gone if a concurrent request completed or aborted it first
+        session = get_session(pk, owner)
+        # Identical content is stored once; reuse its record
+        existing = UploadedFile.objects.filter(sha256=sha256).first()
+        if existing is None:
+            uploaded.save()
+        else:
+            uploaded = existing
+        discard_session(session)
+    return uploaded, sha256
+
+
+def discard_session(session):
+    try:
+        os.remove(temp_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def abort_upload(pk, owner):
+    with transaction.atomic():
+        discard_session(get_session(pk, owner))
+
+
+def purge_expired_sessions():
+    expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+    total = 0
+    for session in expired.iterator():
+        discard_session(session)
+        total += 1
+    return total
@@ -1,12 +1,17 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("", views.getAllBlogs),
     path("tags", views.getAllTags),
+    path("timeline", views.getHomeTimeline),
+    path("search", views.searchBlogs),
     path("create-blog", views.CreateBlogView.as_view()),
     path("media/upload", views.FileUploadView.as_view(), name="file-upload"),
+    path("media/upload/chunked", views.ChunkedUploadView.as_view()),
+    path("media/upload/<uuid:pk>", views.ChunkedUploadPartView.as_view()),
+    path("media/upload/<uuid:pk>/complete", views.ChunkedUploadCompleteView.as_view()),
     path("blog/<int:pk>/", views.getABlog),
     path("blogs/profile/<int:pk>/", views.getAllBlogsByUserId),
     path("profile/<str:username>/", views.getAUserProfile),
@@ -16,6 +21,13 @@ urlpatterns = [
     path("blog/<int:pk>/like", views.likeAPost),
     path("blog/<int:pk>/save", views.saveAPost),
     path("comment/<int:pk>/like", views.likeAComment),
+    path("reactions/sync", views.syncReactions),
     path("blog/<int:pk>/create-comment", views.createComment),
     path("popular-authors", views.getFamousAuthors),
+    path("health/db", views.getDatabaseStats),
+    # Async (ASGI) versions of the hot read endpoints
+    path("async/", async_views.getAllBlogs),
+    path("async/blog/<int:pk>/", async_views.getABlog),
+    path("async/blog/<int:pk>/comments", async_views.getAllCommentsByPostId),
+    path("async/profile/<str:username>/", async_views.getAUserProfile),
 ]
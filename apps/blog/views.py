@@ -1,20 +1,47 @@
-import json
-from datetime import datetime, timedelta
-
-import pytz
-from dateutil import parser
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import IntegrityError
-from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db import IntegrityError, connections, transaction
+from django.db.models import BooleanField, Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import CommentLikes, Comments, Followings, Likes, Posts, Saved, Tags
+from config.db.pool import pool_stats
+from config.db.replicas import replica_reads
+
+from .cache import get_cached_post
+from .content import parse_blocks, title_and_subtitle
+from .counters import TOP_LEVEL_COMMENTS, adjust_post_counter, record_post_view
+from .models import (
+    AuthorStats,
+    CommentLikes,
+    Comments,
+    Followings,
+    FollowSuggestion,
+    Likes,
+    Posts,
+    Saved,
+    Tags,
+    UploadedFile,
+)
+from .pagination import (
+    CustomLimitOffsetPagination,
+    KeysetPagination,
+    SearchPagination,
+    get_feed_paginator,
+)
+from .reactions import (
+    REACTION_BATCH_LIMIT,
+    apply_reactions,
+    set_reaction,
+    toggle_reaction,
+    unset_reaction,
+)
+from .responses import envelope
 from .serializers import (
     BlogCreateSerializer,
     BlogSerializer,
@@ -22,103 +49,180 @@ from .serializers import (
     CommentSerializer,
     TagSerializer,
     UploadedFileSerializer,
+    UploadSessionSerializer,
     UserSerializer,
+    response_context,
+)
+from .storage import hash_file
+from .uploads import (
+    UPLOAD_CHUNK_SIZE,
+    UploadError,
+    abort_upload,
+    complete_upload,
+    get_session,
+    open_session,
+    parse_count,
+    write_part,
 )
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
-    default_limit = 10
-    max_limit = 100
-
-
-def format_date_time(date_time_str):
-    # Define the IST timezone
-    ist = pytz.timezone("Asia/Kolkata")
-
-    # Parse the created_at string to a datetime object and convert to IST
-    date_time = parser.parse(date_time_str)
-    date_time_ist = date_time.astimezone(ist)
-
-    # Get today's date in IST
-    today_ist = datetime.now(ist).date()
-
-    # Check if created_at is today
-    if date_time_ist.date() == today_ist:
-        # Format to show only time if the date is today
-        return date_time_ist.strftime("%I:%M %p")
+def annotate_comment_stats(comments, user, request=None):
+    # Compute per-comment like/reply counts and the viewer's like flag in the
+    # same query that loads the page, instead of three queries per comment
+    like_counts = (
+        CommentLikes.objects.filter(comment=OuterRef("pk"))
+        .order_by()
+        .values("comment")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    reply_counts = (
+        Comments.objects.filter(parent=OuterRef("pk"))
+        .order_by()
+        .values("parent")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    if user.is_authenticated:
+        liked = Exists(CommentLikes.objects.filter(comment=OuterRef("pk"), author=user))
     else:
-        # Format to show full date if the date is not today
-        return date_time_ist.strftime("%B %d, %Y")
+        liked = Value(False, output_field=BooleanField())
+    return CommentSerializer.setup_eager_loading(comments, request).annotate(
+        liked=liked,
+        likesCount=Coalesce(Subquery(like_counts), 0),
+        commentCount=Coalesce(Subquery(reply_counts), 0),
+    )
 
 
 # Create your api views here.
+@replica_reads
 @api_view(["GET"])
 def getAllBlogs(request):
     try:
         # Get all posts
-        posts = Posts.objects.all()
+        posts = BlogSerializer.setup_eager_loading(Posts.objects.all(), request)
 
         # Create an instance of the pagination class
-        paginator = CustomLimitOffsetPagination()
+        paginator = get_feed_paginator(request)
         # Paginate the queryset
         paginated_posts = paginator.paginate_queryset(posts, request)
 
         # Serialize the paginated queryset
-        serializer = BlogSerializer(paginated_posts, many=True)
+        serializer = BlogSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
 
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
+        data = paginator.get_paginated_data(serializer.data)
 
-        response = {
-            "data": data,
-            "message": "Successfully retrieved all blogs",
-            "status": status.HTTP_200_OK,
-        }
-        return Response(response, status=response["status"])
+        return envelope(data, "Successfully retrieved all blogs")
 
+    except NotFound as e:
+        # A malformed or tampered ?cursor=
+        return envelope([], str(e.detail), status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        response = {
-            "data": [],
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-        return Response(response, status=response["status"])
+        return envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
+@replica_reads
 @api_view(["GET"])
 def getAllBlogsByUserId(request, pk):
     try:
         user = User.objects.get(pk=pk)
         # Get all posts of this user
-        posts = Posts.objects.filter(author=user)
+        posts = BlogSerializer.setup_eager_loading(
+            Posts.objects.filter(author=user), request
+        )
 
         # Create an instance of the pagination class
-        paginator = CustomLimitOffsetPagination()
+        paginator = get_feed_paginator(request)
         # Paginate the queryset
         paginated_posts = paginator.paginate_queryset(posts, request)
 
         # Serialize the paginated queryset
-        serializer = BlogSerializer(paginated_posts, many=True)
+        serializer = BlogSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
+
+        # Create the response with pagination data
+        data = paginator.get_paginated_data(serializer.data)
+
+        return envelope(data, "Successfully retrieved all blogs")
+
+    except NotFound as e:
+        # A malformed or tampered ?cursor=
+        return envelope([], str(e.detail), status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(["GET"])
+def getHomeTimeline(request):
+    try:
+        if not request.user.is_authenticated:
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+
+        # Posts from the authors this user follows, newest first
+        paginator = KeysetPagination()
+        paginated_posts = paginator.paginate_timeline(request.user, request)
+
+        # Serialize the page of posts
+        serializer = BlogSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
 
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
+        data = paginator.get_paginated_data(serializer.data)
 
-        response = {
-            "data": data,
-            "message": "Successfully retrieved all blogs",
-            "status": status.HTTP_200_OK,
-        }
-        return Response(response, status=response["status"])
+        return envelope(data, "Successfully retrieved the timeline")
 
+    except NotFound as e:
+        # A malformed or tampered ?cursor=
+        return envelope([], str(e.detail), status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        response = {
-            "data": [],
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-        return Response(response, status=response["status"])
+        return envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(["GET"])
+def searchBlogs(request):
+    try:
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return envelope(
+                [], "A search query is required.", status.HTTP_400_BAD_REQUEST
+            )
+
+        # Ranked matches from the full-text index, best first
+        paginator = SearchPagination()
+        paginated_posts = paginator.paginate_search(query, request)
+
+        # Serialize the page of posts
+        serializer = BlogSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
+
+        # Create the response with pagination data
+        data = paginator.get_paginated_data(serializer.data)
+
+        return envelope(data, "Successfully searched blogs")
+
+    except NotFound as e:
+        # A malformed or tampered ?cursor=
+        return envelope([], str(e.detail), status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
 class FileUploadView(APIView):
@@ -132,20 +236,149 @@ class FileUploadView(APIView):
 
         file = request.FILES["file"]
 
-        # Save the file URL to the database if using a model
-        # uploaded_file = UploadedFile.objects.create(data=file)
+        # Identical content was uploaded before: hand back that record
+        # instead of storing and processing the file again
+        sha256 = hash_file(file)
+        existing = UploadedFile.objects.filter(sha256=sha256).first()
+        if existing is not None:
+            return Response(
+                self.serializer_class(existing).data, status=status.HTTP_200_OK
+            )
 
         # Serialize and return the response
         serializer = self.serializer_class(data={"file": file})
         if serializer.is_valid():
-            # Uncomment if you are saving the file with a model
-            # uploaded_file = serializer.save()
-            serializer.save()
+            try:
+                with transaction.atomic():
+                    serializer.save(sha256=sha256)
+            except IntegrityError:
+                # A concurrent upload of the same bytes won
+                existing = UploadedFile.objects.get(sha256=sha256)
+                return Response(
+                    self.serializer_class(existing).data, status=status.HTTP_200_OK
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def upload_error_response(error):
+    # Conflicts and bad parts carry the session so the client can resume
+    data = UploadSessionSerializer(error.session).data if error.session else None
+    return envelope(data, str(error), error.status)
+
+
+def upload_owner(request):
+    return request.user if request.user.is_authenticated else None
+
+
+class ChunkedUploadView(APIView):
+    # Opens a resumable upload: POST {"filename", "size"}, then PUT each part
+    # to media/upload/<id>?offset=<n> and POST media/upload/<id>/complete
+
+    def post(self, request):
+        try:
+            filename = request.data.get("filename")
+            size = request.data.get("size")
+            if not filename or size is None:
+                return envelope(
+                    None, "filename and size are required", status.HTTP_400_BAD_REQUEST
+                )
+            session = open_session(
+                filename, parse_count(size, "size"), upload_owner(request)
+            )
+            data = dict(UploadSessionSerializer(session).data)
+            data["chunk_size"] = UPLOAD_CHUNK_SIZE
+            response = envelope(data, "Upload started", status.HTTP_201_CREATED)
+        except UploadError as e:
+            return upload_error_response(e)
+        except Exception as e:
+            response = envelope(
+                None,
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
+
+
+class ChunkedUploadPartView(APIView):
+    def get(self, request, pk):
+        # Where to resume after a dropped connection
+        try:
+            session = get_session(pk, request.user, lock=False)
+            response = envelope(UploadSessionSerializer(session).data, "Upload status")
+        except UploadError as e:
+            return upload_error_response(e)
+        except Exception as e:
+            response = envelope(
+                None,
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
+
+    def put(self, request, pk):
+        # The raw request body is the part; it is read straight off the
+        # socket, request.data is never touched so nothing is buffered
+        try:
+            offset = parse_count(request.query_params.get("offset"), "offset")
+            length = request.META.get("CONTENT_LENGTH")
+            session, sha256 = write_part(
+                pk,
+                request.user,
+                offset,
+                request.stream,
+                parse_count(length, "Content-Length") if length else None,
+                request.headers.get("X-Part-SHA256"),
+            )
+            data = dict(UploadSessionSerializer(session).data)
+            data["part_sha256"] = sha256
+            response = envelope(data, "Part received")
+        except UploadError as e:
+            return upload_error_response(e)
+        except Exception as e:
+            response = envelope(
+                None,
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
+
+    def delete(self, request, pk):
+        try:
+            abort_upload(pk, request.user)
+            response = envelope(None, "Upload aborted")
+        except UploadError as e:
+            return upload_error_response(e)
+        except Exception as e:
+            response = envelope(
+                None,
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
+
+
+class ChunkedUploadCompleteView(APIView):
+    def post(self, request, pk):
+        try:
+            uploaded, sha256 = complete_upload(
+                pk, request.user, request.data.get("sha256")
+            )
+            data = dict(UploadedFileSerializer(uploaded).data)
+            data["sha256"] = sha256
+            response = envelope(data, "Upload complete", status.HTTP_201_CREATED)
+        except UploadError as e:
+            return upload_error_response(e)
+        except Exception as e:
+            response = envelope(
+                None,
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
+
+
 # @api_view(["POST"])
 # def createBlog(request):
 class CreateBlogView(APIView):
@@ -154,35 +387,15 @@ class CreateBlogView(APIView):
     def post(self, request):
         try:
             if not request.user.is_authenticated:
-                response = {
-                    "status": status.HTTP_403_FORBIDDEN,
-                    "message": "You are not allowed to access this resource.",
-                    "data": [],
-                }
-                return Response(response, status=response["status"])
+                return envelope(
+                    [],
+                    "You are not allowed to access this resource.",
+                    status.HTTP_403_FORBIDDEN,
+                )
             # Make a copy of request.data and add the author field
             blog_data = request.data.copy()
-            content = json.loads(blog_data["content"])
-            title = None
-            subtitle = None
-
-            # Flag to indicate if the first heading has been found
-            found_first_heading = False
-
-            # Iterate through the list to find the first heading and next heading or paragraph
-            for item in content:
-                if not found_first_heading:
-                    if item.get("type") == "heading":
-                        # Extract text from the first heading
-                        if item.get("content"):
-                            title = item["content"][0].get("text")
-                        found_first_heading = True
-                else:
-                    # After finding the first heading, look for the next heading or paragraph
-                    if item.get("type") in ["heading", "paragraph"]:
-                        if item.get("content"):
-                            subtitle = item["content"][0].get("text")
-                        break
+            # The first heading and the block after it become title/subtitle
+            title, subtitle = title_and_subtitle(parse_blocks(blog_data["content"]))
             blog_data["title"] = title
             blog_data["subtitle"] = subtitle
             blog_data["author"] = request.user.id
@@ -191,87 +404,84 @@ class CreateBlogView(APIView):
             if serializer.is_valid():
                 try:
                     serializer.save()
-                    response = {
-                        "data": serializer.data,
-                        "message": "Successfully created blog",
-                        "status": status.HTTP_201_CREATED,
-                    }
+                    response = envelope(
+                        serializer.data,
+                        "Successfully created blog",
+                        status.HTTP_201_CREATED,
+                    )
                 except IntegrityError as e:
-                    response = {
-                        "data": [],
-                        "message": f"An error occurred: {str(e)}",
-                        "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    }
+                    response = envelope(
+                        [],
+                        f"An error occurred: {str(e)}",
+                        status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    )
             else:
                 message = "blog creation failed!"
-                if serializer.errors["thumbnail"]:
+                if serializer.errors.get("thumbnail"):
                     message = serializer.errors["thumbnail"][0]
-                response = {
-                    "data": serializer.errors,
-                    "message": message,
-                    "status": status.HTTP_400_BAD_REQUEST,
-                }
+                response = envelope(
+                    serializer.errors, message, status.HTTP_400_BAD_REQUEST
+                )
         except Exception as e:
-            response = {
-                "data": [],
-                "message": f"An error occurred: {str(e)}",
-                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-            }
-        return Response(response, status=response["status"])
+            response = envelope(
+                [],
+                f"An error occurred: {str(e)}",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return response
 
 
+@replica_reads
 @api_view(["GET"])
 def getABlog(request, pk):
     try:
-        post = Posts.objects.get(pk=pk)
-        serializer = BlogSerializer(post)
+        # The serialized body is shared by every viewer and comes from the
+        # cache; counters and the per-user flags are always read live
+        post_data, counters = get_cached_post(pk)
+        record_post_view(pk)
+        # The cached body is the full post; a sparse fieldset trims the copy
+        selected = BlogSerializer.selected_fields(request)
+        if selected is not None:
+            post_data = {k: v for k, v in post_data.items() if k in selected}
         # Check if the current user has liked or saved this post
         liked = (
-            Likes.objects.filter(post=post, author=request.user).exists()
+            Likes.objects.filter(post_id=pk, author=request.user).exists()
             if request.user.is_authenticated
             else False
         )
         saved = (
-            Saved.objects.filter(post=post, author=request.user).exists()
+            Saved.objects.filter(post_id=pk, author=request.user).exists()
             if request.user.is_authenticated
             else False
         )
-        likesCount = Likes.objects.filter(post=post).count()
-        commentCount = Comments.objects.filter(post=post, parent=None).count()
-        # Create a copy of the serialized data and add the 'saved' and 'liked' fields
-        post_data = serializer.data.copy()
         post_data["liked"] = liked
         post_data["saved"] = saved
-        post_data["likesCount"] = likesCount
-        post_data["commentCount"] = commentCount
+        post_data["likesCount"] = counters["likes_count"]
+        post_data["commentCount"] = counters["top_level_comment_count"]
+        post_data["savedCount"] = counters["saved_count"]
+        post_data["viewsCount"] = counters["views_count"]
         # Create the response dictionary
-        response = {
-            "data": post_data,
-            "message": "Successfully retrieved A blog post",
-            "status": status.HTTP_200_OK,
-        }
+        response = envelope(post_data, "Successfully retrieved A blog post")
 
     except Exception as e:
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return Response(response, status=response["status"])
+    return response
 
 
+@replica_reads
 @api_view(["GET"])
 def getAllCommentsByPostId(request, pk):
     try:
-        comments = Comments.objects.filter(post=pk, parent=None).order_by("-created_at")
+        comments = annotate_comment_stats(
+            Comments.objects.filter(post=pk, parent=None), request.user, request
+        ).order_by("-created_at")
         if not comments.exists():
-            response = {
-                "data": None,
-                "message": "No comments found for this post.",
-                "status": status.HTTP_404_NOT_FOUND,
-            }
-            return Response(response, status=response["status"])
+            return envelope(
+                None, "No comments found for this post.", status.HTTP_404_NOT_FOUND
+            )
 
         # Create an instance of the pagination class
         paginator = CustomLimitOffsetPagination()
@@ -279,60 +489,46 @@ def getAllCommentsByPostId(request, pk):
         paginated_posts = paginator.paginate_queryset(comments, request)
 
         # Serialize the paginated queryset
-        serializer = CommentSerializer(paginated_posts, many=True)
-        for comment in serializer.data:
-            liked = (
-                CommentLikes.objects.filter(
-                    comment=comment["id"], author=request.user
-                ).exists()
-                if request.user.is_authenticated
-                else False
-            )
-            commentCount = Comments.objects.filter(parent=comment["id"]).count()
-            likesCount = CommentLikes.objects.filter(comment=comment["id"]).count()
-            comment["liked"] = liked
-            comment["likesCount"] = likesCount
-            comment["commentCount"] = commentCount
-            comment["created_at"] = format_date_time(comment["created_at"])
+        serializer = CommentSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
+        # Read serializer.data once; each access copies the list
+        comments_data = serializer.data
+        for comment, instance in zip(comments_data, paginated_posts):
+            comment["liked"] = instance.liked
+            comment["likesCount"] = instance.likesCount
+            comment["commentCount"] = instance.commentCount
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
+        data = paginator.get_paginated_data(comments_data)
 
         # Create the response dictionary
-        response = {
-            "data": data,
-            "message": "Successfully retrieved the comments",
-            "status": status.HTTP_200_OK,
-        }
+        response = envelope(data, "Successfully retrieved the comments")
     except Exception as e:
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return Response(response, status=response["status"])
+    return response
 
 
+@replica_reads
 @api_view(["GET"])
 def getAllReplyByCommentId(request, pk):
     try:
         if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
-        comments = Comments.objects.filter(parent=pk).order_by("-created_at")
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+        comments = annotate_comment_stats(
+            Comments.objects.filter(parent=pk), request.user, request
+        ).order_by("-created_at")
 
         if not comments.exists():
-            response = {
-                "data": None,
-                "message": "No reply found for this comment.",
-                "status": status.HTTP_404_NOT_FOUND,
-            }
-            return Response(response, status=response["status"])
+            return envelope(
+                None, "No reply found for this comment.", status.HTTP_404_NOT_FOUND
+            )
 
         # Create an instance of the pagination class
         paginator = CustomLimitOffsetPagination()
@@ -340,135 +536,119 @@ def getAllReplyByCommentId(request, pk):
         paginated_posts = paginator.paginate_queryset(comments, request)
 
         # Serialize the paginated queryset
-        serializer = CommentSerializer(paginated_posts, many=True)
-        for comment in serializer.data:
-            liked = (
-                CommentLikes.objects.filter(
-                    comment=comment["id"], author=request.user
-                ).exists()
-                if request.user.is_authenticated
-                else False
-            )
-            likesCount = CommentLikes.objects.filter(comment=comment["id"]).count()
-            commentCount = Comments.objects.filter(parent=comment["id"]).count()
-            comment["liked"] = liked
-            comment["likesCount"] = likesCount
-            comment["commentCount"] = commentCount
-            comment["created_at"] = format_date_time(comment["created_at"])
+        serializer = CommentSerializer(
+            paginated_posts, many=True, context=response_context(request)
+        )
+        # Read serializer.data once; each access copies the list
+        comments_data = serializer.data
+        for comment, instance in zip(comments_data, paginated_posts):
+            comment["liked"] = instance.liked
+            comment["likesCount"] = instance.likesCount
+            comment["commentCount"] = instance.commentCount
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
-        response = {
-            "data": data,
-            "message": "Successfully retrieved the reply comments",
-            "status": status.HTTP_200_OK,
-        }
+        data = paginator.get_paginated_data(comments_data)
+        response = envelope(data, "Successfully retrieved the reply comments")
     except Exception as e:
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return Response(response, status=response["status"])
+    return response
 
 
-@api_view(["GET"])
-def likeAPost(request, pk):
+def reaction_response(request, kind, pk, state_key, messages, not_found):
+    # GET keeps the legacy toggle; PUT sets and DELETE clears the reaction,
+    # both idempotent so a retried request never flips it back
     try:
         if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
-        # Check if the post exists
-        post = Posts.objects.get(pk=pk)
-
-        # Check if the user has already liked the post
-        like = Likes.objects.filter(author=request.user, post=post).first()
-
-        if like:
-            # User has already liked the post, so remove the like
-            like.delete()
-            message = "Blog disliked successfully"
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+        if request.method == "PUT":
+            changed = set_reaction(kind, request.user, pk)
+            state = True
+        elif request.method == "DELETE":
+            changed = unset_reaction(kind, request.user, pk)
+            state = False
         else:
-            # User has not liked the post, so add a new like
-            Likes.objects.create(author=request.user, post=post)
-            message = "Blog liked successfully"
-
-        response = {
-            "message": message,
-            "status": status.HTTP_200_OK,
-        }
+            state = toggle_reaction(kind, request.user, pk)
+            changed = True
+        response = envelope({state_key: state, "changed": changed}, messages[state])
     except ObjectDoesNotExist:
-        response = {
-            "message": "Post not found",
-            "status": status.HTTP_404_NOT_FOUND,
-        }
+        response = envelope(None, not_found, status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        response = {
-            "message": str(e),
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(None, str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
 
-    return Response(response, status=response["status"])
 
+@api_view(["GET", "PUT", "DELETE"])
+def likeAPost(request, pk):
+    return reaction_response(
+        request,
+        "like",
+        pk,
+        "liked",
+        {True: "Blog liked successfully", False: "Blog disliked successfully"},
+        "Post not found",
+    )
 
-@api_view(["GET"])
+
+@api_view(["GET", "PUT", "DELETE"])
 def likeAComment(request, pk):
-    try:
-        if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
-        # Check if the post exists
-        comment = Comments.objects.get(pk=pk)
+    return reaction_response(
+        request,
+        "comment_like",
+        pk,
+        "liked",
+        {True: "Comment liked successfully", False: "Comment disliked successfully"},
+        "Comment not found",
+    )
 
-        # Check if the user has already liked the post
-        like = CommentLikes.objects.filter(author=request.user, comment=comment).first()
 
-        if like:
-            # User has already liked the post, so remove the like
-            like.delete()
-            message = "Comment disliked successfully"
-        else:
-            # User has not liked the post, so add a new like
-            CommentLikes.objects.create(author=request.user, comment=comment)
-            message = "Comment liked successfully"
-
-        response = {
-            "message": message,
-            "status": status.HTTP_200_OK,
-        }
-    except ObjectDoesNotExist:
-        response = {
-            "message": "Comment not found",
-            "status": status.HTTP_404_NOT_FOUND,
-        }
+@api_view(["POST"])
+def syncReactions(request):
+    # Applies a batch of {"type": "like" | "save" | "comment_like", "id",
+    # "state"} changes, e.g. queued while offline, in one request
+    try:
+        if not request.user.is_authenticated:
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+        changes = (
+            request.data.get("changes") if isinstance(request.data, dict) else None
+        )
+        if not isinstance(changes, list) or not changes:
+            return envelope(
+                [], "changes must be a non-empty list", status.HTTP_400_BAD_REQUEST
+            )
+        if len(changes) > REACTION_BATCH_LIMIT:
+            return envelope(
+                [],
+                f"At most {REACTION_BATCH_LIMIT} changes per request",
+                status.HTTP_400_BAD_REQUEST,
+            )
+        results = apply_reactions(request.user, changes)
+        response = envelope(results, "Reactions synced successfully")
     except Exception as e:
-        response = {
-            "message": str(e),
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-
-    return Response(response, status=response["status"])
+        response = envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return response
 
 
 @api_view(["POST"])
 def createComment(request, pk):
     try:
         if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
         # Make a copy of request.data and add the author field
         comment_data = request.data.copy()
         if not comment_data.get("parent"):
@@ -476,89 +656,51 @@ def createComment(request, pk):
         if comment_data["parent"] is not None:
             parent = Comments.objects.filter(pk=comment_data["parent"])
             if not parent:
-                response = {
-                    "status": status.HTTP_404_NOT_FOUND,
-                    "message": "Comment Not Found!.",
-                    "data": [],
-                }
-                return Response(response, status=response["status"])
-
-        post = Comments.objects.filter(pk=pk)
+                return envelope([], "Comment Not Found!.", status.HTTP_404_NOT_FOUND)
+
+        post = Posts.objects.filter(pk=pk)
         if not post:
-            response = {
-                "status": status.HTTP_404_NOT_FOUND,
-                "message": "Post Not Found!.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
+            return envelope([], "Post Not Found!.", status.HTTP_404_NOT_FOUND)
         comment_data["author"] = request.user.id
         comment_data["post"] = pk
         serializer = CommentCreateSerializer(data=comment_data)
         if serializer.is_valid():
-            serializer.save()
-            response = {
-                "data": serializer.data,
-                "message": "Successfully created Comment",
-                "status": status.HTTP_201_CREATED,
-            }
+            with transaction.atomic():
+                comment = serializer.save()
+                if comment.parent_id is None:
+                    adjust_post_counter(pk, TOP_LEVEL_COMMENTS, 1)
+            response = envelope(
+                serializer.data, "Successfully created Comment", status.HTTP_201_CREATED
+            )
         else:
-            response = {
-                "data": serializer.errors,
-                "message": "Comment creation failed!",
-                "status": status.HTTP_400_BAD_REQUEST,
-            }
+            response = envelope(
+                serializer.errors,
+                "Comment creation failed!",
+                status.HTTP_400_BAD_REQUEST,
+            )
     except Exception as e:
-        response = {
-            "data": [],
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-    return Response(response, status=response["status"])
+        response = envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return response
 
 
-@api_view(["GET"])
+@api_view(["GET", "PUT", "DELETE"])
 def saveAPost(request, pk):
-    try:
-        if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
-        # Check if the post exists
-        post = Posts.objects.get(pk=pk)
-
-        # Check if the user has already liked the post
-        save = Saved.objects.filter(author=request.user, post=post).first()
-
-        if save:
-            # User has already liked the post, so remove the like
-            save.delete()
-            message = "Blog removed from saved successfully"
-        else:
-            # User has not liked the post, so add a new like
-            Saved.objects.create(author=request.user, post=post)
-            message = "Blog saved successfully"
-
-        response = {
-            "message": message,
-            "status": status.HTTP_200_OK,
-        }
-    except ObjectDoesNotExist:
-        response = {
-            "message": "Post not found",
-            "status": status.HTTP_404_NOT_FOUND,
-        }
-    except Exception as e:
-        response = {
-            "message": str(e),
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-
-    return Response(response, status=response["status"])
-
-
+    return reaction_response(
+        request,
+        "save",
+        pk,
+        "saved",
+        {
+            True: "Blog saved successfully",
+            False: "Blog removed from saved successfully",
+        },
+        "Post not found",
+    )
+
+
+@replica_reads
 @api_view(["GET"])
 def getAllTags(request):
     try:
@@ -573,164 +715,141 @@ def getAllTags(request):
         serializer = TagSerializer(paginated_tags, many=True)
 
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
-        response = {
-            "data": data,
-            "message": "Successfully retrieved all Tags",
-            "status": status.HTTP_200_OK,
-        }
-        return Response(response, status=response["status"])
+        data = paginator.get_paginated_data(serializer.data)
+        return envelope(data, "Successfully retrieved all Tags")
 
     except Exception as e:
-        response = {
-            "data": [],
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
-        return Response(response, status=response["status"])
+        return envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
+@replica_reads
 @api_view(["GET"])
 def getAUserProfile(request, username):
     try:
         if not request.user.is_authenticated:
-            response = {
-                "status": status.HTTP_403_FORBIDDEN,
-                "message": "You are not allowed to access this resource.",
-                "data": [],
-            }
-            return Response(response, status=response["status"])
-        user = User.objects.get(username=username)
-        serializer = UserSerializer(user)
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+        user = UserSerializer.setup_eager_loading(User.objects.all(), request).get(
+            username=username
+        )
+        serializer = UserSerializer(user, context=response_context(request))
         followingCount = Followings.objects.filter(follower=user).count()
         followerCount = Followings.objects.filter(following=user).count()
         postCount = Posts.objects.filter(author=user).count()
-        user_data = serializer.data.copy()
+        user_data = serializer.data
         user_data["followingCount"] = followingCount
         user_data["followerCount"] = followerCount
         user_data["postCount"] = postCount
         # Create the response dictionary
-        response = {
-            "data": user_data,
-            "message": "Successfully retrieved A user profile",
-            "status": status.HTTP_200_OK,
-        }
+        response = envelope(user_data, "Successfully retrieved A user profile")
     except Exception as e:
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return Response(response, status=response["status"])
+    return response
 
 
+@replica_reads
 @api_view(["GET"])
 def getSuggestionUserList(request, pk):
     try:
-        # Get the IDs of the users that the given user is following
-        following_ids = Followings.objects.filter(follower_id=pk).values_list(
-            "following_id", flat=True
-        )
-        # Get the IDs of users who are followed by those users (second-degree connections)
-        followings_of_following_ids = (
-            Followings.objects.filter(follower_id__in=following_ids)
-            .values("following_id")
-            .annotate(common_follow_count=Count("following_id"))
-            .order_by("-common_follow_count")  # Sort in descending order
-        )
-        # Extract the IDs and order by the number of common followings
-        ordered_following_ids = [
-            entry["following_id"] for entry in followings_of_following_ids
-        ]
-
-        # Create a Case/When expression to maintain the order
-        preserved_order = Case(
-            *[
-                When(id=pk, then=Value(pos))
-                for pos, pk in enumerate(ordered_following_ids)
-            ],
-            output_field=IntegerField(),
-        )
-
-        # Exclude the original user and already-followed users to suggest new users, ordered by common_follow_count
-        suggested_users = (
-            User.objects.filter(id__in=ordered_following_ids)
-            .exclude(Q(id=pk) | Q(id__in=following_ids))
-            .order_by(preserved_order)
-        )
+        # Suggestions are precomputed per user, so this is one range scan over
+        # the (user, -score) index
+        suggestions = UserSerializer.setup_eager_loading(
+            FollowSuggestion.objects.filter(user_id=pk),
+            request,
+            through="candidate",
+        ).order_by("-score", "candidate")
         # Create an instance of the pagination class
         paginator = CustomLimitOffsetPagination()
-        # Paginate the queryset
-        paginated_Users = paginator.paginate_queryset(suggested_users, request)
+        # Paginate the suggestions and keep only the suggested users
+        paginated_Users = [
+            suggestion.candidate
+            for suggestion in paginator.paginate_queryset(suggestions, request)
+        ]
 
         # Serialize the list of suggested users
-        serializer = UserSerializer(paginated_Users, many=True)
+        serializer = UserSerializer(
+            paginated_Users, many=True, context=response_context(request)
+        )
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
-
-        response = {
-            "data": data,
-            "message": "Successfully retrieved A Suggested profile",
-            "status": status.HTTP_200_OK,
-        }
+        data = paginator.get_paginated_data(serializer.data)
+
+        response = envelope(data, "Successfully retrieved A Suggested profile")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return Response(response, status=response["status"])
+    return response
 
 
 @api_view(["GET"])
 def getFamousAuthors(request):
     try:
-        # Query to get following_id, annotated with the count of how many times they appear
-        ids = (
-            Followings.objects.values("following_id")
-            .annotate(follow_count=Count("following_id"))
-            .order_by("-follow_count")
-        )
-
-        # Extract the list of following_id values and their counts
-        following_ids = [entry["following_id"] for entry in ids]
-        follow_counts = {entry["following_id"]: entry["follow_count"] for entry in ids}
-
-        # Get the User objects based on the following_ids
-        famous_authors = User.objects.filter(id__in=following_ids)
-
-        # Order the users by their follow_count
-        famous_authors = sorted(
-            famous_authors, key=lambda user: follow_counts.get(user.id, 0), reverse=True
-        )
+        # Read the materialized leaderboard straight off its follower_count index
+        leaderboard = UserSerializer.setup_eager_loading(
+            AuthorStats.objects.filter(follower_count__gt=0),
+            request,
+            through="user",
+        ).order_by("-follower_count", "user")
 
         # Create an instance of the pagination class
         paginator = CustomLimitOffsetPagination()
-        # Paginate the sorted queryset
-        paginated_Users = paginator.paginate_queryset(famous_authors, request)
+        # Paginate the leaderboard and keep only the users
+        paginated_Users = [
+            stats.user for stats in paginator.paginate_queryset(leaderboard, request)
+        ]
 
         # Serialize the list of paginated users
-        serializer = UserSerializer(paginated_Users, many=True)
+        serializer = UserSerializer(
+            paginated_Users, many=True, context=response_context(request)
+        )
         # Create the response with pagination data
-        paginated_response = paginator.get_paginated_response(serializer.data)
-        data = paginated_response.data
-
-        response = {
-            "data": data,
-            "message": "Successfully retrieved Famous profiles",
-            "status": status.HTTP_200_OK,
-        }
+        data = paginator.get_paginated_data(serializer.data)
+
+        response = envelope(data, "Successfully retrieved Famous profiles")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
-        response = {
-            "data": None,
-            "message": f"An error occurred: {str(e)}",
-            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
-        }
+        response = envelope(
+            None, f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return response
+
 
-    return Response(response, status=response["status"])
+@api_view(["GET"])
+def getDatabaseStats(request):
+    # Connection settings of every database and the counters of this
+    # process's pools (a worker answers for itself only); staff only
+    try:
+        if not request.user.is_staff:
+            return envelope(
+                [],
+                "You are not allowed to access this resource.",
+                status.HTTP_403_FORBIDDEN,
+            )
+        pools = pool_stats()
+        data = [
+            {
+                "alias": alias,
+                "vendor": connections[alias].vendor,
+                "conn_max_age": connections[alias].settings_dict["CONN_MAX_AGE"],
+                "health_checks": connections[alias].settings_dict["CONN_HEALTH_CHECKS"],
+                "pool": pools.get(alias),
+            }
+            for alias in connections
+        ]
+        response = envelope(data, "Successfully retrieved database stats")
+    except Exception as e:
+        response = envelope(
+            [], f"An error occurred: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Pooled database connections by default, unless DB_POOL says otherwise
+os.environ.setdefault('ASGI_SERVER', '1')
 
 application = get_asgi_application()
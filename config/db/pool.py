@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from functools import partial
+
+# A per-process pool of raw DB-API connections behind Django's connection
+# handling. Django 5.0 ships no pool, and persistent connections (CONN_MAX_AGE)
+# are per thread, which ASGI never reuses. With a pooled ENGINE, closing a
+# connection (at the end of every request, CONN_MAX_AGE = 0) hands it back to
+# the pool and the next connect() borrows one instead of dialing the server.
+#
+# Configured through OPTIONS["pool"], the shape Django 5.1 uses for psycopg:
+#   max_size      connections open at once, idle or in use
+#   timeout       seconds connect() waits for one to be returned
+#   max_lifetime  seconds before a connection is closed instead of reused
+#   max_idle      seconds an unused connection is kept open
+
+
+def ping(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        error=RuntimeError,
+        check=None,
+        max_size=10,
+        timeout=30,
+        max_lifetime=3600,
+        max_idle=600,
+    ):
+        self.connect = connect
+        self.error = error
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._cond = threading.Condition()
+        # (connection, opened at, returned at), most recently returned last
+        self._idle = deque()
+        # id(connection) -> opened at, for connections handed out
+        self._in_use = {}
+        self._waiting = 0
+        self.counters = Counter()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, slot = self._checkout(deadline)
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._cond:
+                        del self._in_use[slot]
+                        self.counters["connections_errors"] += 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._in_use[id(conn)] = self._in_use.pop(slot)
+                    self.counters["connections_opened"] += 1
+                return conn
+            if self.check is None or self._healthy(conn):
+                return conn
+            self._release(conn, discard=True, counter="connections_lost")
+
+    def _checkout(self, deadline):
+        # (idle connection, None), or (None, slot) with a slot reserved for
+        # the caller to open a new connection in
+        with self._cond:
+            self.counters["requests"] += 1
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    # LIFO: hot connections get reused, cold ones age out
+                    conn, opened_at, returned_at = self._idle.pop()
+                    if (
+                        now - opened_at >= self.max_lifetime
+                        or now - returned_at >= self.max_idle
+                    ):
+                        self._close(conn)
+                        self.counters["connections_recycled"] += 1
+                        continue
+                    self._in_use[id(conn)] = opened_at
+                    return conn, None
+                if len(self._in_use) < self.max_size:
+                    slot = object()
+                    self._in_use[slot] = now
+                    return None, slot
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.counters["requests_timeouts"] += 1
+                    raise self.error(
+                        f"No database connection available within {self.timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._waiting += 1
+                self.counters["requests_queued"] += 1
+                started = time.monotonic()
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    self.counters["requests_wait_ms"] += int(
+                        (time.monotonic() - started) * 1000
+                    )
+
+    def _healthy(self, conn):
+        try:
+            self.check(conn)
+        except Exception:
+            return False
+        return True
+
+    def putconn(self, conn, discard=False):
+        self._release(conn, discard=discard, counter="connections_discarded")
+
+    def _release(self, conn, discard, counter):
+        with self._cond:
+            opened_at = self._in_use.pop(id(conn), None)
+            if opened_at is None:
+                # Not ours (opened before a fork, or by a pool since replaced)
+                discard = True
+            elif not discard and time.monotonic() - opened_at >= self.max_lifetime:
+                discard = True
+                counter = "connections_recycled"
+            if discard:
+                if opened_at is not None:
+                    self.counters[counter] += 1
+            else:
+                self._idle.append((conn, opened_at, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pool_max": self.max_size,
+                "pool_size": len(self._idle) + len(self._in_use),
+                "pool_available": len(self._idle),
+                "pool_in_use": len(self._in_use),
+                "requests_waiting": self._waiting,
+                "requests_num": self.counters["requests"],
+                "requests_queued": self.counters["requests_queued"],
+                "requests_wait_ms": self.counters["requests_wait_ms"],
+                "requests_timeouts": self.counters["requests_timeouts"],
+                "connections_num": self.counters["connections_opened"],
+                "connections_errors": self.counters["connections_errors"],
+                "connections_lost": self.counters["connections_lost"],
+                "connections_recycled": self.counters["connections_recycled"],
+                "connections_discarded": self.counters["connections_discarded"],
+            }
+
+
+# alias -> pool of this process
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    pool = _pools.get(alias)
+    return pool if pool is not None and pool.pid == os.getpid() else None
+
+
+def pool_stats():
+    # {alias: stats} of the pools this process has opened
+    return {alias: pool.stats() for alias, pool in _pools.items() if get_pool(alias)}
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    # Mixed in front of a backend's DatabaseWrapper (see config.db.mysql)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # The driver does not know the pool options
+        params.pop("pool", None)
+        return params
+
+    @property
+    def pool(self):
+        pool = get_pool(self.alias)
+        if pool is None:
+            with _pools_lock:
+                pool = get_pool(self.alias)
+                if pool is None:
+                    # After a fork the parent's pool and its sockets are left
+                    # alone; this process opens its own
+                    pool = _pools[self.alias] = ConnectionPool(
+                        partial(
+                            super().get_new_connection, self.get_connection_params()
+                        ),
+                        error=self.Database.OperationalError,
+                        check=(
+                            ping if self.settings_dict["CONN_HEALTH_CHECKS"] else None
+                        ),
+                        **self.settings_dict["OPTIONS"].get("pool", {}),
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        return self.pool.getconn()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Only connections in a known clean state go back: closed outside a
+        # transaction, with the configured autocommit and no unchecked errors
+        reusable = (
+            not self.in_atomic_block
+            and self.autocommit == self.settings_dict["AUTOCOMMIT"]
+            and (not self.errors_occurred or self.is_usable())
+        )
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection, discard=not reusable)
@@ -0,0 +1,179 @@
+import random
+from contextvars import ContextVar
+from functools import cached_property, wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+# Read-replica routing. Writes always go to the primary. Reads go to a
+# replica only inside views marked with replica_reads, and only while the
+# requesting user has not written recently: a write pins the user to the
+# primary for DB_REPLICA_STICKY_SECONDS, so they read their own changes however
+# far the replicas lag. ReplicaRoutingMiddleware tracks the request being served
+
+PRIMARY = "default"
+PIN_KEY = "db:primary:{}"
+
+_request = ContextVar("replica_routing_request", default=None)
+
+
+# Settings are read on use, not at import, so override_settings applies
+def replica_aliases():
+    return getattr(settings, "DB_REPLICAS", [])
+
+
+def sticky_seconds():
+    return getattr(settings, "DB_REPLICA_STICKY_SECONDS", 5)
+
+
+def request_user_id(request):
+    # Who is asking, without loading the user: the claims of a valid bearer
+    # token, else the session. None for anonymous requests
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is not None:
+        try:
+            token = authentication.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            return None
+        return token.get(api_settings.USER_ID_CLAIM)
+    session = getattr(request, "session", None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(user_id), True, sticky_seconds())
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        # Set by replica_reads for the views that may read stale data
+        self.replica_reads = False
+        # Set by any write; the rest of the request reads the primary
+        self.wrote = False
+
+    @cached_property
+    def user_id(self):
+        return request_user_id(self.request)
+
+    @cached_property
+    def pinned(self):
+        # Resolving the user may load the session; that read, made while this
+        # is being computed, goes to the primary
+        enabled, self.replica_reads = self.replica_reads, False
+        try:
+            return self.user_id is not None and is_pinned(self.user_id)
+        finally:
+            self.replica_reads = enabled
+
+    @cached_property
+    def replica(self):
+        # One replica per request, so its reads see one consistent snapshot
+        return random.choice(replica_aliases())
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if (
+            state is None
+            or not replica_aliases()
+            or not state.replica_reads
+            or state.wrote
+            or state.pinned
+        ):
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(request)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+            if state.wrote and state.user_id is not None:
+                pin_to_primary(state.user_id)
+        finally:
+            _request.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState(request)
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+            if state.wrote:
+                # The session lookup may hit the database
+                user_id = await sync_to_async(lambda: state.user_id)()
+                if user_id is not None:
+                    await sync_to_async(pin_to_primary)(user_id)
+        finally:
+            _request.reset(token)
+        return response
+
+
+def replica_reads(view):
+    # Lets a read-only view read from a replica; outermost decorator, so
+    # authentication reads there too
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            state = _request.get()
+            if state is None:
+                return await view(*args, **kwargs)
+            state.replica_reads = True
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                state.replica_reads = False
+
+    else:
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = _request.get()
+            if state is None:
+                return view(*args, **kwargs)
+            state.replica_reads = True
+            try:
+                return view(*args, **kwargs)
+            finally:
+                state.replica_reads = False
+
+    return wrapper